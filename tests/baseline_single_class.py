@@ -0,0 +1,100 @@
+# tests/baseline_single_class.py
+# The single-class builder as it was before the memoized search, cut down to
+# feasibility: every partition combination, each backtracked cell by cell.
+# Only kept as a reference for tests/test_single_class.py.
+
+import itertools
+
+
+def baseline_feasible(subjects, num_days, slots_per_day):
+    """True if the original exhaustive search finds a complete timetable."""
+    total = sum(s.get("periods", 0) for s in subjects)
+    if total > slots_per_day * num_days:
+        return False
+
+    blocks = []
+    for s in subjects:
+        cat = s.get("category", "")
+        p = int(s.get("periods", 0))
+        if cat == "Laboratory":
+            if p < 2:
+                return False
+            kind = "lab"
+        elif cat in ("Open Elective", "Project"):
+            if p != 4:
+                return False
+            kind = "pair"
+        elif cat in ("Library", "Mentoring"):
+            kind = cat.lower()
+        elif cat.startswith(("Main subject", "Professional Elective")):
+            kind = "limited"
+        else:
+            kind = "other"
+        blocks.append({"subject": s.get("subject", ""), "periods": p, "kind": kind})
+
+    lib = [b for b in blocks if b["kind"] == "library"]
+    ment = [b for b in blocks if b["kind"] == "mentoring"]
+    if lib and ment:
+        blocks = [b for b in blocks if b not in (lib[0], ment[0])]
+        blocks.append({"subject": "lib/ment", "periods": 2, "kind": "lib_ment"})
+    elif lib or ment:
+        return False
+
+    def partitions(total, max_block=3):
+        results = []
+
+        def helper(remaining, max_part, current):
+            if remaining == 0:
+                results.append(list(current))
+                return
+            for p in range(min(max_part, remaining), 0, -1):
+                current.append(p)
+                helper(remaining - p, p, current)
+                current.pop()
+        helper(total, max_block, [])
+        return results
+
+    def partitions_for(b):
+        p = b["periods"]
+        if b["kind"] == "lab":
+            if p == 4:
+                return [[2, 2]]
+            parts = [[2]*(p//2)] if p % 2 == 0 and p//2 <= 4 else []
+            return parts + [[p]]
+        if b["kind"] == "pair":
+            return [[2, 2]]
+        if b["kind"] == "lib_ment":
+            return [[2]]
+        return partitions(p) or [[p]]
+
+    def place(insts):
+        free = [[True]*slots_per_day for _ in range(num_days)]
+        counts = [{} for _ in range(num_days)]
+
+        def backtrack(i):
+            if i == len(insts):
+                return True
+            subject, size, limited = insts[i]
+            for d in range(num_days):
+                if limited and counts[d].get(subject, 0) + size > 3:
+                    continue
+                for s in range(slots_per_day - size + 1):
+                    if not all(free[d][s:s+size]):
+                        continue
+                    for k in range(size):
+                        free[d][s+k] = False
+                    counts[d][subject] = counts[d].get(subject, 0) + size
+                    if backtrack(i + 1):
+                        return True
+                    for k in range(size):
+                        free[d][s+k] = True
+                    counts[d][subject] -= size
+            return False
+        return backtrack(0)
+
+    for combo in itertools.product(*(partitions_for(b) for b in blocks)):
+        insts = [(b["subject"], size, b["kind"] == "limited") for b, sizes in zip(blocks, combo) for size in sizes]
+        insts.sort(key=lambda inst: -inst[1])
+        if place(insts):
+            return True
+    return False
@@ -0,0 +1,54 @@
+# tests/test_backends.py
+# The "Lists" and "Bitset" placement backends must give identical tables for the same seed
+
+import pytest
+
+from timetable_engine import Constraints, build_grid, conflicts, try_place_once, try_place_once_bitset
+from timetable_engine.bench import synthetic_department
+
+from timetable_checks import hard_violations
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri"]
+
+
+def with_rules(classes, teachers, assignments, timeslots):
+    # Unavailable cells for a few teachers and classes, and a pin for every
+    # tenth assignment at a cell its class and teacher can use
+    constraints = Constraints()
+    for t in teachers[::4]:
+        constraints.set_teacher_unavailable(t.id, ["Mon-P1", "Fri-P6"])
+    for c in classes[::3]:
+        constraints.set_class_unavailable(c.id, ["Wed-P3"])
+    free = [label for label in timeslots if label.endswith(("P2", "P4"))]
+    for n, a in enumerate(assignments[::10]):
+        constraints.set_pinned(a.id, [free[n % len(free)]])
+        if conflicts(constraints, classes, teachers, assignments, timeslots):
+            constraints.set_pinned(a.id, [])
+    return constraints
+
+
+def with_rooms(classes, teachers, assignments, timeslots):
+    constraints = Constraints()
+    constraints.add_room("Lab 1", "Lab", 1)
+    constraints.add_room("Lab 2", "Lab", 2)
+    constraints.add_room("Hall", "Theory", 30)
+    return constraints
+
+
+def with_rules_and_rooms(classes, teachers, assignments, timeslots):
+    constraints = with_rules(classes, teachers, assignments, timeslots)
+    constraints.rooms = with_rooms(classes, teachers, assignments, timeslots).rooms
+    return constraints
+
+
+@pytest.mark.parametrize("make_constraints", [None, with_rules, with_rooms, with_rules_and_rooms])
+@pytest.mark.parametrize("utilization", ["loose", "tight"])
+def test_same_tables(utilization, make_constraints):
+    timeslots, _ = build_grid(DAYS, 6)
+    classes, teachers, assignments = synthetic_department("medium", utilization, 1)
+    constraints = make_constraints(classes, teachers, assignments, timeslots) if make_constraints else None
+    for seed in range(12):
+        lists = try_place_once(classes, teachers, assignments, timeslots, seed=seed, constraints=constraints)
+        bitset = try_place_once_bitset(classes, teachers, assignments, timeslots, seed=seed, constraints=constraints)
+        assert lists == bitset, seed
+        assert hard_violations(classes, teachers, assignments, timeslots, *bitset, constraints) == [], seed
@@ -0,0 +1,19 @@
+# tests/test_cli.py
+# Command-line runs write one file per class and teacher, even when names clash
+
+from timetable_engine import Assignment, ClassGroup, Teacher, state_to_json
+from timetable_engine.cli import main
+
+
+def test_csv_names_stay_unique(tmp_path):
+    # "C/1" and "C_1" both clean up to "C_1"; "c_1" differs only in case
+    classes = [ClassGroup(1, "C/1"), ClassGroup(2, "C_1"), ClassGroup(3, "c_1")]
+    teachers = [Teacher(1, "T:1", []), Teacher(2, "T_1", [])]
+    assignments = [Assignment(1, 1, 1, "Maths", "Theory", 2), Assignment(2, 2, 2, "Maths", "Theory", 2),
+                   Assignment(3, 1, 3, "Physics", "Theory", 2)]
+    state = tmp_path / "state.json"
+    state.write_text(state_to_json(teachers, classes, assignments), encoding="utf-8")
+    out = tmp_path / "out"
+    assert main([str(state), "--out", str(out), "--seed", "1"]) == 0
+    written = sorted(p.name for p in out.iterdir())
+    assert written == ["class_C_1 (2).csv", "class_C_1.csv", "class_c_1 (3).csv", "teacher_T_1 (2).csv", "teacher_T_1.csv"]
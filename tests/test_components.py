@@ -0,0 +1,38 @@
+# tests/test_components.py
+# Splitting the department into independent groups must not cost the big group its workers
+
+from timetable_engine import Assignment, ClassGroup, Teacher, build_grid, schedule_best_of_n
+from timetable_engine.bench import synthetic_department
+
+from test_backends import DAYS
+from timetable_checks import hard_violations
+
+
+def department_with_isolated_classes():
+    # One connected department plus three classes that each have a teacher of their own
+    classes, teachers, assignments = synthetic_department("small", "tight", 0)
+    next_id = max(a.id for a in assignments) + 1
+    for k in range(3):
+        classes.append(ClassGroup(1000 + k, f"Solo {k}"))
+        teachers.append(Teacher(1000 + k, f"Solo teacher {k}", []))
+        assignments.append(Assignment(next_id + k, 1000 + k, 1000 + k, "Solo", "Theory", 3))
+    return classes, teachers, assignments
+
+
+def test_large_group_keeps_trial_workers():
+    timeslots, _ = build_grid(DAYS, 6)
+    classes, teachers, assignments = department_with_isolated_classes()
+    class_table, teacher_table, remaining, meta = schedule_best_of_n(classes, teachers, assignments, timeslots, trials=20, seed=1, workers=2)
+    components = meta["components"]
+    assert len(components) == 4
+    assert [c["workers"] for c in components] == [2, 1, 1, 1]
+    assert hard_violations(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining) == []
+
+
+def test_adaptive_spreads_groups_over_workers():
+    timeslots, _ = build_grid(DAYS, 6)
+    classes, teachers, assignments = department_with_isolated_classes()
+    class_table, teacher_table, remaining, meta = schedule_best_of_n(classes, teachers, assignments, timeslots, trials=20, seed=1, workers=2, adaptive=True)
+    assert meta["workers"] == 2
+    assert all(c["workers"] == 1 for c in meta["components"])
+    assert hard_violations(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining) == []
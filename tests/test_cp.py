@@ -0,0 +1,94 @@
+# tests/test_cp.py
+# schedule_cp may only report "infeasible" when no complete timetable exists,
+# checked against exhaustive search on tiny departments
+
+import random
+
+from timetable_engine import (
+    Assignment, ClassGroup, Constraints, Layout, Teacher, build_grid, schedule_cp,
+)
+from timetable_engine.deadline import INFEASIBLE, OPTIMAL
+
+from timetable_checks import hard_violations
+
+
+def tiny_department(rng):
+    # Two days of three periods, a few classes and teachers and sometimes
+    # unavailable cells and a one-place Lab room: small enough to enumerate
+    timeslots, _ = build_grid(["Mon", "Tue"], 3)
+    classes = [ClassGroup(i, f"C{i}") for i in range(1, rng.randint(2, 3) + 1)]
+    teachers = [Teacher(i, f"T{i}", []) for i in range(1, rng.randint(1, 3) + 1)]
+    assignments = []
+    for aid in range(1, rng.randint(2, 5) + 1):
+        category = rng.choice(["Theory", "Theory", "Lab"])
+        periods = 2 if category == "Lab" else rng.randint(1, 2)
+        subject = f"{category[0]}{rng.randint(1, 2)}"
+        assignments.append(Assignment(aid, rng.choice(teachers).id, rng.choice(classes).id, subject, category, periods))
+    constraints = Constraints()
+    if rng.random() < 0.5:
+        constraints.set_teacher_unavailable(teachers[0].id, rng.sample(timeslots, 2))
+    if rng.random() < 0.5:
+        constraints.add_room("Lab", "Lab", 1)
+    return classes, teachers, assignments, timeslots, constraints
+
+
+def brute_force_feasible(layout):
+    # Try every start for every unit in turn, under the same rules as the solvers
+    units = layout.units
+    n = len(units)
+    ppd = layout.periods_per_day
+    class_busy = [0]*len(layout.class_ids)
+    teacher_busy = [0]*len(layout.teacher_ids)
+    group_days = [set() for _ in range(units.num_groups)]
+    room_used = [[0]*layout.num_slots for _ in (layout.rooms.capacity if layout.rooms else ())]
+
+    def place(u):
+        if u == n:
+            return True
+        block = units.block[u]
+        mask_all = layout.allowed[u]
+        r = layout.unit_rooms[u] if layout.unit_rooms else None
+        for s in range(layout.num_slots):
+            mask = ((1 << block) - 1) << s
+            c, t, g, day = units.cls[u], units.teacher[u], units.group[u], s // ppd
+            if not (mask_all >> s) & 1 or class_busy[c] & mask or teacher_busy[t] & mask or day in group_days[g]:
+                continue
+            if r is not None and any(room_used[r][s+k] >= layout.rooms.capacity[r] for k in range(block)):
+                continue
+            class_busy[c] |= mask
+            teacher_busy[t] |= mask
+            group_days[g].add(day)
+            if r is not None:
+                for k in range(block):
+                    room_used[r][s+k] += 1
+            if place(u + 1):
+                return True
+            class_busy[c] &= ~mask
+            teacher_busy[t] &= ~mask
+            group_days[g].discard(day)
+            if r is not None:
+                for k in range(block):
+                    room_used[r][s+k] -= 1
+        return False
+
+    return place(0)
+
+
+def test_infeasible_only_when_brute_force_agrees():
+    rng = random.Random(4)
+    outcomes = {OPTIMAL: 0, INFEASIBLE: 0, "diag": 0}
+    for case in range(200):
+        classes, teachers, assignments, timeslots, constraints = tiny_department(rng)
+        feasible = brute_force_feasible(Layout(classes, teachers, assignments, timeslots, constraints=constraints))
+        class_table, teacher_table, remaining, meta = schedule_cp(classes, teachers, assignments, timeslots, seed=case, constraints=constraints)
+        if "diag" in meta:
+            # The pre-solve bounds are necessary conditions, so they only fire on infeasible input
+            assert not feasible, case
+            outcomes["diag"] += 1
+            continue
+        assert meta["status"] == (OPTIMAL if feasible else INFEASIBLE), case
+        outcomes[meta["status"]] += 1
+        if feasible:
+            assert hard_violations(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining, constraints) == [], case
+    # The generator must produce both kinds of instance for the check to mean anything
+    assert outcomes[OPTIMAL] and outcomes[INFEASIBLE], outcomes
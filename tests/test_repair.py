@@ -0,0 +1,26 @@
+# tests/test_repair.py
+# repair_result may move and add lessons but never break a hard rule
+
+import pytest
+
+from timetable_engine import build_grid, repair_result, try_place_once_bitset
+from timetable_engine.bench import synthetic_department
+
+from test_backends import DAYS, with_rooms, with_rules, with_rules_and_rooms
+from timetable_checks import hard_violations
+
+
+@pytest.mark.parametrize("make_constraints", [None, with_rules, with_rooms, with_rules_and_rooms])
+@pytest.mark.parametrize("seed", [0, 1])
+def test_repair_keeps_hard_rules(seed, make_constraints):
+    timeslots, _ = build_grid(DAYS, 6)
+    classes, teachers, assignments = synthetic_department("medium", "tight", seed)
+    constraints = make_constraints(classes, teachers, assignments, timeslots) if make_constraints else None
+    # One trial as the start: schedule_best_of_n would stop at the pre-solve
+    # bounds when the rooms are too few for every lab
+    result = try_place_once_bitset(classes, teachers, assignments, timeslots, seed=seed, constraints=constraints) + ({"elapsed": 0.0},)
+    assert result[2], "the start must leave units for repair to place"
+    class_table, teacher_table, remaining, meta = repair_result(classes, teachers, assignments, timeslots, result, 0.5, seed=seed, constraints=constraints)
+    assert meta["repaired"] > 0
+    assert len(remaining) < len(result[2])
+    assert hard_violations(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining, constraints) == []
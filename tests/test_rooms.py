@@ -0,0 +1,57 @@
+# tests/test_rooms.py
+# Rooms are counted per slot while placing and only booked afterwards
+
+from timetable_engine import (
+    Assignment, ClassGroup, Constraints, Teacher, build_grid, repair_solution,
+    schedule_best_of_n, schedule_cp, schedule_incremental, expand_units,
+)
+from timetable_engine.rooms import book_in_start_order, room_pool
+
+
+def fragmented():
+    # One Lab room for two classes and one day of four periods. Single labs
+    # pinned at P1 and P3 and a double at P2-P3 leave room for the free double
+    # lab only at P1-P2, split across both places of the room.
+    timeslots, _ = build_grid(["Mon"], 4)
+    classes = [ClassGroup(i, f"C{i}") for i in range(1, 5)]
+    teachers = [Teacher(i, f"T{i}", []) for i in range(1, 5)]
+    assignments = [Assignment(1, 1, 1, "A", "Lab", 1), Assignment(2, 2, 2, "B", "Lab", 1),
+                   Assignment(3, 3, 3, "C", "Lab", 2), Assignment(4, 4, 4, "D", "Lab", 2)]
+    constraints = Constraints(pinned={1: ["Mon-P1"], 2: ["Mon-P3"], 3: ["Mon-P2"]})
+    constraints.add_room("Lab", "Lab", 2)
+    return classes, teachers, assignments, timeslots, constraints
+
+
+def assert_rooms_within_capacity(class_table, capacity):
+    for s in range(len(next(iter(class_table.values())))):
+        rooms = [row[s]["room"] for row in class_table.values() if row[s] and row[s].get("room")]
+        assert all(rooms.count(name) <= capacity for name in rooms)
+
+
+def test_every_solver_fits_around_fragmented_rooms():
+    classes, teachers, assignments, timeslots, constraints = fragmented()
+    runs = {
+        "cp": schedule_cp(classes, teachers, assignments, timeslots, seed=1, constraints=constraints),
+        "bitset": schedule_best_of_n(classes, teachers, assignments, timeslots, trials=5, seed=1, constraints=constraints, decompose=False),
+        "lists": schedule_best_of_n(classes, teachers, assignments, timeslots, trials=5, seed=1, constraints=constraints, backend="Lists", decompose=False),
+        "adaptive": schedule_best_of_n(classes, teachers, assignments, timeslots, trials=5, seed=1, constraints=constraints, adaptive=True),
+    }
+    empty_classes = {c.id: [None]*len(timeslots) for c in classes}
+    empty_teachers = {t.id: [None]*len(timeslots) for t in teachers}
+    runs["repair"] = repair_solution(classes, teachers, assignments, timeslots, empty_classes, empty_teachers,
+                                     expand_units(assignments), time_budget=1, seed=1, constraints=constraints)
+    runs["incremental"] = schedule_incremental(classes, teachers, assignments, timeslots, empty_classes, seed=1, constraints=constraints)
+    for name, (class_table, _, remaining, _) in runs.items():
+        assert not remaining, name
+        assert_rooms_within_capacity(class_table, 2)
+
+
+def test_book_in_start_order_breaks_ties_by_unit():
+    _, _, assignments, _, constraints = fragmented()
+    pool = room_pool(constraints)
+    unit_rooms = pool.unit_rooms(assignments)
+    blocks = [1, 1, 2, 2]
+    forward = book_in_start_order(pool, unit_rooms, {0: 0, 3: 0, 2: 1}, blocks)
+    backward = book_in_start_order(pool, unit_rooms, {2: 1, 3: 0, 0: 0}, blocks)
+    assert list(forward) == list(backward)
+    assert forward[0] != forward[3]
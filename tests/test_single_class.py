@@ -0,0 +1,68 @@
+# tests/test_single_class.py
+# The memoized single-class search must agree with the original exhaustive one
+
+import random
+from collections import Counter
+
+from timetable_engine import create_single_class_timetable
+from timetable_engine.deadline import FEASIBLE_PARTIAL, INVALID, OPTIMAL
+
+from baseline_single_class import baseline_feasible
+
+CATEGORIES = ["Laboratory", "Laboratory", "Open Elective", "Main subject 1", "Professional Elective 1", "Other"]
+
+
+def random_subjects(rng, cells):
+    # Up to six subjects filling at most ``cells`` periods; odd-length labs are
+    # one long block, which is what makes some of these lists impossible
+    subjects = []
+    if rng.random() < 0.4:
+        subjects += [{"subject": "Lib", "category": "Library", "staff": "L", "periods": 1},
+                     {"subject": "Men", "category": "Mentoring", "staff": "M", "periods": 1}]
+    total = sum(s["periods"] for s in subjects)
+    for i in range(6):
+        category = rng.choice(CATEGORIES)
+        periods = {"Open Elective": 4, "Laboratory": rng.choice([1, 2, 3, 3, 4])}.get(category, rng.randint(1, 5))
+        if total + periods > cells:
+            break
+        total += periods
+        subjects.append({"subject": f"S{i}", "category": category, "staff": f"T{i}", "periods": periods})
+    return subjects
+
+
+def assert_valid(schedule, subjects, num_days):
+    # Every subject gets its periods and main / professional subjects stay at 3 a day
+    cells = Counter(cell for row in schedule for cell in row if cell.strip())
+    for s in subjects:
+        if s["category"] not in ("Library", "Mentoring"):
+            assert cells[f"{s['subject']} ({s['staff']})"] == s["periods"], s
+    for row in schedule:
+        day = Counter(row)
+        for s in subjects:
+            if s["category"].startswith(("Main subject", "Professional Elective")):
+                assert day[f"{s['subject']} ({s['staff']})"] <= 3
+    assert len(schedule) == num_days
+
+
+def test_agrees_with_baseline_on_feasibility():
+    rng = random.Random(7)
+    days = ["Mon", "Tue", "Wed"]
+    seen = Counter()
+    for case in range(300):
+        subjects = random_subjects(rng, len(days) * 4)
+        expected = baseline_feasible(subjects, len(days), 4)
+        schedule, _, status = create_single_class_timetable(subjects, seed=case, days=days, slots_per_day=4)
+        assert (status == OPTIMAL) == expected, (case, subjects, status)
+        assert status in (OPTIMAL, FEASIBLE_PARTIAL, INVALID)
+        if status == OPTIMAL:
+            assert_valid(schedule, subjects, len(days))
+        seen[status] += 1
+    assert seen[OPTIMAL] and seen[FEASIBLE_PARTIAL] and seen[INVALID], seen
+
+
+def test_rejected_input_is_invalid_not_partial():
+    for subjects in ([{"subject": "Chem", "category": "Laboratory", "staff": "a", "periods": 1}],
+                     [{"subject": "Lib", "category": "Library", "staff": "a", "periods": 1}],
+                     [{"subject": "Maths", "category": "Main subject 1", "staff": "a", "periods": 41}]):
+        schedule, _, status = create_single_class_timetable(subjects)
+        assert schedule is None and status == INVALID
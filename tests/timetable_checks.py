@@ -0,0 +1,102 @@
+# tests/timetable_checks.py
+# Hard-rule checks for finished department tables, written against the rules
+# themselves rather than the solvers' own bookkeeping
+
+from timetable_engine.department import periods_in_day
+
+
+def hard_violations(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining, constraints=None):
+    """Messages for every hard rule the tables break (empty when they are valid).
+
+    Checks that the class and teacher tables mirror each other, that each class
+    has every subject in at most one lesson a day (a single run of cells no
+    longer than the subject's longest block), that placed plus ``remaining``
+    periods add up to each assignment's periods, and, with ``constraints``,
+    unavailable cells, pins and room capacity.
+    """
+    problems = []
+    num_slots = len(timeslots)
+    ppd = periods_in_day(timeslots)
+    slot_of = {label: s for s, label in enumerate(timeslots)}
+
+    for cid, row in class_table.items():
+        for s, cell in enumerate(row):
+            if cell is None:
+                continue
+            mirror = teacher_table[cell["teacher_id"]][s]
+            if mirror is None or mirror["class_id"] != cid or mirror["subject"] != cell["subject"] or mirror.get("room") != cell.get("room"):
+                problems.append(f"class {cid} slot {s}: teacher table has {mirror}")
+    for tid, row in teacher_table.items():
+        for s, cell in enumerate(row):
+            if cell is not None and class_table[cell["class_id"]][s] is None:
+                problems.append(f"teacher {tid} slot {s}: class {cell['class_id']} is empty there")
+
+    longest = {}
+    periods = {}
+    for a in assignments:
+        key = (a.class_id, a.subject)
+        double = a.category == "Lab" or a.subject.strip().upper() == "TP"
+        longest[key] = max(longest.get(key, 1), 2 if double and a.periods_per_week >= 2 else 1)
+        periods[(a.class_id, a.teacher_id, a.subject)] = periods.get((a.class_id, a.teacher_id, a.subject), 0) + a.periods_per_week
+    for cid, row in class_table.items():
+        for d in range(num_slots // ppd):
+            cells = {}
+            for p in range(ppd):
+                cell = row[d*ppd + p]
+                if cell is not None:
+                    cells.setdefault(cell["subject"], []).append(p)
+            for subject, ps in cells.items():
+                if ps[-1] - ps[0] + 1 != len(ps) or len(ps) > longest.get((cid, subject), 0):
+                    problems.append(f"class {cid} day {d}: {subject} at periods {ps}")
+
+    placed = {}
+    for cid, row in class_table.items():
+        for cell in row:
+            if cell is not None:
+                key = (cid, cell["teacher_id"], cell["subject"])
+                placed[key] = placed.get(key, 0) + 1
+    for unit in remaining:
+        key = (unit["class_id"], unit["teacher_id"], unit["subject"])
+        placed[key] = placed.get(key, 0) + unit["block"]
+    for key in set(placed) | set(periods):
+        if placed.get(key, 0) != periods.get(key, 0):
+            problems.append(f"{key}: {placed.get(key, 0)} periods placed or left, {periods.get(key, 0)} requested")
+
+    if not constraints:
+        return problems
+    for cid, labels in constraints.class_unavailable.items():
+        for label in labels:
+            if label in slot_of and class_table[cid][slot_of[label]] is not None:
+                problems.append(f"class {cid} taught at unavailable {label}")
+    for tid, labels in constraints.teacher_unavailable.items():
+        for label in labels:
+            if label in slot_of and teacher_table[tid][slot_of[label]] is not None:
+                problems.append(f"teacher {tid} teaches at unavailable {label}")
+    by_id = {a.id: a for a in assignments}
+    for aid, labels in constraints.pinned.items():
+        a = by_id[aid]
+        for label in labels:
+            cell = class_table[a.class_id][slot_of[label]]
+            if cell is None or cell["subject"] != a.subject or cell["teacher_id"] != a.teacher_id:
+                problems.append(f"assignment {aid} not at its pin {label}")
+    rooms = {room.name: room for room in constraints.rooms}
+    categories = {room.category for room in constraints.rooms}
+    category = {(a.class_id, a.teacher_id, a.subject): a.category for a in assignments}
+    for s in range(num_slots):
+        used = {}
+        for cid, row in class_table.items():
+            cell = row[s]
+            if cell is None:
+                continue
+            needs = category[(cid, cell["teacher_id"], cell["subject"])] in categories
+            room = rooms.get(cell.get("room"))
+            if needs and (room is None or room.category != category[(cid, cell["teacher_id"], cell["subject"])]):
+                problems.append(f"class {cid} slot {s}: {cell['subject']} has room {cell.get('room')}")
+            elif not needs and "room" in cell:
+                problems.append(f"class {cid} slot {s}: {cell['subject']} needs no room")
+            if room is not None:
+                used[room.name] = used.get(room.name, 0) + 1
+        for name, count in used.items():
+            if count > rooms[name].capacity:
+                problems.append(f"slot {s}: {count} classes in {name}, capacity {rooms[name].capacity}")
+    return problems
@@ -0,0 +1,29 @@
+# timetable_engine
+# Scheduling engine behind website.py, importable without Streamlit (pandas is loaded lazily)
+
+from .models import Teacher, ClassGroup, Assignment, Room
+from .registry import Registry
+from .cache import ResultCache, problem_key
+from .deadline import Deadline, OPTIMAL, FEASIBLE_PARTIAL, TIMED_OUT, INFEASIBLE, INVALID
+from .constraints import Constraints, unit_starts, conflicts
+from .feasibility import analyze, any_violation
+from .quality import SoftScorer, Occupancy, SOFT_TERMS, DEFAULT_WEIGHTS
+from .stats import SolverStats, REJECTIONS
+from .department import (
+    build_grid, compute_totals, diagnose, has_overload, expand_units,
+    try_place_once, try_place_once_bitset, PLACEMENT_BACKENDS,
+    schedule_best_of_n, score_result,
+)
+from .units import unit_blocks, UnitTable, CATEGORIES
+from .rooms import RoomPool, room_pool
+from .solution import Layout, Solution, place_once_compact
+from .parallel import schedule_best_of_n_parallel, default_workers
+from .components import split_components, schedule_components
+from .adaptive import place_once_guided, schedule_adaptive
+from .cp import schedule_cp
+from .repair import repair_solution, repair_result
+from .incremental import split_previous, schedule_incremental
+from .single_class import create_single_class_timetable, create_batch_timetables
+from .store import ProjectStore, Project
+from .loaders import EXCEL_COLUMNS, BATCH_COLUMNS, state_to_json, state_from_json, constraints_from_json, entities_from_frame, batch_from_frame, load_excel, load_inputs
+from .render import grid_rows, write_grid_csv, period_header, all_grids, export_zip, export_xlsx
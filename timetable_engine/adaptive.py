@@ -0,0 +1,272 @@
+# timetable_engine/adaptive.py
+# Adaptive best-of-N: each trial learns from the ones before it. Units that were
+# left unplaced go earlier next time (squeaky-wheel ordering), the class and
+# teacher periods that kept failing units out are tried later by that class's
+# or teacher's other units, and the run stops once the best result has not
+# improved for a while.
+
+import random
+import time
+from array import array
+
+from .deadline import as_deadline, run_status
+from .department import diagnose, has_overload, score_result
+from .repair import repair_result
+from .solution import Layout, Solution, _tally
+from .stats import profiling
+from .units import KINDS
+
+# How far a class's or teacher's most contested slot is pushed back in their
+# units' slot order: 0 is a plain shuffle, 1 puts it after every uncontested slot
+SLOT_BIAS = 0.5
+# Learning is reset this many times when the best result stalls, before giving up
+RESTARTS = 2
+
+
+def empty_heat(layout):
+    """Zero heat for place_once_guided: one row of slots per class, then per teacher."""
+    return [[0]*layout.num_slots for _ in range(len(layout.class_ids) + len(layout.teacher_ids))]
+
+
+def slot_bias(heat):
+    """Per-row slot bias for place_once_guided from the learned ``heat``; a row
+    is None while its heat is all 0."""
+    bias = []
+    for row in heat:
+        top = max(row)
+        bias.append([SLOT_BIAS*h/top for h in row] if top else None)
+    return bias
+
+
+def _free_starts(busy, block):
+    # Starts from which ``busy`` is clear for ``block`` periods
+    free = ~busy
+    mask = free
+    for k in range(1, block):
+        mask &= free >> k
+    return mask
+
+
+def _heat_up(row, busy, starts, block):
+    # +1 for each busy period inside a block placed at any of ``starts``
+    span = (1 << block) - 1
+    while starts:
+        low = starts & -starts
+        taken = busy & (span << (low.bit_length() - 1))
+        while taken:
+            bit = taken & -taken
+            row[bit.bit_length() - 1] += 1
+            taken ^= bit
+        starts ^= low
+
+
+def place_once_guided(layout, rng, priority, slot_bias=None, heat=None, scorer=None, stats=None):
+    """One greedy trial like place_once_compact, steered by earlier trials.
+
+    Units are placed by descending ``priority`` (longest blocks first among
+    equals, random order otherwise). Each unit tries its starts in a random
+    order tilted by its class's and teacher's rows of ``slot_bias`` (0..1
+    per slot, higher goes later; None for a plain shuffle). ``heat`` (see
+    empty_heat) learns those rows: when a unit finds no start, each start
+    that only its class's other lessons took away adds +1 to the class's
+    row at the periods they hold, and likewise for its teacher. Starts lost
+    to both, or to the room or one-lesson-per-day rule, are not counted:
+    no single class or teacher could have left them free. Draws from
+    ``rng``, not the global random module.
+    """
+    num_slots = layout.num_slots
+    ppd = layout.periods_per_day
+    units = layout.units
+    u_class, u_teacher, u_group, u_block, u_kind = units.cls, units.teacher, units.group, units.block, units.kind
+    num_days = len(layout.day_masks)
+    num_classes = len(layout.class_ids)
+    day_masks, allowed, pins, slot_range, neg_block = layout.day_masks, layout.allowed, layout.pins, layout.slot_range, layout.neg_block
+
+    class_busy = [0]*len(layout.class_ids)
+    teacher_busy = [0]*len(layout.teacher_ids)
+    group_days = [0]*units.num_groups
+    class_slots = array("i", [-1]) * (len(layout.class_ids) * num_slots)
+    unit_rooms = layout.unit_rooms
+    if unit_rooms is not None:
+        room_load = layout.rooms.load(num_slots)
+
+    order = list(range(len(units)))
+    rng.shuffle(order)
+    order.sort(key=lambda u: (-priority[u], neg_block[u]))
+
+    remaining = []
+    placed_count = 0
+    for u, sidx in pins.items():
+        block = u_block[u]
+        block_mask = ((1 << block) - 1) << sidx
+        class_busy[u_class[u]] |= block_mask
+        teacher_busy[u_teacher[u]] |= block_mask
+        group_days[u_group[u]] |= day_masks[sidx // ppd]
+        if unit_rooms is not None and unit_rooms[u] is not None:
+            room_load.book(unit_rooms[u], sidx, block)
+        base = u_class[u]*num_slots + sidx
+        for k in range(block):
+            class_slots[base + k] = u
+        placed_count += block
+
+    rnd = rng.random
+    lab = KINDS.index("lab")
+    for u in order:
+        if pins and u in pins:
+            continue
+        block = u_block[u]
+        c = u_class[u]
+        t = u_teacher[u]
+        g = u_group[u]
+
+        class_bias = teacher_bias = None
+        if slot_bias is not None:
+            class_bias, teacher_bias = slot_bias[c], slot_bias[num_classes + t]
+        if class_bias is None and teacher_bias is None:
+            slot_order = slot_range[:]
+            rng.shuffle(slot_order)
+        elif teacher_bias is None:
+            slot_order = sorted(slot_range, key=lambda s: class_bias[s] - rnd())
+        elif class_bias is None:
+            slot_order = sorted(slot_range, key=lambda s: teacher_bias[s] - rnd())
+        else:
+            slot_order = sorted(slot_range, key=lambda s: class_bias[s] + teacher_bias[s] - rnd())
+
+        free = ~(class_busy[c] | teacher_busy[t] | group_days[g])
+        candidates = allowed[u] & free
+        for k in range(1, block):
+            candidates &= free >> k
+        r = room_ok = None
+        if unit_rooms is not None:
+            r = unit_rooms[u]
+            if r is not None:
+                room_ok = room_load.starts(r, block)
+                candidates &= room_ok
+
+        if stats is not None:
+            _tally(stats, layout, u, slot_order, candidates, scorer is not None, class_busy[c], teacher_busy[t], room_ok)
+        if not candidates:
+            remaining.append(u)
+            if heat is not None:
+                class_ok = _free_starts(class_busy[c], block)
+                teacher_ok = _free_starts(teacher_busy[t], block)
+                rest = allowed[u] & _free_starts(group_days[g], block)
+                if room_ok is not None:
+                    rest &= room_ok
+                _heat_up(heat[c], class_busy[c], rest & teacher_ok & ~class_ok, block)
+                _heat_up(heat[num_classes + t], teacher_busy[t], rest & class_ok & ~teacher_ok, block)
+            continue
+
+        if scorer is not None:
+            cost = scorer.placement_cost
+            busy = teacher_busy[t]
+            best_cost = None
+            for sidx in slot_order:
+                if (candidates >> sidx) & 1:
+                    c_cost = cost(busy, sidx, block, u_kind[u] == lab, ppd, num_days)
+                    if best_cost is None or c_cost < best_cost:
+                        best_cost, best_sidx = c_cost, sidx
+            slot_order = (best_sidx,)
+
+        for sidx in slot_order:
+            if not (candidates >> sidx) & 1:
+                continue
+            block_mask = ((1 << block) - 1) << sidx
+            class_busy[c] |= block_mask
+            teacher_busy[t] |= block_mask
+            group_days[g] |= day_masks[sidx // ppd]
+            if r is not None:
+                room_load.book(r, sidx, block)
+            base = c*num_slots + sidx
+            for k in range(block):
+                class_slots[base + k] = u
+            placed_count += block
+            break
+
+    return Solution(layout, class_slots, remaining, placed_count)
+
+
+def schedule_adaptive(classes, teachers, assignments, timeslots, trials=300, st_progress=None, seed=None, repair_seconds=0.0, deadline=None, constraints=None, scorer=None, stats=None, patience=None):
+    """Best-of-N where each trial is guided by the earlier ones.
+
+    After every trial the units it left unplaced gain priority, and the class
+    and teacher periods that kept them out gain heat, which makes that class's
+    or teacher's other units try those periods later. When the best result
+    has not improved for ``patience`` trials (default: a third of
+    ``trials``, at least 50) the learned priorities and heat are reset, up
+    to RESTARTS times; the next stall ends the run.
+    Otherwise the run ends like schedule_best_of_n's: at the first complete
+    (and, with a scorer, penalty-free) trial, after ``trials`` trials or at
+    the deadline. Trials run in this process on the compact Layout.
+
+    Returns (class_table, teacher_table, remaining, meta) like
+    schedule_best_of_n; meta adds "restarts" and "plateau" (True if the run
+    stopped because it stalled).
+    """
+    deadline = as_deadline(deadline)
+    num_slots = len(timeslots)
+    if has_overload(classes, teachers, assignments, num_slots, constraints, timeslots):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+
+    layout = Layout(classes, teachers, assignments, timeslots, constraints=constraints)
+    if patience is None:
+        patience = max(50, trials // 3)
+    rng = random.Random(seed)
+    priority = [0]*len(layout.units)
+    heat = empty_heat(layout)
+    best = None
+    best_remaining = None
+    best_placed_count = -1
+    best_penalty = 0
+    stalled = restarts = ran = 0
+    timed_out = plateau = False
+    start = time.time()
+    with profiling(stats):
+        for t in range(trials):
+            if t and deadline.expired():
+                timed_out = True
+                break
+            ran += 1
+            trial_start = time.perf_counter()
+            trial = place_once_guided(layout, rng, priority, slot_bias(heat), heat, scorer, stats)
+            if stats is not None:
+                stats.trials += 1
+                stats.trial_seconds.append(time.perf_counter() - trial_start)
+            for u in trial.remaining:
+                priority[u] += 1
+            # Same ranking as schedule_best_of_n: fewest left, most placed, lowest penalty
+            rem_count, placed_count = trial.remaining_count, trial.placed_count
+            better = best is None or rem_count < best_remaining or (rem_count == best_remaining and placed_count > best_placed_count)
+            if scorer is not None and (better or (rem_count, placed_count) == (best_remaining, best_placed_count)):
+                penalty = scorer.score_solution(trial)[0]
+                better = better or penalty < best_penalty
+            if better:
+                best, best_remaining, best_placed_count = trial, rem_count, placed_count
+                if scorer is not None:
+                    best_penalty = penalty
+                stalled = 0
+                if best_remaining == 0 and (scorer is None or best_penalty == 0):
+                    break
+            else:
+                stalled += 1
+                if stalled >= patience:
+                    if restarts == RESTARTS:
+                        plateau = True
+                        break
+                    restarts += 1
+                    stalled = 0
+                    priority = [0]*len(layout.units)
+                    heat = empty_heat(layout)
+            if st_progress is not None:
+                bar, status = st_progress
+                bar.progress(int(max((t+1)/trials, deadline.fraction_used())*100))
+                if (t+1) % max(1, trials//10) == 0:
+                    status.text(f"Adaptive trials {t+1}/{trials} — best remaining {best_remaining}" + (f", penalty {best_penalty}" if scorer is not None else "") + (f", restart {restarts}" if restarts else ""))
+
+    meta = {"best_remaining": best_remaining, "placed": best_placed_count, "elapsed": time.time() - start, "trials": ran,
+            "status": run_status(best.remaining, timed_out), "restarts": restarts, "plateau": plateau, "solution": best}
+    if stats is not None:
+        meta["stats"] = stats.as_dict()
+    class_table, teacher_table, remaining = best.tables()
+    result = repair_result(classes, teachers, assignments, timeslots, (class_table, teacher_table, remaining, meta), repair_seconds, seed=seed, st_progress=st_progress, deadline=deadline, constraints=constraints)
+    return score_result(result, scorer, assignments, timeslots)
@@ -0,0 +1,305 @@
+# timetable_engine/bench.py
+# Solver benchmarks on seeded synthetic departments, written as JSON so runs of
+# two versions can be compared: python -m timetable_engine.bench --out bench.json
+
+import argparse
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from .adaptive import empty_heat, place_once_guided, slot_bias
+from .cp import schedule_cp
+from .deadline import OPTIMAL, Deadline, combined_status
+from .department import build_grid, expand_units, has_overload, schedule_best_of_n, trial_seeds, PLACEMENT_BACKENDS
+from .models import Assignment, ClassGroup, Teacher
+from .single_class import DAYS, SLOTS_PER_DAY, create_single_class_timetable
+from .solution import Layout, place_once_compact
+
+FORMAT_VERSION = 1
+
+# Number of classes per department size; teachers follow from the utilization
+SCALES = {"small": 4, "medium": 24, "university": 160}
+# Share of every class's (and, on average, every teacher's) week that is taught
+UTILIZATIONS = {"loose": 0.7, "tight": 0.95}
+SOLVERS = ("trials-Bitset", "trials-Lists", "trials-Adaptive", "cp", "single-class")
+PERIODS_PER_DAY = 6
+
+# Metrics where a larger value is better; the rest are better smaller
+HIGHER_IS_BETTER = ("trials_per_sec", "nodes_per_sec", "classes_per_sec")
+COMPARED = HIGHER_IS_BETTER + ("time_to_first_complete", "trials_to_first_complete", "best_remaining", "peak_kib")
+
+
+def synthetic_department(scale="small", utilization="loose", seed=0, days=DAYS, periods_per_day=PERIODS_PER_DAY):
+    """(classes, teachers, assignments) for a department of ``scale`` classes.
+
+    Every class is filled to ``utilization`` of its week with Theory, Lab,
+    Library and Mentoring subjects, and just enough teachers are created to
+    teach it all at the same utilization. Subjects keep to the pre-solve bounds
+    (at most one lesson per day, two-period blocks within the free pairs), so
+    the instances are hard but not rejected outright. The same arguments
+    always give the same instance.
+    """
+    rng = random.Random(f"{scale}-{utilization}-{seed}")
+    num_days = len(days)
+    num_slots = num_days * periods_per_day
+    share = UTILIZATIONS[utilization]
+    per_class = round(share * num_slots)
+    classes = [ClassGroup(i, f"C{i}") for i in range(1, SCALES[scale] + 1)]
+    teachers = [Teacher(i, f"T{i}", []) for i in range(1, max(2, math.ceil(len(classes) * per_class / (share * num_slots))) + 1)]
+    load = {t.id: 0 for t in teachers}
+    doubles = {t.id: 0 for t in teachers}
+    max_doubles = num_days * (periods_per_day // 2)
+
+    def pick_teacher(periods, pairs):
+        # Least loaded of a few random teachers, falling back to anyone with room
+        sample = rng.sample(teachers, min(3, len(teachers)))
+        for group in (sample, teachers):
+            fitting = [t for t in group if load[t.id] + periods <= num_slots and doubles[t.id] + pairs <= max_doubles]
+            if fitting:
+                return min(fitting, key=lambda t: load[t.id]).id
+        teacher = Teacher(len(teachers) + 1, f"T{len(teachers) + 1}", [])
+        teachers.append(teacher)
+        load[teacher.id] = doubles[teacher.id] = 0
+        return teacher.id
+
+    assignments = []
+    for c in classes:
+        left = per_class
+        k = 0
+        while left > 0:
+            category = rng.choices(["Theory", "Lab", "Library", "Mentoring"], weights=[6, 2, 1, 1])[0]
+            if category == "Theory":
+                periods = rng.randint(2, num_days)
+            elif category == "Lab":
+                periods = rng.choice([2, 4])
+            else:
+                periods = 1
+            periods = min(periods, left)
+            pairs = periods // 2 if category == "Lab" else 0
+            tid = pick_teacher(periods, pairs)
+            load[tid] += periods
+            doubles[tid] += pairs
+            assignments.append(Assignment(len(assignments) + 1, tid, c.id, f"S{k}", category, periods))
+            left -= periods
+            k += 1
+    return classes, teachers, assignments
+
+
+def synthetic_class(utilization="loose", seed=0, days=DAYS, slots_per_day=SLOTS_PER_DAY):
+    """Subject list for create_single_class_timetable, filled to ``utilization``."""
+    rng = random.Random(f"class-{utilization}-{seed}")
+    left = round(UTILIZATIONS[utilization] * len(days) * slots_per_day) - 2
+    subjects = [{"category": "Library", "subject": "LIB", "staff": "Librarian", "periods": 1},
+                {"category": "Mentoring", "subject": "MENT", "staff": "Mentor", "periods": 1}]
+    k = 0
+    while left > 0:
+        category = rng.choice(["Laboratory", "Main subject 1", "Main subject 2", "Professional Elective 1", "Project"])
+        periods = {"Laboratory": 4, "Project": 4}.get(category) or rng.randint(3, 6)
+        if periods > left:
+            category, periods = "Main subject 1", left
+        subjects.append({"category": category, "subject": f"S{k}", "staff": f"Staff{seed}-{k}", "periods": periods})
+        left -= periods
+        k += 1
+    return subjects
+
+
+def _measure(run):
+    # (result, wall seconds, peak traced KiB); the timed call runs untraced, since
+    # tracemalloc slows allocation-heavy code down, and is then repeated for memory
+    start = time.perf_counter()
+    result = run()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, seconds, round(peak / 1024)
+
+
+def _trial_rate(backend, classes, teachers, assignments, timeslots, seed, trials):
+    # Placement trials per second with no early stop, so every run does the same work
+    seeds = trial_seeds(trials, seed)
+    start = time.perf_counter()
+    if backend == "Bitset":
+        layout = Layout(classes, teachers, assignments, timeslots)
+        for s in seeds:
+            place_once_compact(layout, seed=s)
+    elif backend == "Adaptive":
+        # Guided trials, learning as they go as in schedule_adaptive
+        layout = Layout(classes, teachers, assignments, timeslots)
+        rng = random.Random(seed)
+        priority = [0]*len(layout.units)
+        heat = empty_heat(layout)
+        for _ in seeds:
+            for u in place_once_guided(layout, rng, priority, slot_bias(heat), heat).remaining:
+                priority[u] += 1
+    else:
+        place_once = PLACEMENT_BACKENDS[backend]
+        for s in seeds:
+            place_once(classes, teachers, assignments, timeslots, seed=s)
+    return trials / (time.perf_counter() - start)
+
+
+def run_case(solver, scale, utilization, seed=0, trials=300, time_budget=10.0, rate_trials=20):
+    """Benchmark one solver on one synthetic instance; returns a flat record.
+
+    ``time_to_first_complete`` is the wall time until a timetable with nothing
+    left unplaced exists (None if none was found within ``time_budget``):
+    the trials solvers stop at their first complete trial and CP at its first
+    complete assignment. The trials solvers also report the number of trials
+    that took as ``trials_to_first_complete``. "single-class" builds every class of the scale with
+    the single-class builder and is complete when all of them are.
+    """
+    record = {"solver": solver, "scale": scale, "utilization": utilization, "seed": seed}
+    if solver == "single-class":
+        class_subjects = [synthetic_class(utilization, seed * 1000 + i) for i in range(SCALES[scale])]
+
+        def run():
+            deadline = Deadline(time_budget)
+            return [create_single_class_timetable(subjects, seed=seed, deadline=deadline) for subjects in class_subjects]
+
+        results, seconds, peak = _measure(run)
+        requested = sum(s["periods"] for subjects in class_subjects for s in subjects)
+        placed = sum(1 for schedule, _, _ in results if schedule for row in schedule for cell in row if cell.strip())
+        status = combined_status(status for _, _, status in results)
+        complete = status == OPTIMAL
+        record.update({"classes": len(class_subjects), "periods": requested, "units": requested,
+                       "status": status, "best_remaining": requested - placed,
+                       "time_to_first_complete": seconds if complete else None, "elapsed": seconds,
+                       "classes_per_sec": len(class_subjects) / seconds, "peak_kib": peak})
+        return record
+
+    classes, teachers, assignments = synthetic_department(scale, utilization, seed)
+    timeslots, _ = build_grid(DAYS, PERIODS_PER_DAY)
+    record.update({"classes": len(classes), "teachers": len(teachers), "assignments": len(assignments),
+                   "periods": sum(a.periods_per_week for a in assignments), "units": len(expand_units(assignments))})
+    if has_overload(classes, teachers, assignments, len(timeslots), None, timeslots):
+        record["status"] = "rejected"
+        return record
+
+    if solver == "cp":
+        def run():
+            return schedule_cp(classes, teachers, assignments, timeslots, seed=seed, deadline=time_budget, max_nodes=10**9)
+    else:
+        backend = solver.split("-", 1)[1]
+
+        def run():
+            if backend == "Adaptive":
+                return schedule_best_of_n(classes, teachers, assignments, timeslots, trials=trials, seed=seed, deadline=time_budget, adaptive=True)
+            return schedule_best_of_n(classes, teachers, assignments, timeslots, trials=trials, backend=backend, seed=seed, deadline=time_budget)
+
+    (_, _, remaining, meta), seconds, peak = _measure(run)
+    record.update({"status": meta["status"], "best_remaining": len(remaining),
+                   "time_to_first_complete": seconds if not remaining else None, "elapsed": seconds, "peak_kib": peak})
+    if solver == "cp":
+        record["nodes_per_sec"] = meta["nodes"] / seconds
+    else:
+        record["trials"] = meta["trials"]
+        record["trials_to_first_complete"] = meta["trials"] if not remaining else None
+        record["trials_per_sec"] = _trial_rate(backend, classes, teachers, assignments, timeslots, seed, rate_trials)
+    return record
+
+
+def run_suite(scales=tuple(SCALES), utilizations=tuple(UTILIZATIONS), solvers=SOLVERS, seeds=(0,), trials=300, time_budget=10.0, rate_trials=20, progress=None):
+    """Every solver on every (scale, utilization, seed); returns the JSON document."""
+    results = []
+    for scale in scales:
+        for utilization in utilizations:
+            for seed in seeds:
+                for solver in solvers:
+                    record = run_case(solver, scale, utilization, seed, trials, time_budget, rate_trials)
+                    results.append(record)
+                    if progress is not None:
+                        progress(record)
+    return {
+        "format": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"trials": trials, "time_budget": time_budget, "rate_trials": rate_trials,
+                     "days": len(DAYS), "periods_per_day": PERIODS_PER_DAY},
+        "results": results,
+    }
+
+
+def compare(baseline, current):
+    """Rows of (solver, scale, utilization, seed, metric, before, after, ratio)
+    for the metrics both runs report; ratio > 1 means ``current`` is better."""
+    before = {(r["solver"], r["scale"], r["utilization"], r["seed"]): r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        key = (r["solver"], r["scale"], r["utilization"], r["seed"])
+        old = before.get(key)
+        if old is None:
+            continue
+        for metric in COMPARED:
+            a, b = old.get(metric), r.get(metric)
+            if a is None or b is None:
+                continue
+            if metric in HIGHER_IS_BETTER:
+                ratio = b / a if a else None
+            else:
+                ratio = a / b if b else (1.0 if not a else None)
+            rows.append(key + (metric, a, b, ratio))
+    return rows
+
+
+def _names(text, known):
+    names = [n.strip() for n in text.split(",") if n.strip()]
+    unknown = [n for n in names if n not in known]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown: {', '.join(unknown)} (choose from {', '.join(known)})")
+    return names
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="timetable_engine.bench", description="Benchmark the solvers on seeded synthetic departments.")
+    parser.add_argument("--scales", type=lambda s: _names(s, SCALES), default=list(SCALES), help="Comma separated, from %(default)s")
+    parser.add_argument("--utilization", type=lambda s: _names(s, UTILIZATIONS), default=list(UTILIZATIONS), help="Comma separated, from %(default)s")
+    parser.add_argument("--solvers", type=lambda s: _names(s, SOLVERS), default=list(SOLVERS), help="Comma separated, from %(default)s")
+    parser.add_argument("--seeds", type=lambda s: [int(x) for x in s.split(",")], default=[0], help="Comma separated instance / solver seeds (default: 0)")
+    parser.add_argument("--trials", type=int, default=300, help="Trial limit for the trials solvers (default: %(default)s)")
+    parser.add_argument("--time-budget", type=float, default=10.0, help="Seconds per solver run (default: %(default)s)")
+    parser.add_argument("--rate-trials", type=int, default=20, help="Trials timed for trials/sec (default: %(default)s)")
+    parser.add_argument("--out", default=None, help="Write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", default=None, help="Earlier --out file to compare against")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+
+    def progress(r):
+        done = "-" if r.get("time_to_first_complete") is None else f"{r['time_to_first_complete']:.2f}s"
+        if r.get("trials_to_first_complete") is not None:
+            done += f" ({r['trials_to_first_complete']} trials)"
+        print(f"{r['solver']:>15} {r['scale']:>10} {r['utilization']:>5} seed {r['seed']}: {r['status']}, "
+              f"remaining {r.get('best_remaining', '-')}, first complete {done}, peak {r.get('peak_kib', '-')} KiB", file=sys.stderr)
+
+    report = run_suite(args.scales, args.utilization, args.solvers, args.seeds, args.trials, args.time_budget, args.rate_trials, progress)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    else:
+        print(text)
+
+    if baseline is not None:
+        for solver, scale, utilization, seed, metric, a, b, ratio in compare(baseline, report):
+            flag = "" if ratio is None or 0.9 <= ratio <= 1.1 else ("  better" if ratio > 1 else "  worse")
+            shown = "n/a" if ratio is None else f"{ratio:.2f}x"
+            print(f"{solver} {scale} {utilization} seed {seed} {metric}: {a:.4g} -> {b:.4g} ({shown}){flag}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+# timetable_engine/cache.py
+# Solved department timetables keyed by a content hash of the problem, with
+# least-recently-used eviction
+
+import hashlib
+import json
+from collections import OrderedDict
+
+
+def problem_key(teachers, classes, assignments, days, periods_per_day, settings):
+    """Hex digest identifying one scheduling problem and the solver settings used on it.
+
+    Built from entity content rather than object identity, so re-importing the
+    same file or JSON state gives the same key.
+    """
+    payload = {
+        "teachers": [[t.id, t.name, list(t.subjects)] for t in teachers],
+        "classes": [[c.id, c.name] for c in classes],
+        "assignments": [[a.id, a.teacher_id, a.class_id, a.subject, a.category, a.periods_per_week] for a in assignments],
+        "days": list(days),
+        "periods_per_day": int(periods_per_day),
+        "settings": settings,
+    }
+    text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """Bounded key -> result store; reading an entry makes it the most recent."""
+
+    def __init__(self, maxsize=8):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        if key not in self._entries:
+            return default
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
@@ -0,0 +1,141 @@
+# timetable_engine/cli.py
+# Headless department scheduling: python -m timetable_engine INPUT --out DIR
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+
+from .cp import schedule_cp
+from .department import build_grid, schedule_best_of_n, PLACEMENT_BACKENDS
+from .loaders import constraints_from_json, load_inputs
+from .quality import SoftScorer
+from .render import _unique, all_grids, export_xlsx, export_zip, grid_rows, period_header, write_grid_csv
+from .stats import SolverStats
+
+DEFAULT_DAYS = "Mon,Tue,Wed,Thu,Fri"
+
+
+def _print_stats(stats, class_names, teacher_names, profile_limit):
+    summary = stats.as_dict()
+    times = summary["trial_seconds"]
+    out = sys.stderr
+    if summary["trials"]:
+        print(f"trials: {summary['trials']} (mean {times['mean']*1000:.2f} ms, max {times['max']*1000:.2f} ms)", file=out)
+        print(f"slots probed: {summary['slots_probed']}", file=out)
+        print("rejections: " + ", ".join(f"{reason}={count}" for reason, count in summary["rejections"].items()), file=out)
+        for row in summary["unplaced"]:
+            print(f"  left unplaced {row['count']} time(s): {row['subject']} ({class_names.get(row['class_id'])} / {teacher_names.get(row['teacher_id'])})", file=out)
+    if summary["nodes"]:
+        print(f"search nodes: {summary['nodes']}, deepest: {summary['max_depth']}, dead ends: {summary['dead_ends']}", file=out)
+    if profile_limit is not None:
+        pstats.Stats(stats.profiler, stream=out).sort_stats("cumulative").print_stats(profile_limit)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="timetable_engine", description="Generate department timetables without the Streamlit UI.")
+    parser.add_argument("input", help="Excel sheet (.xlsx) with Teacher/Class/Subject/Category/Periods/week columns, or a JSON state file")
+    parser.add_argument("--out", default="timetables", help="Directory for the class_*.csv and teacher_*.csv files (default: %(default)s)")
+    parser.add_argument("--format", choices=["csv", "zip", "xlsx"], default="csv", help="One CSV per class / teacher, or everything in one timetables.zip / timetables.xlsx (default: %(default)s)")
+    parser.add_argument("--days", default=DEFAULT_DAYS, help="Comma separated weekdays in order (default: %(default)s)")
+    parser.add_argument("--periods-per-day", type=int, default=6)
+    parser.add_argument("--solver", choices=["trials", "cp"], default="trials", help="Randomized best-of-N trials or constraint propagation (default: %(default)s)")
+    parser.add_argument("--trials", type=int, default=300)
+    parser.add_argument("--backend", choices=list(PLACEMENT_BACKENDS), default="Bitset")
+    parser.add_argument("--repair-seconds", type=float, default=2.0, help="Local-search repair budget when trials leave units unplaced; 0 disables (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=1, help="Process pool size; 1 runs the trials in-process")
+    parser.add_argument("--seed", type=int, default=None, help="Master seed for reproducible runs")
+    parser.add_argument("--time-budget", type=float, default=None, help="Wall-clock limit in seconds; the best timetable found so far is written when it runs out")
+    parser.add_argument("--adaptive", action="store_true", help="Let each trial learn from the earlier ones (unplaced units first, contested slots last) and stop when the best result stalls (trials solver)")
+    parser.add_argument("--no-decompose", dest="decompose", action="store_false", help="Solve all classes and teachers together even when they split into groups that share no assignment")
+    parser.add_argument("--optimize-quality", action="store_true", help="Prefer timetables with fewer teacher gaps, long runs and lopsided days (trials solver)")
+    parser.add_argument("--stats", action="store_true", help="Print solver counters: slots probed, rejections by reason, trial times, search nodes")
+    parser.add_argument("--profile", type=int, nargs="?", const=25, default=None, metavar="N", help="Profile the solver with cProfile and print its N most expensive functions (default N: %(const)s)")
+    parser.add_argument("--constraints", default=None, help="JSON file with unavailable slots and pinned lessons (a state file's \"constraints\" section); a JSON input's own section is used by default")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    days = [d.strip() for d in args.days.split(",") if d.strip()]
+
+    try:
+        teachers, classes, assignments = load_inputs(args.input)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Could not read {args.input}: {e}", file=sys.stderr)
+        return 2
+    constraints_path = args.constraints or (args.input if args.input.lower().endswith(".json") else None)
+    constraints = None
+    if constraints_path:
+        try:
+            with open(constraints_path, encoding="utf-8") as fh:
+                constraints = constraints_from_json(fh.read())
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Could not read constraints from {constraints_path}: {e}", file=sys.stderr)
+            return 2
+    if not classes or not teachers or not assignments:
+        print("Input has no teachers, classes or assignments.", file=sys.stderr)
+        return 2
+
+    timeslots, _ = build_grid(days, args.periods_per_day)
+    stats = None
+    if args.stats or args.profile is not None:
+        stats = SolverStats(profiler=cProfile.Profile() if args.profile is not None else None)
+    if args.solver == "cp":
+        class_table, teacher_table, remaining, meta = schedule_cp(classes, teachers, assignments, timeslots, seed=args.seed, deadline=args.time_budget, constraints=constraints, stats=stats)
+    else:
+        class_table, teacher_table, remaining, meta = schedule_best_of_n(
+            classes, teachers, assignments, timeslots,
+            trials=args.trials, backend=args.backend, seed=args.seed, workers=args.workers,
+            repair_seconds=args.repair_seconds, deadline=args.time_budget, constraints=constraints,
+            scorer=SoftScorer() if args.optimize_quality else None, stats=stats, decompose=args.decompose, adaptive=args.adaptive,
+        )
+    if "diag" in meta:
+        problems = meta["diag"]["problems"]
+        for name, requested, available in problems["class_overload"]:
+            print(f"Class {name}: {requested} periods requested, {available} available", file=sys.stderr)
+        for name, requested, available in problems["teacher_overload"]:
+            print(f"Teacher {name}: {requested} periods requested, {available} available", file=sys.stderr)
+        for kind, name, blocks, pairs in problems["block_pairs"]:
+            print(f"{kind} {name}: {blocks} two-period lessons, {pairs} free pairs of adjacent periods", file=sys.stderr)
+        for name, subject, lessons, days in problems["subject_days"]:
+            print(f"Class {name}: {subject} has {lessons} lessons over {days} days", file=sys.stderr)
+        for name, cells, capacity in problems["day_capacity"]:
+            print(f"Class {name}: {cells} periods requested, room for {capacity} at one lesson per subject per day", file=sys.stderr)
+        for category, requested, available in problems["room_capacity"]:
+            print(f"Rooms for {category}: {requested} periods requested, {available} room periods in the week", file=sys.stderr)
+        for message in problems["pin_conflicts"]:
+            print(f"Pinned lesson {message}", file=sys.stderr)
+        print("Overload detected — schedule cannot be generated.", file=sys.stderr)
+        return 2
+    if stats is not None:
+        _print_stats(stats, {c.id: c.name for c in classes}, {t.id: t.name for t in teachers}, args.profile)
+
+    os.makedirs(args.out, exist_ok=True)
+    teacher_names = {t.id: t.name for t in teachers}
+    class_names = {c.id: c.name for c in classes}
+    if args.format == "csv":
+        # Names that clean up alike (e.g. "C/1" and "C_1") get a numeric suffix, as in the zip / xlsx export
+        used = set()
+        for c in classes:
+            matrix = grid_rows(class_table[c.id], days, args.periods_per_day, "teacher_id", teacher_names)
+            write_grid_csv(os.path.join(args.out, f"{_unique(f'class_{c.name}', used)}.csv"), days, args.periods_per_day, matrix)
+        for t in teachers:
+            matrix = grid_rows(teacher_table[t.id], days, args.periods_per_day, "class_id", class_names)
+            write_grid_csv(os.path.join(args.out, f"{_unique(f'teacher_{t.name}', used)}.csv"), days, args.periods_per_day, matrix)
+    else:
+        class_grids, teacher_grids = all_grids(class_table, days, args.periods_per_day, class_names, teacher_names)
+        export = export_zip if args.format == "zip" else export_xlsx
+        data = export(class_grids, teacher_grids, days, period_header(args.periods_per_day), class_names, teacher_names)
+        with open(os.path.join(args.out, f"timetables.{args.format}"), "wb") as fh:
+            fh.write(data)
+
+    print(f"status: {meta.get('status')}, best_remaining: {meta['best_remaining']}, placed: {meta['placed']}, time: {meta['elapsed']:.2f}s")
+    if "penalty" in meta:
+        print(f"penalty: {meta['penalty']} ({', '.join(f'{name}={value}' for name, value in meta['penalty_terms'].items())})")
+    if meta.get("status") == "infeasible":
+        print("Constraint search proved that no complete timetable exists.", file=sys.stderr)
+    for unit in remaining:
+        print(f"Unplaced: {unit['subject']} ({class_names.get(unit['class_id'])} / {teacher_names.get(unit['teacher_id'])})", file=sys.stderr)
+    return 0 if not remaining else 1
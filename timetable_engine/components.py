@@ -0,0 +1,189 @@
+# timetable_engine/components.py
+# Independent sub-problems: classes and teachers that are not linked by any chain
+# of assignments never compete for a slot, so each such group is solved on its
+# own (with workers > 1, several at once or each with its trials on a process
+# pool; see schedule_components) and the tables are merged.
+
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .deadline import Deadline, TIMED_OUT, as_deadline, run_status
+from .department import diagnose, has_overload, schedule_best_of_n, score_result, trial_seeds
+from .stats import SolverStats
+
+# Worker-process global, set by _init_worker: the parent sets it to cancel the run
+_cancel = None
+
+
+def split_components(classes, teachers, assignments, constraints=None):
+    """Connected components of the class–teacher graph, an assignment being an edge.
+
+    Returns a list of (classes, teachers, assignments), ordered by each group's
+    first assignment, with entities in their input order. Classes and teachers
+    without assignments belong to no group. Assignments whose category has
+    rooms in ``constraints`` compete for them, so they share one group.
+    """
+    room_categories = {r.category for r in constraints.rooms} if constraints else set()
+    parent = {}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a in assignments:
+        c, t = ("c", a.class_id), ("t", a.teacher_id)
+        rc, rt = find(parent.setdefault(c, c)), find(parent.setdefault(t, t))
+        if rc != rt:
+            parent[rt] = rc
+        if a.category in room_categories:
+            r = ("r", a.category)
+            rr, rc = find(parent.setdefault(r, r)), find(c)
+            if rr != rc:
+                parent[rr] = rc
+    groups = {}
+    for a in assignments:
+        groups.setdefault(find(("c", a.class_id)), ([], [], []))[2].append(a)
+    for c in classes:
+        if ("c", c.id) in parent:
+            groups[find(("c", c.id))][0].append(c)
+    for t in teachers:
+        if ("t", t.id) in parent:
+            groups[find(("t", t.id))][1].append(t)
+    return list(groups.values())
+
+
+class _ShareProgress:
+    """Maps one component's (bar, status) reports onto its share of the whole run."""
+
+    def __init__(self, st_progress, base, share, label):
+        self.bar, self.status = st_progress
+        self.base = base
+        self.share = share
+        self.label = label
+
+    def progress(self, value):
+        self.bar.progress(min(100, int(self.base + self.share*value/100)))
+
+    def text(self, message):
+        self.status.text(f"{self.label}: {message}")
+
+
+def _init_worker(cancel):
+    global _cancel
+    _cancel = cancel
+
+
+def _solve_component(group, timeslots, options, deadline_at, collect_stats):
+    # One component on a pool worker; the compact Solution stays behind, as it
+    # describes only this component's layout
+    classes, teachers, assignments = group
+    stats = SolverStats() if collect_stats else None
+    deadline = Deadline.until(deadline_at, cancel_event=_cancel)
+    result = schedule_best_of_n(classes, teachers, assignments, timeslots, deadline=deadline, stats=stats, decompose=False, **options)
+    result[3].pop("solution", None)
+    return result, stats
+
+
+def schedule_components(classes, teachers, assignments, timeslots, trials=300, st_progress=None, backend="Bitset", seed=None, workers=1, repair_seconds=0.0, deadline=None, constraints=None, scorer=None, stats=None, groups=None, adaptive=False):
+    """schedule_best_of_n, run separately on each connected component.
+
+    Every component gets up to ``trials`` trials and stops at its own first
+    complete (and, with a scorer, penalty-free) trial, so easy components
+    finish after one trial and the rest of the budget goes to the hard ones.
+    With ``workers`` > 1 and at least that many large components (each at
+    least half the size of the largest), or with ``adaptive`` trials, which
+    only run in-process, components run largest first on up to ``workers``
+    processes, each one's trials sequentially. Otherwise components run
+    smallest first in-process and each large one spreads its trials over
+    ``workers`` processes (see parallel.schedule_best_of_n_parallel), so one
+    big department next to a few isolated classes keeps its trial-level
+    parallelism. All share one ``deadline``. ``groups`` is split_components()' result, if
+    the caller already has it; ``adaptive`` is passed on to each component.
+
+    Returns (class_table, teacher_table, remaining, meta) like
+    schedule_best_of_n; meta["trials"] sums all components, and
+    meta["components"] lists each component's size, trials, trial workers,
+    leftovers and time.
+    """
+    deadline = as_deadline(deadline)
+    num_slots = len(timeslots)
+    if has_overload(classes, teachers, assignments, num_slots, constraints, timeslots):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+    if groups is None:
+        groups = split_components(classes, teachers, assignments, constraints)
+    seeds = trial_seeds(len(groups), seed)
+    sizes = [sum(a.periods_per_week for a in group[2]) for group in groups]
+    total = max(1, sum(sizes))
+    options = {"trials": trials, "backend": backend, "repair_seconds": repair_seconds, "constraints": constraints, "scorer": scorer, "adaptive": adaptive}
+    results = [None]*len(groups)
+    start = time.time()
+    large = [2*size >= max(sizes) for size in sizes]
+    component_pool = workers > 1 and len(groups) > 1 and (adaptive or sum(large) >= workers)
+
+    if component_pool:
+        ctx = multiprocessing.get_context()
+        cancel = ctx.Event()
+        done = 0
+        with ProcessPoolExecutor(max_workers=min(workers, len(groups)), mp_context=ctx, initializer=_init_worker, initargs=(cancel,)) as pool:
+            futures = {pool.submit(_solve_component, groups[i], timeslots, dict(options, seed=seeds[i]), deadline.at, stats is not None): i
+                       for i in sorted(range(len(groups)), key=lambda i: -sizes[i])}
+            pending = set(futures)
+            while pending:
+                finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    i = futures[fut]
+                    results[i], component_stats = fut.result()
+                    if component_stats is not None:
+                        stats.merge(component_stats)
+                    done += sizes[i]
+                if deadline.cancelled:
+                    cancel.set()
+                if st_progress is not None:
+                    bar, status = st_progress
+                    bar.progress(min(100, int(max(done/total, deadline.fraction_used())*100)))
+                    status.text(f"{len(groups) - len(pending)}/{len(groups)} independent groups solved on {min(workers, len(groups))} workers")
+    else:
+        base = 0.0
+        for n, i in enumerate(sorted(range(len(groups)), key=lambda i: sizes[i])):
+            share = 100*sizes[i]/total
+            progress = None
+            if st_progress is not None:
+                progress = _ShareProgress(st_progress, base, share, f"Group {n+1}/{len(groups)}")
+                progress = (progress, progress)
+            component_classes, component_teachers, component_assignments = groups[i]
+            results[i] = schedule_best_of_n(component_classes, component_teachers, component_assignments, timeslots, st_progress=progress, seed=seeds[i],
+                                            workers=workers if large[i] else 1, deadline=deadline, stats=stats, decompose=False, **options)
+            base += share
+
+    if any("diag" in meta for _, _, _, meta in results):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+    # Classes and teachers outside every component keep an empty row
+    class_table = {c.id: [None]*num_slots for c in classes}
+    teacher_table = {t.id: [None]*num_slots for t in teachers}
+    remaining = []
+    for component_class, component_teacher, component_remaining, _ in results:
+        class_table.update(component_class)
+        teacher_table.update(component_teacher)
+        remaining.extend(component_remaining)
+    metas = [meta for _, _, _, meta in results]
+    meta = {
+        "best_remaining": len(remaining),
+        "placed": sum(m["placed"] for m in metas),
+        "elapsed": time.time() - start,
+        "trials": sum(m.get("trials", 0) for m in metas),
+        "status": run_status(remaining, any(m["status"] == TIMED_OUT for m in metas)),
+        "repaired": sum(m.get("repaired", 0) for m in metas),
+        "components": [{"classes": len(group[0]), "teachers": len(group[1]), "assignments": len(group[2]),
+                        "trials": m.get("trials", 0), "workers": m.get("workers", 1), "best_remaining": m["best_remaining"], "elapsed": m["elapsed"]}
+                       for group, m in zip(groups, metas)],
+    }
+    if component_pool:
+        meta["workers"] = min(workers, len(groups))
+    elif workers > 1:
+        meta["workers"] = workers
+    if stats is not None:
+        meta["stats"] = stats.as_dict()
+    return score_result((class_table, teacher_table, remaining, meta), scorer, assignments, timeslots)
@@ -0,0 +1,186 @@
+# timetable_engine/constraints.py
+# Hard placement rules beyond the assignments themselves: timeslots a teacher or
+# class cannot use, fixed start slots for an assignment's units and the rooms
+# some lessons need. Availability and pins are turned into per-unit start-slot
+# masks before any search runs, so the solvers never try a slot they forbid;
+# rooms are counted during placement (see rooms.RoomLoad).
+
+from .department import periods_in_day
+from .models import Room
+from .units import unit_blocks
+
+
+class Constraints:
+    """Unavailable timeslot labels per teacher / class id, pinned start labels
+    per assignment id, and rooms (models.Room).
+
+    Labels are build_grid's "<day>-P<n>". Unavailable labels outside the current
+    grid are ignored; a pin outside it is reported by conflicts(). The i-th pin
+    of an assignment fixes the start of its i-th unit (see units.unit_blocks).
+    Every lesson of a category that has rooms (e.g. "Lab") needs one of them;
+    a room holds up to ``capacity`` classes in the same period.
+    """
+
+    def __init__(self, teacher_unavailable=None, class_unavailable=None, pinned=None, rooms=None):
+        self.teacher_unavailable = {tid: set(labels) for tid, labels in (teacher_unavailable or {}).items() if labels}
+        self.class_unavailable = {cid: set(labels) for cid, labels in (class_unavailable or {}).items() if labels}
+        self.pinned = {aid: list(labels) for aid, labels in (pinned or {}).items() if labels}
+        self.rooms = list(rooms or ())
+
+    def __bool__(self):
+        return bool(self.teacher_unavailable or self.class_unavailable or self.pinned or self.rooms)
+
+    def set_teacher_unavailable(self, tid, labels):
+        _set_or_drop(self.teacher_unavailable, tid, set(labels))
+
+    def set_class_unavailable(self, cid, labels):
+        _set_or_drop(self.class_unavailable, cid, set(labels))
+
+    def set_pinned(self, aid, labels):
+        _set_or_drop(self.pinned, aid, list(labels))
+
+    def add_room(self, name, category, capacity=1):
+        """Add a room and return it; ids continue after the largest one in use."""
+        room = Room(max((r.id for r in self.rooms), default=0) + 1, name, category, int(capacity))
+        self.rooms.append(room)
+        return room
+
+    def remove_room(self, room_id):
+        self.rooms = [r for r in self.rooms if r.id != room_id]
+
+    def to_dict(self):
+        # JSON-friendly and ordered, so equal constraints always serialize (and hash) alike;
+        # "rooms" is left out when there are none, so earlier keys stay valid
+        out = {
+            "teacher_unavailable": {str(tid): sorted(labels) for tid, labels in sorted(self.teacher_unavailable.items())},
+            "class_unavailable": {str(cid): sorted(labels) for cid, labels in sorted(self.class_unavailable.items())},
+            "pinned": {str(aid): list(labels) for aid, labels in sorted(self.pinned.items())},
+        }
+        if self.rooms:
+            out["rooms"] = [{"id": r.id, "name": r.name, "category": r.category, "capacity": r.capacity} for r in sorted(self.rooms, key=lambda r: r.id)]
+        return out
+
+    @classmethod
+    def from_dict(cls, obj):
+        return cls(
+            {int(tid): labels for tid, labels in obj.get("teacher_unavailable", {}).items()},
+            {int(cid): labels for cid, labels in obj.get("class_unavailable", {}).items()},
+            {int(aid): labels for aid, labels in obj.get("pinned", {}).items()},
+            [Room(**r) for r in obj.get("rooms", [])],
+        )
+
+
+def _set_or_drop(table, key, labels):
+    if labels:
+        table[key] = labels
+    else:
+        table.pop(key, None)
+
+
+def _label_mask(labels, slot_of):
+    mask = 0
+    for label in labels:
+        s = slot_of.get(label)
+        if s is not None:
+            mask |= 1 << s
+    return mask
+
+
+def usable_cells(constraints, classes, teachers, timeslots):
+    """(class_free, teacher_free): id -> mask of the cells each one can be scheduled in."""
+    full = (1 << len(timeslots)) - 1
+    if not constraints:
+        return {c.id: full for c in classes}, {t.id: full for t in teachers}
+    slot_of = {label: s for s, label in enumerate(timeslots)}
+    class_free = {c.id: full & ~_label_mask(constraints.class_unavailable.get(c.id, ()), slot_of) for c in classes}
+    teacher_free = {t.id: full & ~_label_mask(constraints.teacher_unavailable.get(t.id, ()), slot_of) for t in teachers}
+    return class_free, teacher_free
+
+
+def _resolve(constraints, classes, teachers, assignments, timeslots):
+    from .rooms import room_pool
+    num_slots = len(timeslots)
+    ppd = periods_in_day(timeslots)
+    num_days = num_slots // ppd if ppd else 0
+    class_free, teacher_free = usable_cells(constraints, classes, teachers, timeslots)
+    slot_of = {label: s for s, label in enumerate(timeslots)}
+    class_names = {c.id: c.name for c in classes}
+    teacher_names = {t.id: t.name for t in teachers}
+
+    day_start = {}   # block -> mask of starts that stay inside one day
+    fits = {}        # (class, teacher, block) -> allowed starts
+    allowed = []
+    pins = {}
+    problems = []
+    pinned_class = {}
+    pinned_teacher = {}
+    pinned_days = {}
+    pool = room_pool(constraints)
+    room_load = pool.load(num_slots) if pool else None
+    room_of = {category: r for r, category in enumerate(pool.categories)} if pool else {}
+    for a in assignments:
+        r = room_of.get(a.category)
+        pin_labels = constraints.pinned.get(a.id, ()) if constraints else ()
+        blocks = [block for block, _ in unit_blocks(a)]
+        what = f"{a.subject} ({class_names.get(a.class_id, a.class_id)} / {teacher_names.get(a.teacher_id, a.teacher_id)})"
+        if len(pin_labels) > len(blocks):
+            problems.append(f"{what}: {len(pin_labels)} pinned slots but only {len(blocks)} lessons to place")
+        for k, block in enumerate(blocks):
+            key = (a.class_id, a.teacher_id, block)
+            mask = fits.get(key)
+            if mask is None:
+                if block not in day_start:
+                    day_start[block] = sum(1 << (d*ppd + p) for d in range(num_days) for p in range(ppd - block + 1))
+                free = class_free.get(a.class_id, 0) & teacher_free.get(a.teacher_id, 0)
+                mask = day_start[block] & free
+                for j in range(1, block):
+                    mask &= free >> j
+                fits[key] = mask
+            if k < len(pin_labels):
+                label = pin_labels[k]
+                s = slot_of.get(label)
+                if s is None:
+                    problems.append(f"{what}: pinned slot {label} is not in the week")
+                elif not (day_start[block] >> s) & 1:
+                    problems.append(f"{what}: a {block}-period lesson pinned at {label} runs past the end of the day")
+                elif not (mask >> s) & 1:
+                    problems.append(f"{what}: pinned at {label}, when the class or teacher is unavailable")
+                else:
+                    cells = ((1 << block) - 1) << s
+                    day = s // ppd
+                    if pinned_class.get(a.class_id, 0) & cells or pinned_teacher.get(a.teacher_id, 0) & cells:
+                        problems.append(f"{what}: pinned at {label}, which overlaps another pinned lesson")
+                    elif day in pinned_days.get((a.class_id, a.subject), ()):
+                        problems.append(f"{what}: two lessons pinned on the same day")
+                    elif r is not None and not (room_load.starts(r, block) >> s) & 1:
+                        problems.append(f"{what}: pinned at {label}, when every {a.category} room is taken by other pinned lessons")
+                    else:
+                        if r is not None:
+                            room_load.book(r, s, block)
+                        pinned_class[a.class_id] = pinned_class.get(a.class_id, 0) | cells
+                        pinned_teacher[a.teacher_id] = pinned_teacher.get(a.teacher_id, 0) | cells
+                        pinned_days.setdefault((a.class_id, a.subject), set()).add(day)
+                        pins[len(allowed)] = s
+                        mask = 1 << s
+            allowed.append(mask)
+    return allowed, pins, problems
+
+
+def unit_starts(constraints, classes, teachers, assignments, timeslots):
+    """Per-unit start masks and pins, in expand_units / UnitTable unit order.
+
+    Returns (allowed, pins): ``allowed[i]`` has bit s set when unit i's whole
+    block fits from slot s within one day in cells its class and teacher can
+    use; a pinned unit's mask is just its pinned start, and ``pins`` maps those
+    unit indices to the start.
+    """
+    allowed, pins, _ = _resolve(constraints, classes, teachers, assignments, timeslots)
+    return allowed, pins
+
+
+def conflicts(constraints, classes, teachers, assignments, timeslots):
+    """Messages for pins that can never be honoured (outside the week, on an
+    unavailable cell, overlapping each other); empty when all pins are usable."""
+    if not constraints or not constraints.pinned:
+        return []
+    return _resolve(constraints, classes, teachers, assignments, timeslots)[2]
@@ -0,0 +1,287 @@
+# timetable_engine/cp.py
+# Constraint-propagation solver for the department problem: forward checking on
+# bitmask domains, most-constrained-unit-first ordering and conflict-directed
+# backjumping. Units and rules are the same as try_place_once (units.unit_blocks).
+
+import random
+import time
+from array import array
+
+from .deadline import FEASIBLE_PARTIAL, INFEASIBLE, OPTIMAL, TIMED_OUT, as_deadline
+from .department import diagnose, has_overload
+from .solution import Layout, Solution
+from .stats import profiling
+
+
+# Node budget of the first search run; each restart gets 1.5x the previous one
+RESTART_NODES = 2000
+
+
+def _bits(mask):
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return out
+
+
+def schedule_cp(classes, teachers, assignments, timeslots, seed=None, max_nodes=100_000, st_progress=None, deadline=None, constraints=None, stats=None):
+    """Search for a complete timetable with forward checking and backjumping.
+
+    Returns (class_table, teacher_table, remaining, meta) like schedule_best_of_n.
+    meta["status"] is "optimal", "infeasible" (the search space was exhausted,
+    so no timetable exists under these rules), "feasible-partial" (``max_nodes``
+    placements were tried; meta["nodes"] says how many) or "timed out"
+    (``deadline`` passed or was cancelled). Unless optimal, the deepest
+    partial assignment seen is returned. ``constraints`` narrows each unit's
+    starting domain (a pinned unit's domain is its one pinned slot), and its
+    rooms take out starts where every room a unit could use is full for part
+    of the block. Rooms are counted per category and slot during the search
+    and only booked at the end, which then always succeeds, so "infeasible"
+    holds with rooms too.
+    ``stats`` (stats.SolverStats) gets the nodes tried, the deepest partial
+    assignment and the number of backjumps, and profiles the search.
+    """
+    num_slots = len(timeslots)
+    if has_overload(classes, teachers, assignments, num_slots, constraints, timeslots):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+
+    start_time = time.time()
+    deadline = as_deadline(deadline)
+    layout = Layout(classes, teachers, assignments, timeslots, constraints=constraints)
+    periods_per_day = layout.periods_per_day
+    day_masks = layout.day_masks
+    allowed = layout.allowed
+
+    # Dense indices from the shared unit table so occupancy lives in flat lists
+    units = layout.units
+    n = len(units)
+    u_class, u_teacher, u_cs, u_block = units.cls, units.teacher, units.group, units.block
+    unit_rooms = layout.unit_rooms
+
+    # Interchangeable units (same class, teacher, subject and block) are placed in
+    # increasing slot order so the search never revisits a permutation of them.
+    # Pinned units are never interchangeable: their slot is fixed.
+    sib_prev = [-1]*n
+    sib_next = [-1]*n
+    last_of = {}
+    for i in range(n):
+        key = (u_class[i], u_teacher[i], units.subject[i], u_block[i], layout.pins.get(i))
+        if key in last_of:
+            sib_prev[i] = last_of[key]
+            sib_next[last_of[key]] = i
+        last_of[key] = i
+
+    by_class = [[] for _ in classes]
+    by_teacher = [[] for _ in teachers]
+    for i in range(n):
+        by_class[u_class[i]].append(i)
+        by_teacher[u_teacher[i]].append(i)
+    # Units competing for the same rooms
+    by_room = {}
+    if unit_rooms is not None:
+        for i in range(n):
+            if unit_rooms[i] is not None:
+                by_room.setdefault(unit_rooms[i], []).append(i)
+    # Every unit whose placement can shrink unit i's domain
+    neighbors = [sorted((set(by_class[u_class[i]]) | set(by_teacher[u_teacher[i]]) | set(by_room.get(unit_rooms[i], ()) if unit_rooms else ())) - {i}) for i in range(n)]
+
+    # Units sharing a (class, subject) need pairwise different days
+    cs_members = [[] for _ in range(units.num_groups)]
+    for i in range(n):
+        cs_members[u_cs[i]].append(i)
+
+    def search(rng, budget):
+        """One depth-first run; returns (status, deepest placement map, nodes used)."""
+        class_busy = [0]*len(classes)
+        teacher_busy = [0]*len(teachers)
+        cs_days = [0]*units.num_groups
+        room_load = layout.rooms.load(num_slots) if unit_rooms is not None else None
+        start = [-1]*n      # chosen start slot, -1 while unplaced
+        depth_of = [-1]*n   # search depth at which the unit was placed
+
+        def domain(i):
+            free = ~(class_busy[u_class[i]] | teacher_busy[u_teacher[i]] | cs_days[u_cs[i]])
+            cand = allowed[i] & free
+            for k in range(1, u_block[i]):
+                cand &= free >> k
+            if unit_rooms is not None and unit_rooms[i] is not None:
+                cand &= room_load.starts(unit_rooms[i], u_block[i])
+            p = sib_prev[i]
+            if p >= 0 and start[p] >= 0:
+                cand &= ~((1 << (start[p]+1)) - 1)
+            q = sib_next[i]
+            if q >= 0 and start[q] >= 0:
+                cand &= (1 << start[q]) - 1
+            return cand
+
+        def place(i, s):
+            block_mask = ((1 << u_block[i]) - 1) << s
+            class_busy[u_class[i]] |= block_mask
+            teacher_busy[u_teacher[i]] |= block_mask
+            cs_days[u_cs[i]] |= day_masks[s // periods_per_day]
+            if unit_rooms is not None and unit_rooms[i] is not None:
+                room_load.book(unit_rooms[i], s, u_block[i])
+            start[i] = s
+
+        def unplace(i):
+            s = start[i]
+            block_mask = ((1 << u_block[i]) - 1) << s
+            class_busy[u_class[i]] &= ~block_mask
+            teacher_busy[u_teacher[i]] &= ~block_mask
+            cs_days[u_cs[i]] &= ~day_masks[s // periods_per_day]
+            if unit_rooms is not None and unit_rooms[i] is not None:
+                room_load.release(unit_rooms[i], s, u_block[i])
+            start[i] = -1
+            depth_of[i] = -1
+
+        def refresh(i):
+            for j in neighbors[i]:
+                if start[j] < 0:
+                    dom[j] = domain(j)
+                    size[j] = dom[j].bit_count()
+
+        def culprits(i):
+            # Depths of placed units that may have pruned unit i's domain
+            return {depth_of[j] for j in neighbors[i] if depth_of[j] >= 0}
+
+        def days_short(g):
+            # Pigeonhole: the group's unplaced units need more distinct days than their domains offer
+            todo = [j for j in cs_members[g] if start[j] < 0]
+            if len(todo) < 2:
+                return False
+            union = 0
+            for j in todo:
+                union |= dom[j]
+            return sum(1 for dm in day_masks if union & dm) < len(todo)
+
+        dom = [domain(i) for i in range(n)]
+        size = [d.bit_count() for d in dom]
+        unplaced = set(range(n))
+        if any(days_short(g) for g in range(len(cs_members))):
+            return INFEASIBLE, {}, 0
+
+        def select():
+            return min(unplaced, key=lambda i: (size[i], -u_block[i], -len(neighbors[i]), i))
+
+        # Frames: [unit, untried candidate slots, conflict set (depths)]
+        frames = []
+        nodes = 0
+        best_depth = -1
+        best_starts = {}
+
+        def open_frame():
+            i = select()
+            cands = _bits(dom[i])
+            rng.shuffle(cands)
+            frames.append([i, cands, set()])
+
+        if not n:
+            return OPTIMAL, {}, 0
+        open_frame()
+
+        while True:
+            d = len(frames) - 1
+            i, cands, conf = frames[d]
+            advanced = False
+            while cands:
+                s = cands.pop()
+                nodes += 1
+                place(i, s)
+                depth_of[i] = d
+                unplaced.discard(i)
+                # Forward check: every unplaced neighbor must keep a value
+                refresh(i)
+                wiped = next((j for j in neighbors[i] if start[j] < 0 and not size[j]), -1)
+                if wiped >= 0:
+                    conf |= culprits(wiped) - {d}
+                elif days_short(u_cs[i]):
+                    for j in cs_members[u_cs[i]]:
+                        conf |= culprits(j)
+                    conf.discard(d)
+                else:
+                    advanced = True
+                    break
+                unplace(i)
+                unplaced.add(i)
+                refresh(i)
+
+            if advanced:
+                if d + 1 > best_depth:
+                    best_depth = d + 1
+                    best_starts = {u: start[u] for u in range(n) if start[u] >= 0}
+                if not unplaced:
+                    return OPTIMAL, best_starts, nodes
+                if nodes >= budget:
+                    return FEASIBLE_PARTIAL, best_starts, nodes
+                if deadline.expired():
+                    return TIMED_OUT, best_starts, nodes
+                open_frame()
+                continue
+
+            # Every value of unit i failed: backjump to the most recent culprit
+            if stats is not None:
+                stats.dead_ends += 1
+            conf |= culprits(i)
+            conf.discard(d)
+            frames.pop()
+            if not conf:
+                return INFEASIBLE, best_starts, nodes
+            h = max(conf)
+            while len(frames) - 1 > h:
+                j = frames.pop()[0]
+                unplace(j)
+                unplaced.add(j)
+                refresh(j)
+            j, _, hconf = frames[h]
+            hconf |= conf - {h}
+            # Undo the culprit's current value; its loop then moves on to the next one
+            unplace(j)
+            unplaced.add(j)
+            refresh(j)
+            if nodes >= budget:
+                return FEASIBLE_PARTIAL, best_starts, nodes
+            if deadline.expired():
+                return TIMED_OUT, best_starts, nodes
+
+    # Restarts with a growing node budget: a fresh value order escapes unlucky early
+    # choices, while a run that exhausts its space still proves infeasibility.
+    rng = random.Random(seed)
+    nodes = 0
+    restarts = 0
+    budget = RESTART_NODES
+    best_starts = {}
+    status = FEASIBLE_PARTIAL
+    with profiling(stats):
+        while nodes < max_nodes:
+            status, starts, used = search(rng, min(budget, max_nodes - nodes))
+            nodes += used
+            if len(starts) > len(best_starts) or status == OPTIMAL:
+                best_starts = starts
+            if status != FEASIBLE_PARTIAL:
+                break
+            restarts += 1
+            budget = int(budget * 1.5)
+            if st_progress is not None:
+                bar, status_text = st_progress
+                bar.progress(min(100, int(max(nodes/max_nodes, deadline.fraction_used())*100)))
+                status_text.text(f"Constraint search — restart {restarts}, {nodes} placements tried, deepest {len(best_starts)}/{n} units")
+    if stats is not None:
+        stats.nodes += nodes
+        stats.max_depth = max(stats.max_depth, len(best_starts))
+
+    class_slots = array("i", [-1]) * (len(classes) * num_slots)
+    placed_count = 0
+    for u, slot in best_starts.items():
+        base = u_class[u]*num_slots + slot
+        for k in range(u_block[u]):
+            class_slots[base + k] = u
+        placed_count += u_block[u]
+    solution = Solution(layout, class_slots, [u for u in range(n) if u not in best_starts], placed_count)
+    class_table, teacher_table, remaining = solution.tables()
+    elapsed = time.time() - start_time
+    meta = {"best_remaining": len(remaining), "placed": placed_count, "elapsed": elapsed, "status": status, "nodes": nodes, "restarts": restarts, "solution": solution}
+    if stats is not None:
+        meta["stats"] = stats.as_dict()
+    return class_table, teacher_table, remaining, meta
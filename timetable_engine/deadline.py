@@ -0,0 +1,93 @@
+# timetable_engine/deadline.py
+# Wall-clock budget plus a cancel flag that the solvers check cooperatively
+
+import threading
+import time
+
+# Result status shared by every solver (meta["status"], single-class status)
+OPTIMAL = "optimal"                    # nothing left unplaced
+FEASIBLE_PARTIAL = "feasible-partial"  # search finished or spent its budget, best result still has leftovers
+TIMED_OUT = "timed out"                # deadline passed or cancelled; best result so far
+INFEASIBLE = "infeasible"              # exhaustive search proved no complete timetable exists
+INVALID = "invalid"                    # input rejected before any search; nothing placed
+
+
+class Deadline:
+    """Stop condition for a solver run.
+
+    ``seconds=None`` never expires on its own; cancel() stops the run from
+    another thread (e.g. a UI or job worker) at the solver's next check.
+    """
+
+    def __init__(self, seconds=None):
+        self.started = time.time()
+        self.at = None if seconds is None else self.started + seconds
+        self._cancelled = threading.Event()
+
+    @classmethod
+    def until(cls, at, cancel_event=None):
+        """Deadline at an absolute time.time(), e.g. one handed to a worker process.
+
+        ``cancel_event`` (e.g. a multiprocessing Event) replaces the cancel flag,
+        so whoever holds the event can cancel this deadline from another process.
+        """
+        deadline = cls()
+        deadline.at = at
+        if cancel_event is not None:
+            deadline._cancelled = cancel_event
+        return deadline
+
+    def sub(self, seconds):
+        """A shorter deadline inside this one; cancelling this one also stops it."""
+        child = Deadline(seconds)
+        if self.at is not None:
+            child.at = min(child.at, self.at)
+        child._cancelled = self._cancelled
+        return child
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def expired(self):
+        return self._cancelled.is_set() or (self.at is not None and time.time() >= self.at)
+
+    def fraction_used(self):
+        """Share of the time limit already spent (0 without a limit), for progress bars."""
+        if self.at is None:
+            return 0.0
+        return min(1.0, (time.time() - self.started) / max(self.at - self.started, 1e-9))
+
+    def remaining(self):
+        """Seconds left, or None without a time limit."""
+        if self.at is None:
+            return None
+        return max(0.0, self.at - time.time())
+
+
+def as_deadline(deadline):
+    """Accept a Deadline, a number of seconds (0 / None = no limit) or None."""
+    if isinstance(deadline, Deadline):
+        return deadline
+    return Deadline(deadline or None)
+
+
+def run_status(remaining, timed_out):
+    """Status for a result with ``remaining`` unplaced units."""
+    if not remaining:
+        return OPTIMAL
+    return TIMED_OUT if timed_out else FEASIBLE_PARTIAL
+
+
+def combined_status(statuses):
+    """Status for several results taken together, e.g. the classes of a batch."""
+    statuses = list(statuses)
+    if all(status == OPTIMAL for status in statuses):
+        return OPTIMAL
+    for status in (INVALID, TIMED_OUT, INFEASIBLE):
+        if status in statuses:
+            return status
+    return FEASIBLE_PARTIAL
@@ -0,0 +1,471 @@
+# timetable_engine/department.py
+# Department scheduler: grid helpers, diagnostics and best-of-N randomized placement
+
+from typing import List, Dict, Tuple
+import random, time
+
+from .deadline import as_deadline, run_status
+from .units import unit_blocks
+
+# -----------------------
+# Scheduling helpers (kept same as original)
+# -----------------------
+def build_grid(days: List[str], periods_per_day: int) -> Tuple[List[str], Dict[int, Tuple[str,int]]]:
+    timeslots = []
+    idx2dp = {}
+    idx = 0
+    for d in days:
+        for p in range(1, periods_per_day+1):
+            label = f"{d}-P{p}"
+            timeslots.append(label)
+            idx2dp[idx] = (d, p)
+            idx += 1
+    return timeslots, idx2dp
+
+def periods_in_day(timeslots: List[str]) -> int:
+    # build_grid labels slots "<day>-P<n>", so count the labels of the first day
+    if not timeslots:
+        return 0
+    first_day = timeslots[0].rsplit("-P", 1)[0]
+    return sum(1 for label in timeslots if label.rsplit("-P", 1)[0] == first_day)
+
+def compute_totals(classes, teachers, assignments):
+    class_totals = {}
+    teacher_totals = {}
+    for a in assignments:
+        class_totals[a.class_id] = class_totals.get(a.class_id, 0) + a.periods_per_week
+        teacher_totals[a.teacher_id] = teacher_totals.get(a.teacher_id, 0) + a.periods_per_week
+    return class_totals, teacher_totals
+
+def diagnose(classes, teachers, assignments, num_slots, constraints=None, timeslots=None):
+    # Requested vs available periods per class / teacher, plus feasibility.analyze's
+    # tighter bounds when timeslots are given: 2-period blocks vs free pairs, lessons
+    # per subject vs days, and one lesson per subject per day. constraints
+    # (constraints.Constraints) lower availability and can add pin conflicts and,
+    # with rooms, room capacity per category.
+    import pandas as pd  # only needed for the diagnostics tables; keeps engine import light
+    from .feasibility import analyze
+    bounds = analyze(classes, teachers, assignments, num_slots, constraints, timeslots)
+    class_map = {c.id:c.name for c in classes}
+    teacher_map = {t.id:t.name for t in teachers}
+    by_class = bounds["class"][bounds["class"]["requested"] > 0]
+    by_teacher = bounds["teacher"][bounds["teacher"]["requested"] > 0]
+    by_subject = bounds["subject"]
+    per_day = "pairs" in by_class
+
+    class_df = pd.DataFrame({
+        "Class": [class_map[cid] for cid in by_class.index],
+        "Requested (pw)": by_class["requested"].to_numpy(),
+        "Available": by_class["available"].to_numpy(),
+        "Overload": by_class["overload"].to_numpy(),
+    })
+    teacher_df = pd.DataFrame({
+        "Teacher": [teacher_map[tid] for tid in by_teacher.index],
+        "Requested (pw)": by_teacher["requested"].to_numpy(),
+        "Available": by_teacher["available"].to_numpy(),
+        "Overload": by_teacher["overload"].to_numpy(),
+    })
+    if per_day:
+        class_df["2-period blocks"] = by_class["doubles"].to_numpy()
+        class_df["Free pairs"] = by_class["pairs"].to_numpy()
+        class_df["Day capacity"] = by_class["day_capacity"].to_numpy()
+        teacher_df["2-period blocks"] = by_teacher["doubles"].to_numpy()
+        teacher_df["Free pairs"] = by_teacher["pairs"].to_numpy()
+    class_df = class_df.sort_values(by="Overload", ascending=False, kind="stable") if len(class_df) else pd.DataFrame()
+    teacher_df = teacher_df.sort_values(by="Overload", ascending=False, kind="stable") if len(teacher_df) else pd.DataFrame()
+
+    def rows(df, mask, cols):
+        return list(zip(*(df.loc[mask, col].tolist() for col in cols))) if len(df) else []
+
+    problems = {
+        "class_overload": rows(class_df, class_df["Overload"] > 0, ["Class", "Requested (pw)", "Available"]) if len(class_df) else [],
+        "teacher_overload": rows(teacher_df, teacher_df["Overload"] > 0, ["Teacher", "Requested (pw)", "Available"]) if len(teacher_df) else [],
+        "block_pairs": [],
+        "subject_days": [],
+        "day_capacity": [],
+        "room_capacity": [],
+        "pin_conflicts": _pin_conflicts(classes, teachers, assignments, constraints, timeslots),
+    }
+    if per_day:
+        short = by_class[by_class["pairs_short"]]
+        problems["block_pairs"] = [("Class", class_map[cid], d, p) for cid, d, p in zip(short.index, short["doubles"].tolist(), short["pairs"].tolist())]
+        short = by_teacher[by_teacher["pairs_short"]]
+        problems["block_pairs"] += [("Teacher", teacher_map[tid], d, p) for tid, d, p in zip(short.index, short["doubles"].tolist(), short["pairs"].tolist())]
+        short = by_subject[by_subject["days_short"]]
+        problems["subject_days"] = [(class_map.get(cid, str(cid)), subj, n, d) for cid, subj, n, d in zip(short["class_id"].tolist(), short["subject"].tolist(), short["lessons"].tolist(), short["days"].tolist())]
+        short = by_class[by_class["day_short"]]
+        problems["day_capacity"] = [(class_map[cid], n, cap) for cid, n, cap in zip(short.index, short["cells"].tolist(), short["day_capacity"].tolist())]
+    by_room = bounds.get("rooms")
+    if by_room is not None:
+        over = by_room[by_room["overload"] > 0]
+        problems["room_capacity"] = list(zip(over.index.tolist(), over["requested"].tolist(), over["available"].tolist()))
+        if per_day:
+            short = by_room[by_room["pairs_short"]]
+            problems["block_pairs"] += [("Rooms for", category, d, p) for category, d, p in zip(short.index, short["doubles"].tolist(), short["pairs"].tolist())]
+
+    return {"num_slots": num_slots, "class_df": class_df, "teacher_df": teacher_df, "problems": problems}
+
+def _pin_conflicts(classes, teachers, assignments, constraints, timeslots):
+    if not constraints:
+        return []
+    from .constraints import conflicts
+    return conflicts(constraints, classes, teachers, assignments, timeslots)
+
+def has_overload(classes, teachers, assignments, num_slots, constraints=None, timeslots=None):
+    # True when diagnose would report any problem: the solvers stop before their first trial
+    from .feasibility import analyze, any_violation
+    return (any_violation(analyze(classes, teachers, assignments, num_slots, constraints, timeslots))
+            or bool(_pin_conflicts(classes, teachers, assignments, constraints, timeslots)))
+
+def expand_units(assignments):
+    # One dict per placement unit; see units.unit_blocks for the Lab / TP / Library rules
+    expanded = []
+    for a in assignments:
+        for block, kind in unit_blocks(a):
+            expanded.append({
+                "teacher_id": a.teacher_id,
+                "class_id": a.class_id,
+                "subject": a.subject,
+                "block": block,
+                "kind": kind
+            })
+    return expanded
+
+def try_place_once(classes, teachers, assignments, timeslots, seed=None, constraints=None, scorer=None, stats=None):
+    # stats (stats.SolverStats) counts the slots probed and why each was rejected.
+    # Lessons of a category that has rooms (constraints.rooms) also need a place in
+    # one of them for the whole block (rooms.RoomLoad); once every lesson is placed
+    # the rooms are booked and named in the lessons' cells as "room".
+    from .rooms import room_pool
+    if seed is not None:
+        random.seed(seed)
+
+    num_slots = len(timeslots)
+    periods_per_day = periods_in_day(timeslots)
+    class_table = {c.id: [None]*num_slots for c in classes}
+    teacher_table = {t.id: [None]*num_slots for t in teachers}
+
+    expanded = expand_units(assignments)
+    # Start slots each unit may use (availability and pins); see constraints.unit_starts
+    allowed, pins = None, {}
+    if constraints:
+        from .constraints import unit_starts
+        allowed, pins = unit_starts(constraints, classes, teachers, assignments, timeslots)
+    pool = room_pool(constraints)
+    unit_rooms = pool.unit_rooms(assignments) if pool else None
+    room_load = pool.load(num_slots) if pool else None
+    room_starts = {}   # unit -> start, for the units that need a room
+
+    # Sort and shuffle blocks (as indices, so each unit keeps its constraint entry)
+    order = list(range(len(expanded)))
+    random.shuffle(order)
+    order.sort(key=lambda i: -expanded[i]["block"])
+
+    remaining = []
+
+    # With a scorer, each unit takes its cheapest free slot (see quality.SoftScorer.placement_cost),
+    # which needs every teacher's occupancy as a bitmask
+    teacher_busy = {t.id: 0 for t in teachers}
+    num_days = num_slots // periods_per_day if periods_per_day else 0
+
+    # Pinned units go in first, at their fixed start
+    for i, sidx in pins.items():
+        unit = expanded[i]
+        block_mask = ((1 << unit["block"]) - 1) << sidx
+        teacher_busy[unit["teacher_id"]] |= block_mask
+        if unit_rooms and unit_rooms[i] is not None:
+            room_load.book(unit_rooms[i], sidx, unit["block"])
+            room_starts[i] = sidx
+        for k in range(unit["block"]):
+            class_table[unit["class_id"]][sidx+k] = _cell(unit["subject"], "teacher_id", unit["teacher_id"])
+            teacher_table[unit["teacher_id"]][sidx+k] = _cell(unit["subject"], "class_id", unit["class_id"])
+
+    # ---- Placement loop ----
+    for i in order:
+        if i in pins:
+            continue
+        unit = expanded[i]
+        placed = False
+        slot_order = list(range(num_slots))
+        random.shuffle(slot_order)
+        r = unit_rooms[i] if unit_rooms else None
+        # Starts with a room place free for the whole block, for lessons that need a room
+        room_ok = room_load.starts(r, unit["block"]) if r is not None else None
+        cheapest = None
+        if scorer is not None:
+            # Rank the slots that pass every rule below by placement cost; a stable
+            # sort keeps the shuffled order between equal costs
+            costs = {}
+            for sidx in slot_order:
+                reason = _rejection(class_table, teacher_table, unit, sidx, periods_per_day, allowed, i, room_ok)
+                if reason is None:
+                    costs[sidx] = scorer.placement_cost(teacher_busy[unit["teacher_id"]], sidx, unit["block"], unit["kind"] == "lab", periods_per_day, num_days)
+                elif stats is not None:
+                    stats.reject(reason)
+            if stats is not None:
+                stats.slots_probed += num_slots
+            if costs:
+                cheapest = min(costs, key=costs.get)
+            slot_order = [] if cheapest is None else [cheapest]
+
+        for sidx in slot_order:
+            block = unit["block"]
+            cid = unit["class_id"]
+            tid = unit["teacher_id"]
+            subj = unit["subject"]
+            kind = unit["kind"]
+
+            day = sidx // periods_per_day
+            period = sidx % periods_per_day
+            if stats is not None and scorer is None:
+                stats.slots_probed += 1
+
+            # Prevent overflow across day
+            if period + block > periods_per_day:
+                if stats is not None:
+                    stats.reject("day_overflow")
+                continue
+
+            # Teacher / class unavailable for part of the block
+            if allowed is not None and not (allowed[i] >> sidx) & 1:
+                if stats is not None:
+                    stats.reject("unavailable")
+                continue
+
+            # Block alignment rules
+            # if block == 2 and period + 1 >= periods_per_day:
+            #     continue
+
+
+            # Check availability
+            if any(class_table[cid][sidx+k] is not None or teacher_table[tid][sidx+k] is not None for k in range(block)):
+                if stats is not None:
+                    stats.reject("class_busy" if any(class_table[cid][sidx+k] is not None for k in range(block)) else "teacher_busy")
+                continue
+
+            # No room of the lesson's kind is free for the whole block
+            if room_ok is not None and not (room_ok >> sidx) & 1:
+                if stats is not None:
+                    stats.reject("room_busy")
+                continue
+
+            # Prevent same teacher consecutive teaching
+            # bad = False
+            # for k in range(block):
+            #     si = sidx + k
+            #     if si > 0 and teacher_table[tid][si-1] is not None:
+            #         bad = True
+            #         break
+            #     if si < num_slots-1 and teacher_table[tid][si+1] is not None:
+            #         bad = True
+            #         break
+            # if bad:
+            #     continue
+
+            # Prevent same subject twice in same day
+            day_slice = class_table[cid][day*periods_per_day:(day+1)*periods_per_day]
+            if any(cell and cell["subject"] == subj for cell in day_slice):
+                if stats is not None:
+                    stats.reject("same_subject_day")
+                continue
+
+            # Place it
+            block_mask = ((1 << block) - 1) << sidx
+            teacher_busy[tid] |= block_mask
+            if r is not None:
+                room_load.book(r, sidx, block)
+                room_starts[i] = sidx
+            for k in range(block):
+                si = sidx + k
+                class_table[cid][si] = _cell(subj, "teacher_id", tid)
+                teacher_table[tid][si] = _cell(subj, "class_id", cid)
+
+            placed = True
+            break
+
+        if not placed:
+            remaining.append(unit)
+            if stats is not None:
+                stats.unplaced[(unit["class_id"], unit["teacher_id"], unit["subject"])] += 1
+
+    if room_starts:
+        _name_rooms(pool, unit_rooms, room_starts, expanded, class_table, teacher_table)
+    return class_table, teacher_table, remaining
+
+
+def _cell(subject, other_key, other_id):
+    # One class / teacher table cell; _name_rooms adds "room" to lessons held in a room
+    return {"subject": subject, other_key: other_id}
+
+
+def _name_rooms(pool, unit_rooms, starts, units, class_table, teacher_table, prefer=None):
+    # Book rooms for the units placed at ``starts`` (rooms.book_in_start_order) and
+    # name them in the units' class and teacher cells
+    from .rooms import book_in_start_order
+    lanes = book_in_start_order(pool, unit_rooms, starts, [u["block"] for u in units], prefer)
+    for i, s in starts.items():
+        if lanes[i] >= 0:
+            unit = units[i]
+            room = pool.room_name(lanes[i])
+            for k in range(unit["block"]):
+                class_table[unit["class_id"]][s+k]["room"] = room
+                teacher_table[unit["teacher_id"]][s+k]["room"] = room
+
+
+def _rejection(class_table, teacher_table, unit, sidx, periods_per_day, allowed, i, room_ok=None):
+    # try_place_once's rules for unit ``i`` starting at ``sidx``, as one test:
+    # None if the unit fits, otherwise the first rule it breaks (see stats.REJECTIONS)
+    block = unit["block"]
+    period = sidx % periods_per_day
+    if period + block > periods_per_day:
+        return "day_overflow"
+    if allowed is not None and not (allowed[i] >> sidx) & 1:
+        return "unavailable"
+    cid, tid = unit["class_id"], unit["teacher_id"]
+    if any(class_table[cid][sidx+k] is not None for k in range(block)):
+        return "class_busy"
+    if any(teacher_table[tid][sidx+k] is not None for k in range(block)):
+        return "teacher_busy"
+    if room_ok is not None and not (room_ok >> sidx) & 1:
+        return "room_busy"
+    day = sidx // periods_per_day
+    day_slice = class_table[cid][day*periods_per_day:(day+1)*periods_per_day]
+    if any(cell and cell["subject"] == unit["subject"] for cell in day_slice):
+        return "same_subject_day"
+    return None
+
+
+def try_place_once_bitset(classes, teachers, assignments, timeslots, seed=None, constraints=None, scorer=None, stats=None):
+    # Same placement rules and random stream as try_place_once, but occupancy is
+    # kept as integer bitmasks (bit i = timeslot i) so every slot test is O(1).
+    # See solution.place_once_compact; this wrapper returns the dict view.
+    from .solution import Layout, place_once_compact
+    return place_once_compact(Layout(classes, teachers, assignments, timeslots, constraints=constraints), seed=seed, scorer=scorer, stats=stats).tables()
+
+
+PLACEMENT_BACKENDS = {
+    "Bitset": try_place_once_bitset,
+    "Lists": try_place_once,
+}
+
+
+def trial_seeds(trials, seed=None):
+    # One placement seed per trial, derived from the master seed so runs are reproducible
+    rng = random.Random(seed)
+    return [rng.randrange(1_000_000) for _ in range(trials)]
+
+
+def score_result(result, scorer, assignments, timeslots):
+    # Adds the scorer's penalty of the final tables to a solver result's meta
+    class_table, teacher_table, remaining, meta = result
+    if scorer is None or class_table is None:
+        return result
+    penalty, terms = scorer.score_tables(class_table, teacher_table, assignments, periods_in_day(timeslots))
+    return class_table, teacher_table, remaining, dict(meta, penalty=penalty, penalty_terms=terms)
+
+
+def schedule_best_of_n(classes, teachers, assignments, timeslots, trials=300, st_progress=None, backend="Bitset", seed=None, workers=1, repair_seconds=0.0, deadline=None, constraints=None, scorer=None, stats=None, decompose=True, adaptive=False):
+    # repair_seconds > 0 runs the local-search repair on the best trial if it left units unplaced.
+    # deadline (a Deadline or seconds) stops the trials early; meta["status"] is then
+    # "timed out", otherwise "optimal" or "feasible-partial".
+    # constraints (constraints.Constraints) adds unavailable cells and pinned slots.
+    # scorer (quality.SoftScorer) breaks ties between equally complete trials by
+    # soft-constraint penalty; trials then continue past the first complete one
+    # until the penalty reaches 0, the trials run out or the deadline passes.
+    # stats (stats.SolverStats) collects probe / rejection counts and per-trial times
+    # and profiles the trial loop if it has a profiler; meta["stats"] is its summary.
+    # decompose solves groups of classes and teachers that share no assignment
+    # separately when there is more than one (see components.schedule_components).
+    # adaptive runs the trials in this process, each one learning from the ones
+    # before it (see adaptive.schedule_adaptive); backend and workers then only
+    # matter for spreading independent groups over processes.
+    from .repair import repair_result
+    from .stats import profiling
+    deadline = as_deadline(deadline)
+    if decompose:
+        from .components import schedule_components, split_components
+        groups = split_components(classes, teachers, assignments, constraints)
+        if len(groups) > 1:
+            return schedule_components(classes, teachers, assignments, timeslots, trials=trials, st_progress=st_progress, backend=backend, seed=seed, workers=workers, repair_seconds=repair_seconds, deadline=deadline, constraints=constraints, scorer=scorer, stats=stats, groups=groups, adaptive=adaptive)
+    if adaptive:
+        from .adaptive import schedule_adaptive
+        return schedule_adaptive(classes, teachers, assignments, timeslots, trials=trials, st_progress=st_progress, seed=seed, repair_seconds=repair_seconds, deadline=deadline, constraints=constraints, scorer=scorer, stats=stats)
+    if workers > 1:
+        from .parallel import schedule_best_of_n_parallel
+        result = schedule_best_of_n_parallel(classes, teachers, assignments, timeslots, trials=trials, st_progress=st_progress, backend=backend, seed=seed, workers=workers, deadline=deadline, constraints=constraints, scorer=scorer, stats=stats)
+        result = repair_result(classes, teachers, assignments, timeslots, result, repair_seconds, seed=seed, st_progress=st_progress, deadline=deadline, constraints=constraints)
+        return score_result(result, scorer, assignments, timeslots)
+
+    best_solution = None
+    best_remaining = None
+    best_placed_count = -1
+    best_penalty = 0
+    num_slots = len(timeslots)
+
+    if has_overload(classes, teachers, assignments, num_slots, constraints, timeslots):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+
+    # Bitset trials return compact Solutions built on one shared Layout; the
+    # legacy list backend returns fresh dict tables. Either way the best trial
+    # is kept by reference and the dict view is built once at the end.
+    layout = None
+    if backend == "Bitset":
+        from .solution import Layout, place_once_compact
+        layout = Layout(classes, teachers, assignments, timeslots, constraints=constraints)
+    place_once = PLACEMENT_BACKENDS[backend]
+    layout_ppd = periods_in_day(timeslots)
+    start = time.time()
+    timed_out = False
+    ran = 0
+    with profiling(stats):
+        for t, trial_seed in enumerate(trial_seeds(trials, seed)):
+            if t and deadline.expired():   # the first trial always runs, so there is a result
+                timed_out = True
+                break
+            ran += 1
+            trial_start = time.perf_counter()
+            if layout is not None:
+                trial = place_once_compact(layout, seed=trial_seed, scorer=scorer, stats=stats)
+                placed_count = trial.placed_count
+                rem_count = trial.remaining_count
+            else:
+                trial = place_once(classes, teachers, assignments, timeslots, seed=trial_seed, constraints=constraints, scorer=scorer, stats=stats)
+                placed_count = sum(1 for cid in trial[0] for v in trial[0][cid] if v is not None)
+                rem_count = len(trial[2])
+            if stats is not None:
+                stats.trials += 1
+                stats.trial_seconds.append(time.perf_counter() - trial_start)
+            better = best_solution is None or rem_count < best_remaining or (rem_count == best_remaining and placed_count > best_placed_count)
+            if scorer is not None and (better or (rem_count, placed_count) == (best_remaining, best_placed_count)):
+                # Only trials that can win are scored
+                if layout is not None:
+                    penalty = scorer.score_solution(trial)[0]
+                else:
+                    penalty = scorer.score_tables(trial[0], trial[1], assignments, layout_ppd)[0]
+                better = better or penalty < best_penalty
+            if better:
+                best_solution = trial
+                best_remaining = rem_count
+                best_placed_count = placed_count
+                if scorer is not None:
+                    best_penalty = penalty
+                if best_remaining == 0 and (scorer is None or best_penalty == 0):
+                    break
+            if st_progress is not None:
+                bar, status = st_progress
+                bar.progress(int(max((t+1)/trials, deadline.fraction_used())*100))
+                if (t+1) % max(1, trials//10) == 0:
+                    status.text(f"Trials {t+1}/{trials} — best remaining {best_remaining}" + (f", penalty {best_penalty}" if scorer is not None else ""))
+    elapsed = time.time() - start
+    if best_solution is None:
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+    meta = {"best_remaining": best_remaining, "placed": best_placed_count, "elapsed": elapsed, "trials": ran, "status": run_status(best_remaining, timed_out)}
+    if stats is not None:
+        meta["stats"] = stats.as_dict()
+    if layout is not None:
+        meta["solution"] = best_solution
+        best_solution = best_solution.tables()
+    result = (best_solution[0], best_solution[1], best_solution[2], meta)
+    result = repair_result(classes, teachers, assignments, timeslots, result, repair_seconds, seed=seed, st_progress=st_progress, deadline=deadline, constraints=constraints)
+    return score_result(result, scorer, assignments, timeslots)
+
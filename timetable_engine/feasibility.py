@@ -0,0 +1,146 @@
+# timetable_engine/feasibility.py
+# Pre-solve bounds: necessary conditions any complete timetable meets, computed
+# column-wise over all assignments at once. A violated bound means no solver
+# can place everything, so the app can stop before running a single trial.
+
+from functools import lru_cache
+
+LIBRARY_MENTORING = ("Library", "Mentoring")
+
+
+@lru_cache(maxsize=None)
+def _day_room(pattern):
+    # Disjoint pairs of adjacent usable cells in one day's availability pattern
+    pairs = run = 0
+    while pattern:
+        if pattern & 1:
+            run += 1
+        else:
+            pairs += run // 2
+            run = 0
+        pattern >>= 1
+    return pairs + run // 2
+
+
+def _room(ids, free, ppd, num_days):
+    """Per-day usable cells and total disjoint pairs for each id, as numpy arrays."""
+    import numpy as np
+
+    day_mask = (1 << ppd) - 1
+    cells = np.empty((len(ids), num_days), dtype=np.int64)
+    pairs = np.empty(len(ids), dtype=np.int64)
+    for row, key in enumerate(ids):
+        mask = free[key]
+        days = [(mask >> (d*ppd)) & day_mask for d in range(num_days)]
+        cells[row] = [p.bit_count() for p in days]
+        pairs[row] = sum(_day_room(p) for p in days)
+    return cells, pairs
+
+
+def _room_bounds(frame, rooms, num_slots, ppd, num_days):
+    """Per room category: periods and 2-period blocks requested vs what its rooms hold."""
+    import pandas as pd
+
+    lanes = {}
+    for room in rooms:
+        lanes[room.category] = lanes.get(room.category, 0) + max(1, int(room.capacity))
+    lanes = pd.Series(lanes, dtype="int64")
+    by_room = frame[frame["category"].isin(lanes.index)].groupby("category").agg(requested=("periods", "sum"), doubles=("doubles", "sum")).reindex(lanes.index, fill_value=0)
+    by_room["available"] = lanes * num_slots
+    by_room["overload"] = (by_room["requested"] - by_room["available"]).clip(lower=0)
+    if ppd:
+        by_room["pairs"] = lanes * num_days * (ppd // 2)
+        by_room["pairs_short"] = by_room["doubles"] > by_room["pairs"]
+    return by_room
+
+
+def analyze(classes, teachers, assignments, num_slots, constraints=None, timeslots=None):
+    """Per-class, per-teacher and per-(class, subject) bounds as DataFrames.
+
+    Always checks requested periods against available slots. With ``timeslots``
+    (so the day shape is known) it also checks, for every class and teacher,
+    that its 2-period blocks fit into disjoint free pairs, that each class
+    subject has no more lessons than days (one lesson per subject per day),
+    and that a class's periods fit a week in which each day holds at most one
+    lesson per subject. ``constraints`` take unavailable cells out of every
+    bound. With rooms in ``constraints``, each room category's periods and
+    2-period blocks must also fit its rooms' capacity over the week (the
+    "rooms" frame). Returns {"class", "teacher", "subject"} (and "rooms")
+    frames with a boolean column per bound; see diagnose for the user-facing form.
+    """
+    import numpy as np
+    import pandas as pd
+    from .constraints import usable_cells
+
+    frame = pd.DataFrame({
+        "class_id": [a.class_id for a in assignments],
+        "teacher_id": [a.teacher_id for a in assignments],
+        "subject": [a.subject for a in assignments],
+        "category": [a.category for a in assignments],
+        "periods": [a.periods_per_week for a in assignments],
+    }).astype({"subject": str, "category": str, "periods": "int64"})
+    # Same split as units.unit_blocks: Lab and TP pair up, Library / Mentoring is one period
+    periods = frame["periods"].to_numpy()
+    single_lesson = frame["category"].isin(LIBRARY_MENTORING).to_numpy()
+    paired = ((frame["category"] == "Lab") | (~single_lesson & (frame["subject"].str.strip().str.upper() == "TP"))).to_numpy()
+    frame["doubles"] = np.where(paired, periods // 2, 0)
+    frame["lessons"] = frame["doubles"] + np.where(paired, periods % 2, np.where(single_lesson, 1, periods))
+    frame["longest"] = np.where(frame["doubles"] > 0, 2, 1)
+
+    ppd = num_days = 0
+    if timeslots is not None:
+        from .department import periods_in_day
+        ppd = periods_in_day(timeslots)
+        num_days = num_slots // ppd if ppd else 0
+
+    class_ids = [c.id for c in classes]
+    teacher_ids = [t.id for t in teachers]
+    by_class = frame.groupby("class_id").agg(requested=("periods", "sum"), doubles=("doubles", "sum")).reindex(class_ids, fill_value=0)
+    by_teacher = frame.groupby("teacher_id").agg(requested=("periods", "sum"), doubles=("doubles", "sum")).reindex(teacher_ids, fill_value=0)
+    by_subject = frame.groupby(["class_id", "subject"], sort=False).agg(lessons=("lessons", "sum"), longest=("longest", "max")).reset_index()
+
+    if constraints and timeslots is not None and ppd:
+        class_free, teacher_free = usable_cells(constraints, classes, teachers, timeslots)
+        class_cells, class_pairs = _room(class_ids, class_free, ppd, num_days)
+        teacher_cells, teacher_pairs = _room(teacher_ids, teacher_free, ppd, num_days)
+        by_class["available"] = class_cells.sum(axis=1)
+        by_teacher["available"] = teacher_cells.sum(axis=1)
+    else:
+        class_cells = np.full((len(class_ids), num_days), ppd, dtype=np.int64)
+        class_pairs = np.full(len(class_ids), num_days * (ppd // 2), dtype=np.int64)
+        teacher_pairs = np.full(len(teacher_ids), num_days * (ppd // 2), dtype=np.int64)
+        by_class["available"] = num_slots
+        by_teacher["available"] = num_slots
+
+    by_class["overload"] = (by_class["requested"] - by_class["available"]).clip(lower=0)
+    by_teacher["overload"] = (by_teacher["requested"] - by_teacher["available"]).clip(lower=0)
+    if ppd:
+        by_class["pairs"] = class_pairs
+        by_teacher["pairs"] = teacher_pairs
+        # A day holds at most one lesson per subject, each at most as long as that subject's longest block
+        per_day_cap = by_subject.groupby("class_id")["longest"].sum().reindex(class_ids, fill_value=0).to_numpy()
+        by_class["day_capacity"] = np.minimum(class_cells, per_day_cap[:, None]).sum(axis=1)
+        cells_needed = frame.assign(cells=frame["lessons"] + frame["doubles"]).groupby("class_id")["cells"].sum().reindex(class_ids, fill_value=0)
+        by_class["cells"] = cells_needed
+        by_class["day_short"] = by_class["cells"] > by_class["day_capacity"]
+        by_class["pairs_short"] = by_class["doubles"] > by_class["pairs"]
+        by_teacher["pairs_short"] = by_teacher["doubles"] > by_teacher["pairs"]
+        class_days = pd.Series((class_cells > 0).sum(axis=1), index=class_ids)
+        by_subject["days"] = class_days.reindex(by_subject["class_id"]).fillna(0).astype(int).to_numpy()
+        by_subject["days_short"] = by_subject["lessons"] > by_subject["days"]
+    bounds = {"class": by_class, "teacher": by_teacher, "subject": by_subject}
+    if constraints and constraints.rooms:
+        bounds["rooms"] = _room_bounds(frame, constraints.rooms, num_slots, ppd, num_days)
+    return bounds
+
+
+def any_violation(bounds):
+    """True if a bound from analyze() rules out a complete timetable."""
+    by_class, by_teacher, by_subject = bounds["class"], bounds["teacher"], bounds["subject"]
+    if (by_class["overload"] > 0).any() or (by_teacher["overload"] > 0).any():
+        return True
+    by_room = bounds.get("rooms")
+    if by_room is not None and ((by_room["overload"] > 0).any() or ("pairs_short" in by_room and by_room["pairs_short"].any())):
+        return True
+    return ("day_short" in by_class and (by_class["day_short"].any() or by_class["pairs_short"].any()
+            or by_teacher["pairs_short"].any() or by_subject["days_short"].any()))
@@ -0,0 +1,176 @@
+# timetable_engine/incremental.py
+# Warm-start re-scheduling: keep an earlier department timetable, free only the
+# units whose assignment was added, edited or removed, and re-place those around
+# everything else.
+
+import random
+import time
+from collections import defaultdict
+
+from .deadline import as_deadline, run_status
+from .department import _cell, _name_rooms, diagnose, expand_units, has_overload, periods_in_day
+from .constraints import unit_starts
+from .repair import repair_result, units_from_tables
+from .rooms import room_pool
+
+
+def split_previous(class_table, assignments, periods_per_day, allowed=None):
+    """Match an earlier class table against the current assignments.
+
+    Works on the units of ``assignments`` in expand_units order. Returns (kept,
+    freed): ``kept`` lists (unit index, start) for previous placements that are
+    still wanted (same class, teacher, subject and block length, and a start
+    that ``allowed[i]`` permits) and ``freed`` the unit indices with no such
+    placement. Placements of deleted assignments, classes or teachers are dropped.
+    """
+    units = expand_units(assignments)
+    wanted = defaultdict(list)
+    for i, u in enumerate(units):
+        wanted[(u["class_id"], u["teacher_id"], u["subject"], u["block"])].append(i)
+    kept = []
+    for u, s in units_from_tables(class_table, assignments, periods_per_day):
+        pool = wanted.get((u["class_id"], u["teacher_id"], u["subject"], u["block"]))
+        if not pool:
+            continue
+        if allowed is None:
+            kept.append((pool.pop(), s))
+            continue
+        # Of the interchangeable units, give the slot to the most restricted one that
+        # may use it, so a unit pinned there is matched before an unpinned one
+        fitting = [i for i in pool if (allowed[i] >> s) & 1]
+        if fitting:
+            i = min(fitting, key=lambda i: allowed[i].bit_count())
+            pool.remove(i)
+            kept.append((i, s))
+    freed = sorted(i for pool in wanted.values() for i in pool)
+    return kept, freed
+
+
+def schedule_incremental(classes, teachers, assignments, timeslots, previous, seed=None, repair_seconds=0.0, st_progress=None, deadline=None, constraints=None):
+    """Re-schedule after a small edit, starting from ``previous``.
+
+    ``previous`` is the class table of an earlier run on the same grid. Units
+    that still match it stay where they were; the rest are placed into the free
+    slots, most constrained first. With ``repair_seconds`` > 0 whatever is still
+    left goes to the local-search repair, which may move a few kept units.
+    ``constraints`` apply as in schedule_best_of_n: a kept unit that now sits on
+    an unavailable cell, or in the way of a pin, is freed and re-placed too. A
+    kept lesson that needs a room keeps its previous room where it can, and
+    is freed when the rooms of its kind are full.
+
+    Returns (class_table, teacher_table, remaining, meta) like schedule_best_of_n;
+    meta adds "kept", "freed" and "moved" (kept units the repair relocated).
+    """
+    start_time = time.time()
+    deadline = as_deadline(deadline)
+    num_slots = len(timeslots)
+    if has_overload(classes, teachers, assignments, num_slots, constraints, timeslots):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+    if any(len(row) != num_slots for row in previous.values()):
+        raise ValueError("previous timetable was built on a different grid")
+
+    ppd = periods_in_day(timeslots)
+    rng = random.Random(seed)
+    units = expand_units(assignments)
+    if constraints:
+        allowed, pins = unit_starts(constraints, classes, teachers, assignments, timeslots)
+    else:
+        day_start = {}
+        for b in {u["block"] for u in units}:
+            day_start[b] = sum(1 << (d*ppd + p) for d in range(num_slots // ppd) for p in range(ppd - b + 1))
+        allowed, pins = [day_start[u["block"]] for u in units], {}
+    kept, freed = split_previous(previous, assignments, ppd, allowed)
+
+    day_masks = [((1 << ppd) - 1) << (d*ppd) for d in range(num_slots // ppd)]
+    class_busy = defaultdict(int)
+    teacher_busy = defaultdict(int)
+    group_days = defaultdict(int)   # (class, subject) -> mask of every slot on days it already uses
+    class_table = {c.id: [None]*num_slots for c in classes}
+    teacher_table = {t.id: [None]*num_slots for t in teachers}
+    pool = room_pool(constraints)
+    unit_rooms = pool.unit_rooms(assignments) if pool else [None]*len(units)
+    room_load = pool.load(num_slots) if pool else None
+    room_starts = {}   # unit -> start, for the units that need a room
+    prefer = {}        # kept unit -> lanes of the room it had before
+
+    def place(i, s):
+        u = units[i]
+        cid, tid = u["class_id"], u["teacher_id"]
+        block_mask = ((1 << u["block"]) - 1) << s
+        class_busy[cid] |= block_mask
+        teacher_busy[tid] |= block_mask
+        group_days[(cid, u["subject"])] |= day_masks[s // ppd]
+        if unit_rooms[i] is not None:
+            room_load.book(unit_rooms[i], s, u["block"])
+            room_starts[i] = s
+        for k in range(u["block"]):
+            class_table[cid][s+k] = _cell(u["subject"], "teacher_id", tid)
+            teacher_table[tid][s+k] = _cell(u["subject"], "class_id", cid)
+
+    def candidates(i):
+        u = units[i]
+        free = ~(class_busy[u["class_id"]] | teacher_busy[u["teacher_id"]] | group_days[(u["class_id"], u["subject"])])
+        mask = allowed[i] & free
+        for k in range(1, u["block"]):
+            mask &= free >> k
+        if unit_rooms[i] is not None:
+            mask &= room_load.starts(unit_rooms[i], u["block"])
+        return mask
+
+    # Pins first, then every kept unit that still fits around them
+    for i, s in pins.items():
+        place(i, s)
+    freed = [i for i in freed if i not in pins]
+    kept_units = []
+    for i, s in kept:
+        if i in pins:
+            kept_units.append((i, s))
+        elif (candidates(i) >> s) & 1:
+            place(i, s)
+            if unit_rooms[i] is not None:
+                prefer[i] = pool.lanes_of(previous[units[i]["class_id"]][s].get("room"))
+            kept_units.append((i, s))
+        else:
+            freed.append(i)
+    kept = kept_units
+
+    # Fewest free starts first (longer blocks break ties); recounted after each
+    # placement since freed units of one class or teacher compete for the same slots
+    remaining = []
+    pending = list(freed)
+    rng.shuffle(pending)
+    while pending and not deadline.expired():
+        best_j, best_mask, best_count = 0, 0, None
+        for j, i in enumerate(pending):
+            mask = candidates(i)
+            count = mask.bit_count()
+            if best_count is None or (count, -units[i]["block"]) < (best_count, -units[pending[best_j]]["block"]):
+                best_j, best_mask, best_count = j, mask, count
+                if not count:
+                    break
+        i = pending.pop(best_j)
+        if not best_mask:
+            remaining.append(units[i])
+            continue
+        starts = [s for s in range(num_slots) if (best_mask >> s) & 1]
+        place(i, rng.choice(starts))
+    timed_out = bool(pending)
+    remaining.extend(units[i] for i in pending)
+    if room_starts:
+        _name_rooms(pool, unit_rooms, room_starts, units, class_table, teacher_table, prefer)
+
+    placed_count = sum(1 for row in class_table.values() for v in row if v is not None)
+    meta = {"best_remaining": len(remaining), "placed": placed_count, "elapsed": time.time() - start_time,
+            "status": run_status(remaining, timed_out), "kept": len(kept), "freed": len(freed), "moved": 0}
+    if st_progress is not None:
+        st_progress[1].text(f"Kept {len(kept)} units, re-placed {len(freed) - len(remaining)} of {len(freed)}")
+    result = repair_result(classes, teachers, assignments, timeslots, (class_table, teacher_table, remaining, meta), repair_seconds, seed=seed, st_progress=st_progress, deadline=deadline, constraints=constraints)
+    if result[0] is not class_table:
+        new_class = result[0]
+        result[3]["moved"] = sum(1 for i, s in kept if any(_moved(new_class[units[i]["class_id"]][s+k], units[i]) for k in range(units[i]["block"])))
+    return result
+
+
+def _moved(cell, unit):
+    # True unless ``cell`` still holds ``unit``'s lesson (its room may differ)
+    return cell is None or cell["subject"] != unit["subject"] or cell["teacher_id"] != unit["teacher_id"]
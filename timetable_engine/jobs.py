@@ -0,0 +1,398 @@
+# timetable_engine/jobs.py
+# Background department solves: jobs are queued in a SQLite file, run by worker
+# processes (started by the app or with `python -m timetable_engine.jobs worker`)
+# and polled for progress and results, so a long solve never ties up a web request.
+
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from dataclasses import asdict
+
+from .constraints import Constraints
+from .cp import schedule_cp
+from .deadline import Deadline
+from .department import build_grid, schedule_best_of_n, score_result
+from .models import Teacher, ClassGroup, Assignment
+from .quality import SoftScorer
+from .stats import SolverStats
+from .store import decode_result, encode_result
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+DEFAULT_DB = "timetable_jobs.sqlite"
+# A running job whose worker has not written a heartbeat for this long is assumed
+# dead and queued again, at most MAX_ATTEMPTS times in all
+STALE_SECONDS = 60.0
+MAX_ATTEMPTS = 3
+HEARTBEAT_SECONDS = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    label TEXT NOT NULL DEFAULT '',
+    key TEXT,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT NOT NULL DEFAULT '',
+    cancel INTEGER NOT NULL DEFAULT 0,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+# Everything but the request / result payloads, for listings and polling
+_SUMMARY = "id, label, key, status, created, started, finished, heartbeat, worker, attempts, progress, message, cancel, error"
+
+
+def job_request(teachers, classes, assignments, days, periods_per_day, settings):
+    """The JSON-ready description of one department solve.
+
+    ``settings`` uses the app's solve-settings keys: "solver" ("trials" or
+    "cp"), "trials", "repair_seconds", "seed" (0 / None = random),
+    "time_budget" (0 / None = no limit), "constraints" (Constraints.to_dict()),
+    "quality" (soft-constraint weights plus "max_consecutive", or None),
+    "stats", "adaptive", and optionally "backend" and "workers".
+    """
+    return {
+        "teachers": [asdict(t) for t in teachers],
+        "classes": [asdict(c) for c in classes],
+        "assignments": [asdict(a) for a in assignments],
+        "days": list(days),
+        "periods_per_day": int(periods_per_day),
+        "settings": dict(settings),
+    }
+
+
+def request_entities(request):
+    """(teachers, classes, assignments, constraints) of a job request."""
+    teachers = [Teacher(**t) for t in request["teachers"]]
+    classes = [ClassGroup(**c) for c in request["classes"]]
+    assignments = [Assignment(**a) for a in request["assignments"]]
+    return teachers, classes, assignments, Constraints.from_dict(request["settings"].get("constraints") or {})
+
+
+def solve_request(request, st_progress=None, deadline=None):
+    """Run the solve a job request describes.
+
+    ``deadline`` (a Deadline) replaces the request's time budget, so the caller
+    can cancel the run. Returns (class_table, teacher_table, remaining, meta)
+    like schedule_best_of_n.
+    """
+    teachers, classes, assignments, constraints = request_entities(request)
+    settings = request["settings"]
+    timeslots, _ = build_grid(request["days"], request["periods_per_day"])
+    if deadline is None:
+        deadline = Deadline(settings.get("time_budget") or None)
+    quality = settings.get("quality")
+    scorer = None
+    if quality:
+        weights = {name: weight for name, weight in quality.items() if name != "max_consecutive"}
+        scorer = SoftScorer(weights, max_consecutive=int(quality.get("max_consecutive", 3)))
+    stats = SolverStats() if settings.get("stats") else None
+    seed = settings.get("seed") or None
+    if settings.get("solver") == "cp":
+        result = schedule_cp(classes, teachers, assignments, timeslots, seed=seed, st_progress=st_progress, deadline=deadline, constraints=constraints, stats=stats)
+    else:
+        result = schedule_best_of_n(
+            classes, teachers, assignments, timeslots,
+            trials=int(settings.get("trials", 300)), st_progress=st_progress, backend=settings.get("backend", "Bitset"),
+            seed=seed, workers=int(settings.get("workers", 1)), repair_seconds=float(settings.get("repair_seconds", 0.0)),
+            deadline=deadline, constraints=constraints, scorer=scorer, stats=stats, adaptive=bool(settings.get("adaptive")),
+        )
+    return score_result(result, scorer, assignments, timeslots)
+
+
+class JobStore:
+    """The job queue: one SQLite file shared by the app and every worker.
+
+    Each call opens its own connection, so a store can be used from several
+    threads and processes; claim() takes the write lock, so two workers never
+    start the same job.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, request, label="", key=None):
+        """Queue a job_request(); returns the new job id. ``key`` is free for the
+        caller, e.g. the result-cache key of the problem."""
+        job_id = uuid.uuid4().hex
+        with self._db() as db:
+            db.execute("INSERT INTO jobs (id, label, key, status, created, request) VALUES (?, ?, ?, ?, ?, ?)",
+                       (job_id, label, key, QUEUED, time.time(), json.dumps(request)))
+        return job_id
+
+    def get(self, job_id):
+        """Status row of a job as a dict (no request / result payload), or None."""
+        with self._db() as db:
+            row = db.execute(f"SELECT {_SUMMARY} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else dict(row)
+
+    def jobs(self, limit=50, statuses=None):
+        """Status rows of the newest jobs, optionally only those in ``statuses``."""
+        query = f"SELECT {_SUMMARY} FROM jobs"
+        params = []
+        if statuses:
+            query += f" WHERE status IN ({', '.join('?' * len(statuses))})"
+            params.extend(statuses)
+        query += " ORDER BY created DESC LIMIT ?"
+        params.append(limit)
+        with self._db() as db:
+            return [dict(row) for row in db.execute(query, params)]
+
+    def request(self, job_id):
+        with self._db() as db:
+            row = db.execute("SELECT request FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else json.loads(row["request"])
+
+    def result(self, job_id):
+        """The solver result of a finished job, or None if it has none (yet)."""
+        with self._db() as db:
+            row = db.execute("SELECT result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None or row["result"] is None else decode_result(row["result"])
+
+    def cancel(self, job_id):
+        """Drop a queued job, or ask a running one to stop; a cancelled run keeps
+        the best timetable it found so far as its result."""
+        now = time.time()
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = ?, finished = ?, cancel = 1 WHERE id = ? AND status = ?", (CANCELLED, now, job_id, QUEUED))
+            db.execute("UPDATE jobs SET cancel = 1 WHERE id = ? AND status = ?", (job_id, RUNNING))
+
+    def claim(self, worker):
+        """Mark the oldest queued job as running on ``worker``; returns
+        (job id, request) or None when the queue is empty."""
+        now = time.time()
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT id, request FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = ?, started = ?, heartbeat = ?, worker = ?, attempts = attempts + 1, progress = 0, message = '' WHERE id = ?",
+                               (RUNNING, now, now, worker, row["id"]))
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return None if row is None else (row["id"], json.loads(row["request"]))
+
+    def heartbeat(self, job_id, progress, message):
+        """Record a running job's progress (0..1); returns True if it was asked to cancel."""
+        with self._db() as db:
+            db.execute("UPDATE jobs SET heartbeat = ?, progress = ?, message = ? WHERE id = ? AND status = ?",
+                       (time.time(), progress, message, job_id, RUNNING))
+            row = db.execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel"])
+
+    def finish(self, job_id, result, cancelled=False):
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = ?, finished = ?, progress = 1, result = ? WHERE id = ? AND status = ?",
+                       (CANCELLED if cancelled else DONE, time.time(), encode_result(result), job_id, RUNNING))
+
+    def fail(self, job_id, error):
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = ?, finished = ?, error = ? WHERE id = ? AND status = ?",
+                       (FAILED, time.time(), error, job_id, RUNNING))
+
+    def requeue_stale(self, max_age=STALE_SECONDS):
+        """Queue running jobs whose worker went quiet again (or fail them after
+        MAX_ATTEMPTS); returns how many were requeued."""
+        cutoff = time.time() - max_age
+        with self._db() as db:
+            db.execute("UPDATE jobs SET status = ?, finished = ?, error = 'worker stopped responding' WHERE status = ? AND heartbeat < ? AND attempts >= ?",
+                       (FAILED, time.time(), RUNNING, cutoff, MAX_ATTEMPTS))
+            return db.execute("UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat < ?",
+                              (QUEUED, RUNNING, cutoff)).rowcount
+
+    def purge(self, older_than):
+        """Delete finished jobs that finished more than ``older_than`` seconds ago."""
+        with self._db() as db:
+            return db.execute(f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED))}) AND finished < ?",
+                              (*FINISHED, time.time() - older_than)).rowcount
+
+
+class _Progress:
+    """Stands in for the (progress bar, status text) pair the solvers report to;
+    the heartbeat thread copies the latest values into the job row."""
+
+    def __init__(self):
+        self.fraction = 0.0
+        self.message = ""
+
+    def progress(self, value):
+        self.fraction = value / 100
+
+    def text(self, message):
+        self.message = message
+
+
+def run_job(store, job_id, request):
+    """Solve one claimed job and store its result (or the traceback)."""
+    deadline = Deadline(request["settings"].get("time_budget") or None)
+    progress = _Progress()
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_SECONDS):
+            if store.heartbeat(job_id, progress.fraction, progress.message):
+                deadline.cancel()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        result = solve_request(request, (progress, progress), deadline)
+    except Exception:
+        store.fail(job_id, traceback.format_exc())
+        return
+    finally:
+        stop.set()
+        thread.join()
+    store.finish(job_id, result, cancelled=deadline.cancelled)
+
+
+def work(path=DEFAULT_DB, poll=1.0, stop=None, once=False):
+    """Worker loop: claim and run jobs until ``stop`` (a threading or
+    multiprocessing Event) is set, or with ``once`` until the queue is empty."""
+    store = JobStore(path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    while stop is None or not stop.is_set():
+        store.requeue_stale()
+        claimed = store.claim(worker)
+        if claimed is not None:
+            run_job(store, *claimed)
+        elif once:
+            return
+        elif stop is not None:
+            stop.wait(poll)
+        else:
+            time.sleep(poll)
+
+
+def _serve(path, poll, stop):
+    # Pool worker: Ctrl-C is the parent's to handle; it stops the workers through ``stop``
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    work(path, poll, stop)
+
+
+class WorkerPool:
+    """``processes`` local worker processes serving one job file.
+
+    The workers are not daemonic, so a job may itself use a process pool
+    (workers > 1). stop() lets each finish its current job, or with a timeout
+    terminates the ones still busy; their jobs go back on the queue once
+    their heartbeat is STALE_SECONDS old. A started pool is stopped with a
+    short timeout when the interpreter exits.
+    """
+
+    def __init__(self, path=DEFAULT_DB, processes=2, poll=1.0):
+        self.path = path
+        self.processes = processes
+        self.poll = poll
+        self._stop = None
+        self._procs = []
+
+    def start(self):
+        ctx = multiprocessing.get_context()
+        self._stop = ctx.Event()
+        self._procs = [ctx.Process(target=_serve, args=(self.path, self.poll, self._stop), name=f"timetable-job-worker-{i}") for i in range(self.processes)]
+        for proc in self._procs:
+            proc.start()
+        atexit.register(self.stop, 5.0)
+        return self
+
+    def alive(self):
+        return sum(1 for proc in self._procs if proc.is_alive())
+
+    def join(self):
+        for proc in self._procs:
+            proc.join()
+
+    def stop(self, timeout=None):
+        if self._stop is not None:
+            self._stop.set()
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+                proc.join()
+        self._procs = []
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="timetable_engine.jobs", description="Run or inspect background timetable jobs.")
+    parser.add_argument("--db", default=os.environ.get("TIMETABLE_JOBS_DB", DEFAULT_DB), help="Job file shared with the app (default: $TIMETABLE_JOBS_DB or %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    worker = sub.add_parser("worker", help="Run queued jobs until interrupted")
+    worker.add_argument("--processes", type=int, default=1, help="Worker processes to start (default: %(default)s)")
+    worker.add_argument("--once", action="store_true", help="Exit when the queue is empty (single process only)")
+    sub.add_parser("list", help="Show the newest jobs")
+    cancel = sub.add_parser("cancel", help="Cancel a queued or running job")
+    cancel.add_argument("job_id")
+    purge = sub.add_parser("purge", help="Delete finished jobs")
+    purge.add_argument("--days", type=float, default=7.0, help="Only jobs finished more than this many days ago (default: %(default)s)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    store = JobStore(args.db)
+    if args.command == "worker":
+        if args.processes <= 1:
+            try:
+                work(args.db, once=args.once)
+            except KeyboardInterrupt:
+                pass
+            return 0
+        pool = WorkerPool(args.db, args.processes).start()
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
+        return 0
+    if args.command == "list":
+        for job in store.jobs():
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(job["created"]))
+            print(f"{job['id']}  {when}  {job['status']:<9}  {job['progress']*100:3.0f}%  {job['label']}  {job['message']}")
+        return 0
+    if args.command == "cancel":
+        if store.get(args.job_id) is None:
+            print(f"No job {args.job_id}", file=sys.stderr)
+            return 2
+        store.cancel(args.job_id)
+        return 0
+    print(f"Deleted {store.purge(args.days * 86400)} job(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+# timetable_engine/loaders.py
+# Read teachers / classes / assignments from the Excel sheet or the JSON state format
+
+import json
+
+from .constraints import Constraints
+from .models import Teacher, ClassGroup, Assignment
+from .units import CATEGORIES
+
+EXCEL_COLUMNS = ["Teacher", "Class", "Subject", "Category", "Periods/week"]
+# Single-class builder batch sheet: one row per subject of a class
+BATCH_COLUMNS = ["Class", "Category", "Subject", "Staff", "Periods"]
+
+
+def state_to_json(teachers, classes, assignments, constraints=None):
+    payload = {
+        "teachers":[{"id":t.id,"name":t.name,"subjects":t.subjects} for t in teachers],
+        "classes":[{"id":c.id,"name":c.name} for c in classes],
+        "assignments":[{"id":a.id,"teacher_id":a.teacher_id,"class_id":a.class_id,"subject":a.subject,"category":a.category,"periods_per_week":a.periods_per_week} for a in assignments]
+    }
+    if constraints:
+        payload["constraints"] = constraints.to_dict()
+    return json.dumps(payload, indent=2)
+
+
+def state_from_json(text):
+    obj = json.loads(text)
+    teachers = [Teacher(**t) for t in obj.get("teachers",[])]
+    classes = [ClassGroup(**c) for c in obj.get("classes",[])]
+    assignments = []
+    for a in obj.get("assignments", []):
+        if "category" not in a:
+            a["category"] = "Theory"
+        assignments.append(Assignment(**a))
+    return teachers, classes, assignments
+
+
+def constraints_from_json(text):
+    """The Constraints stored in a JSON state file (empty if it has none)."""
+    return Constraints.from_dict(json.loads(text).get("constraints", {}))
+
+
+def _bad_rows(df, mask, limit=5):
+    # Spreadsheet row numbers (header is row 1) for an error message
+    rows = [str(i + 2) for i in range(len(df)) if mask[i]]
+    more = f" and {len(rows) - limit} more" if len(rows) > limit else ""
+    return ", ".join(rows[:limit]) + more
+
+
+def entities_from_frame(df):
+    """Build (teachers, classes, assignments) from the Excel sheet, one assignment per row.
+
+    Teachers and classes get ids in order of first appearance. Columns are
+    cleaned and validated as a whole; ValueError names the offending rows.
+    """
+    import pandas as pd
+
+    missing = [col for col in EXCEL_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Excel must have these columns: {', '.join(EXCEL_COLUMNS)}")
+
+    text = {}
+    for col in ("Teacher", "Class", "Subject", "Category"):
+        values = df[col].astype("string").str.strip()
+        blank = (values.isna() | (values == "")).to_numpy()
+        if blank.any():
+            raise ValueError(f"Empty '{col}' in row(s) {_bad_rows(df, blank)}")
+        text[col] = values
+
+    periods = pd.to_numeric(df["Periods/week"], errors="coerce")
+    bad = (periods.isna() | (periods < 1) | (periods % 1 != 0)).to_numpy()
+    if bad.any():
+        raise ValueError(f"'Periods/week' must be a whole number of at least 1 (row(s) {_bad_rows(df, bad)})")
+
+    # Category spelling is normalised ("lab" -> "Lab"); anything else is rejected
+    canonical = {c.lower(): c for c in CATEGORIES}
+    category = text["Category"].str.lower().map(canonical)
+    bad = category.isna().to_numpy()
+    if bad.any():
+        raise ValueError(f"'Category' must be one of {', '.join(CATEGORIES)} (row(s) {_bad_rows(df, bad)})")
+
+    teacher_codes, teacher_names = pd.factorize(text["Teacher"])
+    class_codes, class_names = pd.factorize(text["Class"])
+
+    teachers = [Teacher(id=i+1, name=name, subjects=[]) for i, name in enumerate(teacher_names)]
+    classes = [ClassGroup(id=i+1, name=name) for i, name in enumerate(class_names)]
+    assignments = [
+        Assignment(id=i+1, teacher_id=t+1, class_id=c+1, subject=subj, category=cat, periods_per_week=pw)
+        for i, (t, c, subj, cat, pw) in enumerate(zip(
+            teacher_codes.tolist(), class_codes.tolist(), text["Subject"].tolist(),
+            category.tolist(), periods.astype(int).tolist()))
+    ]
+    return teachers, classes, assignments
+
+
+def batch_from_frame(df):
+    """Class name -> subject list (create_single_class_timetable format) from a
+    sheet with BATCH_COLUMNS, one subject per row, classes in order of appearance."""
+    import pandas as pd
+
+    missing = [col for col in BATCH_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Sheet must have these columns: {', '.join(BATCH_COLUMNS)}")
+
+    text = {}
+    for col in ("Class", "Category", "Subject", "Staff"):
+        values = df[col].astype("string").str.strip()
+        if col != "Staff":
+            blank = (values.isna() | (values == "")).to_numpy()
+            if blank.any():
+                raise ValueError(f"Empty '{col}' in row(s) {_bad_rows(df, blank)}")
+        text[col] = values.fillna("")
+
+    periods = pd.to_numeric(df["Periods"], errors="coerce")
+    bad = (periods.isna() | (periods < 1) | (periods % 1 != 0)).to_numpy()
+    if bad.any():
+        raise ValueError(f"'Periods' must be a whole number of at least 1 (row(s) {_bad_rows(df, bad)})")
+
+    classes = {}
+    for cname, cat, subj, staff, p in zip(text["Class"].tolist(), text["Category"].tolist(), text["Subject"].tolist(), text["Staff"].tolist(), periods.astype(int).tolist()):
+        classes.setdefault(cname, []).append({"category": cat, "subject": subj, "staff": staff, "periods": p})
+    return classes
+
+
+def load_excel(path_or_file):
+    import pandas as pd  # only the Excel path needs pandas
+    return entities_from_frame(pd.read_excel(path_or_file))
+
+
+def load_inputs(path):
+    """Load (teachers, classes, assignments) from an .xlsx sheet or a .json state file."""
+    if str(path).lower().endswith(".json"):
+        with open(path, encoding="utf-8") as fh:
+            return state_from_json(fh.read())
+    return load_excel(path)
@@ -0,0 +1,40 @@
+# timetable_engine/models.py
+# Domain dataclasses shared by the Streamlit app and the solvers
+
+from dataclasses import dataclass
+from typing import List
+
+# -----------------------
+# Domain dataclasses
+# -----------------------
+# __slots__ keeps large imports (tens of thousands of assignments) compact.
+@dataclass
+class Teacher:
+    __slots__ = ("id", "name", "subjects")
+    id: int
+    name: str
+    subjects: List[str]
+
+@dataclass
+class ClassGroup:
+    __slots__ = ("id", "name")
+    id: int
+    name: str
+
+@dataclass
+class Assignment:
+    __slots__ = ("id", "teacher_id", "class_id", "subject", "category", "periods_per_week")
+    id: int
+    teacher_id: int
+    class_id: int
+    subject: str
+    category: str      # NEW FIELD
+    periods_per_week: int
+
+@dataclass
+class Room:
+    __slots__ = ("id", "name", "category", "capacity")
+    id: int
+    name: str
+    category: str      # assignment category it hosts, e.g. "Lab"
+    capacity: int      # classes it holds in the same period
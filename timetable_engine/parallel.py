@@ -0,0 +1,162 @@
+# timetable_engine/parallel.py
+# Best-of-N over a process pool: trial seeds are split into chunks, workers share
+# an early-stop marker, and the winner is chosen exactly as the sequential loop would.
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .deadline import as_deadline, run_status
+from .department import PLACEMENT_BACKENDS, diagnose, has_overload, periods_in_day, trial_seeds
+from .solution import Layout, Solution, place_once_compact
+from .stats import SolverStats
+
+# Worker-process globals, set once per process by _init_worker
+_problem = None
+_layout = None
+_stop_at = None
+_scorer = None
+_collect_stats = False
+
+
+def _init_worker(problem, layout, stop_at, scorer=None, collect_stats=False):
+    global _problem, _layout, _stop_at, _scorer, _collect_stats
+    _problem = problem
+    _layout = layout
+    _stop_at = stop_at
+    _scorer = scorer
+    _collect_stats = collect_stats
+
+
+def _run_chunk(indexed_seeds, backend, deadline_at=None):
+    # Returns the chunk's best trial as (key, payload) where key = (remaining, -placed, penalty, trial index),
+    # plus how many trials actually ran, whether the deadline cut the chunk short and
+    # the chunk's SolverStats (None unless the run collects them).
+    # With a Layout the payload is the compact (class_slots, remaining) pair, so only
+    # a flat array crosses the process boundary.
+    classes, teachers, assignments, timeslots, constraints = _problem
+    place_once = PLACEMENT_BACKENDS[backend]
+    best = None
+    ran = 0
+    stats = SolverStats() if _collect_stats else None
+    for idx, seed in indexed_seeds:
+        # Trials past a known complete solution can never win; skip them.
+        # The parent sets the marker to -1 to cancel the run.
+        if idx > _stop_at.value:
+            return best, ran, _stop_at.value < 0, stats
+        # deadline_at is an absolute time.time(), so it means the same in every process
+        if deadline_at is not None and ran and time.time() >= deadline_at:
+            return best, ran, True, stats
+        trial_start = time.perf_counter()
+        if _layout is not None:
+            trial = place_once_compact(_layout, seed=seed, scorer=_scorer, stats=stats)
+            remaining = trial.remaining
+            placed_count = trial.placed_count
+            payload = (trial.class_slots, remaining)
+        else:
+            class_table, teacher_table, remaining = place_once(classes, teachers, assignments, timeslots, seed=seed, constraints=constraints, scorer=_scorer, stats=stats)
+            placed_count = sum(1 for cid in class_table for v in class_table[cid] if v is not None)
+            payload = (class_table, teacher_table, remaining)
+        if stats is not None:
+            stats.trials += 1
+            stats.trial_seconds.append(time.perf_counter() - trial_start)
+        penalty = 0
+        # Same rule as the sequential loop: only trials that can win are scored
+        if _scorer is not None and (best is None or (len(remaining), -placed_count) <= best[0][:2]):
+            if _layout is not None:
+                penalty = _scorer.score_solution(trial)[0]
+            else:
+                penalty = _scorer.score_tables(class_table, teacher_table, assignments, periods_in_day(timeslots))[0]
+        key = (len(remaining), -placed_count, penalty, idx)
+        ran += 1
+        if best is None or key < best[0]:
+            best = (key, payload)
+        if not remaining and not penalty:
+            with _stop_at.get_lock():
+                if idx < _stop_at.value:
+                    _stop_at.value = idx
+            break
+    return best, ran, False, stats
+
+
+def default_workers():
+    return max(1, os.cpu_count() or 1)
+
+
+def schedule_best_of_n_parallel(classes, teachers, assignments, timeslots, trials=300, st_progress=None, backend="Bitset", seed=None, workers=None, chunk_size=None, deadline=None, constraints=None, scorer=None, stats=None):
+    """Run schedule_best_of_n's trials on a process pool.
+
+    For a fixed master ``seed`` the result is identical to the sequential
+    schedule_best_of_n: every trial up to the first complete solution is run,
+    and ties are broken by trial index (after the ``scorer`` penalty, if one is
+    given). A ``deadline`` that passes (or is cancelled) stops the workers at
+    their next trial. ``stats`` receives the workers' counters (its profiler
+    does not reach them).
+    """
+    deadline = as_deadline(deadline)
+    num_slots = len(timeslots)
+    if has_overload(classes, teachers, assignments, num_slots, constraints, timeslots):
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+
+    workers = workers or default_workers()
+    seeds = list(enumerate(trial_seeds(trials, seed)))
+    if chunk_size is None:
+        # Small chunks keep the early stop responsive and the progress bar moving
+        chunk_size = max(1, min(25, trials // (workers * 4)))
+    chunks = [seeds[i:i+chunk_size] for i in range(0, len(seeds), chunk_size)]
+
+    ctx = multiprocessing.get_context()
+    stop_at = ctx.Value("i", trials)
+    problem = (classes, teachers, assignments, timeslots, constraints)
+    layout = Layout(classes, teachers, assignments, timeslots, constraints=constraints) if backend == "Bitset" else None
+
+    best = None
+    done = 0
+    timed_out = False
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(problem, layout, stop_at, scorer, stats is not None)) as pool:
+        futures = {pool.submit(_run_chunk, chunk, backend, deadline.at): chunk[0][0] for chunk in chunks}
+        pending = set(futures)
+        while pending:
+            # Wake up now and then so an expired or cancelled deadline reaches the
+            # workers without waiting for a whole chunk
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                if fut.cancelled():
+                    continue
+                chunk_best, ran, cut, chunk_stats = fut.result()
+                done += ran
+                if chunk_stats is not None:
+                    stats.merge(chunk_stats)
+                timed_out = timed_out or cut
+                if chunk_best is not None and (best is None or chunk_best[0] < best[0]):
+                    best = chunk_best
+            if best is not None and best[0][0] == 0 and best[0][2] == 0:
+                # Chunks starting after the first complete solution are not needed
+                for other in pending:
+                    if futures[other] > stop_at.value:
+                        other.cancel()
+            elif best is not None and deadline.expired():
+                timed_out = True
+                stop_at.value = -1
+                for other in pending:
+                    other.cancel()
+            if st_progress is not None:
+                bar, status = st_progress
+                bar.progress(min(100, int(max(done/trials, deadline.fraction_used())*100)))
+                status.text(f"Trials {done}/{trials} on {workers} workers — best remaining {best[0][0] if best else '-'}")
+    elapsed = time.time() - start
+
+    if best is None:
+        return None, None, None, {"diag": diagnose(classes, teachers, assignments, num_slots, constraints, timeslots)}
+    (best_remaining, neg_placed, _, _), payload = best
+    meta = {"best_remaining": best_remaining, "placed": -neg_placed, "elapsed": elapsed, "trials": done, "workers": workers, "status": run_status(best_remaining, timed_out)}
+    if stats is not None:
+        meta["stats"] = stats.as_dict()
+    if layout is not None:
+        solution = Solution(layout, payload[0], payload[1], -neg_placed)
+        meta["solution"] = solution
+        payload = solution.tables()
+    class_table, teacher_table, remaining = payload
+    return class_table, teacher_table, remaining, meta
@@ -0,0 +1,186 @@
+# timetable_engine/quality.py
+# Soft constraints: how pleasant a timetable is beyond placing every unit.
+# A scorer turns a solution into a penalty (lower is better) so best-of-N can
+# rank trials that place the same number of units.
+
+from functools import lru_cache
+
+from .units import KINDS
+
+LAB = KINDS.index("lab")
+
+# Default weight per term; a term missing from a scorer's weights is not evaluated
+DEFAULT_WEIGHTS = {"teacher_gaps": 3, "consecutive_load": 2, "daily_spread": 1, "lab_placement": 1}
+
+
+class Occupancy:
+    """What the soft-constraint terms look at, built once per scored trial.
+
+    ``teacher_days[t][d]`` is teacher t's bit pattern on day d (bit p = period p),
+    ``lab_starts`` the period (within its day) each placed lab block starts at.
+    """
+    __slots__ = ("periods_per_day", "teacher_days", "lab_starts", "max_consecutive", "lab_periods")
+
+    def __init__(self, periods_per_day, teacher_days, lab_starts, max_consecutive, lab_periods):
+        self.periods_per_day = periods_per_day
+        self.teacher_days = teacher_days
+        self.lab_starts = lab_starts
+        self.max_consecutive = max_consecutive
+        self.lab_periods = lab_periods
+
+
+@lru_cache(maxsize=None)
+def _day_shape(pattern, limit):
+    # (idle periods between the first and last lesson, periods past ``limit`` in a row)
+    # for one day's pattern; cached, since a week only has 2**periods_per_day of them
+    gaps = over = run = 0
+    seen = False
+    idle = 0
+    while pattern:
+        if pattern & 1:
+            if seen:
+                gaps += idle
+            seen = True
+            idle = 0
+            run += 1
+            over += run > limit
+        else:
+            idle += 1
+            run = 0
+        pattern >>= 1
+    return gaps, over
+
+
+def teacher_gaps(occ):
+    """Free periods a teacher sits through between lessons on the same day."""
+    limit = occ.max_consecutive
+    return sum(_day_shape(p, limit)[0] for days in occ.teacher_days for p in days)
+
+
+def consecutive_load(occ):
+    """Lessons taught beyond ``max_consecutive`` in a row."""
+    limit = occ.max_consecutive
+    return sum(_day_shape(p, limit)[1] for days in occ.teacher_days for p in days)
+
+
+def daily_spread(occ):
+    """Difference between a teacher's busiest and lightest day, summed over teachers."""
+    total = 0
+    for days in occ.teacher_days:
+        loads = [p.bit_count() for p in days]
+        if any(loads):
+            total += max(loads) - min(loads)
+    return total
+
+
+def lab_placement(occ):
+    """Lab blocks starting outside the preferred periods."""
+    return sum(1 for p in occ.lab_starts if p not in occ.lab_periods)
+
+
+SOFT_TERMS = {
+    "teacher_gaps": teacher_gaps,
+    "consecutive_load": consecutive_load,
+    "daily_spread": daily_spread,
+    "lab_placement": lab_placement,
+}
+
+
+class SoftScorer:
+    """Weighted sum of soft-constraint terms.
+
+    ``weights`` maps term names to weights (DEFAULT_WEIGHTS if omitted); extra
+    ``terms`` (name -> function of an Occupancy) are looked up before SOFT_TERMS,
+    so a deployment can add its own rules. ``lab_periods`` are the 0-based
+    periods a lab may start at without penalty (default: the second half of
+    the day). Scorers are sent to worker processes, so custom terms must be
+    module-level functions.
+
+    placement_cost() prices one placement against the built-in terms so the
+    trial backends can pick the cheapest free slot as they go; custom terms
+    only take part in ranking finished trials.
+    """
+
+    def __init__(self, weights=None, terms=None, max_consecutive=3, lab_periods=None):
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.terms = dict(SOFT_TERMS, **(terms or {}))
+        unknown = [name for name in self.weights if name not in self.terms]
+        if unknown:
+            raise ValueError(f"Unknown soft constraint(s): {', '.join(unknown)}")
+        self.max_consecutive = max_consecutive
+        self.lab_periods = None if lab_periods is None else frozenset(lab_periods)
+        w = self.weights
+        self._w = (w.get("teacher_gaps", 0), w.get("consecutive_load", 0), w.get("daily_spread", 0), w.get("lab_placement", 0))
+
+    def placement_cost(self, busy, sidx, block, is_lab, ppd, num_days):
+        """Weighted change of the built-in terms if a teacher with occupancy mask
+        ``busy`` takes ``block`` periods from slot ``sidx``."""
+        w_gaps, w_run, w_spread, w_lab = self._w
+        day_mask = (1 << ppd) - 1
+        d = sidx // ppd
+        period = sidx - d*ppd
+        before = (busy >> (d*ppd)) & day_mask
+        after = before | (((1 << block) - 1) << period)
+        cost = 0
+        if w_gaps or w_run:
+            g0, r0 = _day_shape(before, self.max_consecutive)
+            g1, r1 = _day_shape(after, self.max_consecutive)
+            cost += w_gaps*(g1 - g0) + w_run*(r1 - r0)
+        if w_spread:
+            loads = [((busy >> (k*ppd)) & day_mask).bit_count() for k in range(num_days)]
+            spread = max(loads) - min(loads) if any(loads) else 0
+            loads[d] += block
+            cost += w_spread*(max(loads) - min(loads) - spread)
+        if is_lab and w_lab:
+            preferred = self.lab_periods if self.lab_periods is not None else range(ppd // 2, ppd)
+            if period not in preferred:
+                cost += w_lab
+        return cost
+
+    def evaluate(self, occ):
+        """(total penalty, {term: unweighted value})."""
+        breakdown = {name: self.terms[name](occ) for name, weight in self.weights.items() if weight}
+        return sum(self.weights[name] * value for name, value in breakdown.items()), breakdown
+
+    def _occupancy(self, ppd, num_days, teacher_busy, lab_starts):
+        day_mask = (1 << ppd) - 1
+        teacher_days = [[(busy >> (d*ppd)) & day_mask for d in range(num_days)] for busy in teacher_busy if busy]
+        lab_periods = self.lab_periods if self.lab_periods is not None else frozenset(range(ppd // 2, ppd))
+        return Occupancy(ppd, teacher_days, lab_starts, self.max_consecutive, lab_periods)
+
+    def score_solution(self, solution):
+        """Penalty of a compact Solution (see solution.Solution)."""
+        lay = solution.layout
+        n, ppd = lay.num_slots, lay.periods_per_day
+        u_teacher, u_kind = lay.units.teacher, lay.units.kind
+        teacher_busy = [0]*len(lay.teacher_ids)
+        lab_starts = []
+        slots = solution.class_slots
+        for c in range(len(lay.class_ids)):
+            base = c*n
+            prev = -1
+            for s in range(n):
+                u = slots[base + s]
+                if u >= 0:
+                    teacher_busy[u_teacher[u]] |= 1 << s
+                    if u != prev and u_kind[u] == LAB:
+                        lab_starts.append(s % ppd)
+                prev = u
+        return self.evaluate(self._occupancy(ppd, n // ppd if ppd else 0, teacher_busy, lab_starts))
+
+    def score_tables(self, class_table, teacher_table, assignments, periods_per_day):
+        """Penalty of dict tables, as returned by the solvers."""
+        from .repair import units_from_tables
+
+        teacher_busy = []
+        num_slots = 0
+        for cells in teacher_table.values():
+            num_slots = len(cells)
+            mask = 0
+            for s, cell in enumerate(cells):
+                if cell is not None:
+                    mask |= 1 << s
+            teacher_busy.append(mask)
+        lab_starts = [s % periods_per_day for u, s in units_from_tables(class_table, assignments, periods_per_day) if u["kind"] == "lab"]
+        num_days = num_slots // periods_per_day if periods_per_day else 0
+        return self.evaluate(self._occupancy(periods_per_day, num_days, teacher_busy, lab_starts))
@@ -0,0 +1,99 @@
+# timetable_engine/registry.py
+# Teachers / classes / assignments with id -> object indexes that stay in step
+# with the ordered lists on every add, delete and import.
+
+from collections.abc import Mapping
+
+from .models import Teacher, ClassGroup, Assignment
+
+
+class _NameView(Mapping):
+    """Read-only id -> name view over an id -> object index."""
+
+    def __init__(self, index):
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._index[key].name
+
+    def get(self, key, default=None):
+        obj = self._index.get(key)
+        return default if obj is None else obj.name
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+
+class Registry:
+    """The app's entities in insertion order plus O(1) lookups by id."""
+
+    def __init__(self, teachers=(), classes=(), assignments=()):
+        self.replace(teachers, classes, assignments)
+
+    def replace(self, teachers, classes, assignments):
+        # Wholesale load (Excel / JSON import); next ids continue after the largest seen
+        self.teachers = list(teachers)
+        self.classes = list(classes)
+        self.assignments = list(assignments)
+        self.teacher_by_id = {t.id: t for t in self.teachers}
+        self.class_by_id = {c.id: c for c in self.classes}
+        self.assignment_by_id = {a.id: a for a in self.assignments}
+        self.teacher_names = _NameView(self.teacher_by_id)
+        self.class_names = _NameView(self.class_by_id)
+        self.next_teacher_id = max(self.teacher_by_id, default=0) + 1
+        self.next_class_id = max(self.class_by_id, default=0) + 1
+        self.next_assign_id = max(self.assignment_by_id, default=0) + 1
+
+    def teacher_name(self, tid, default="Unknown"):
+        return self.teacher_names.get(tid, default)
+
+    def class_name(self, cid, default="Unknown"):
+        return self.class_names.get(cid, default)
+
+    def add_teacher(self, name, subjects):
+        t = Teacher(id=self.next_teacher_id, name=name, subjects=subjects)
+        self.teachers.append(t)
+        self.teacher_by_id[t.id] = t
+        self.next_teacher_id += 1
+        return t
+
+    def add_class(self, name):
+        c = ClassGroup(id=self.next_class_id, name=name)
+        self.classes.append(c)
+        self.class_by_id[c.id] = c
+        self.next_class_id += 1
+        return c
+
+    def add_assignment(self, teacher_id, class_id, subject, category, periods_per_week):
+        a = Assignment(id=self.next_assign_id, teacher_id=teacher_id, class_id=class_id, subject=subject, category=category, periods_per_week=periods_per_week)
+        self.assignments.append(a)
+        self.assignment_by_id[a.id] = a
+        self.next_assign_id += 1
+        return a
+
+    def delete_teacher(self, tid):
+        # Removes the teacher and every assignment that references them
+        if self.teacher_by_id.pop(tid, None) is not None:
+            self.teachers = [t for t in self.teachers if t.id != tid]
+            self._drop_assignments(lambda a: a.teacher_id == tid)
+
+    def delete_class(self, cid):
+        if self.class_by_id.pop(cid, None) is not None:
+            self.classes = [c for c in self.classes if c.id != cid]
+            self._drop_assignments(lambda a: a.class_id == cid)
+
+    def delete_assignment(self, aid):
+        if self.assignment_by_id.pop(aid, None) is not None:
+            self.assignments = [a for a in self.assignments if a.id != aid]
+
+    def _drop_assignments(self, pred):
+        kept = []
+        for a in self.assignments:
+            if pred(a):
+                del self.assignment_by_id[a.id]
+            else:
+                kept.append(a)
+        self.assignments = kept
@@ -0,0 +1,129 @@
+# timetable_engine/render.py
+# Turn class / teacher tables into day x period text grids, one at a time or all
+# at once for a bulk export (zip of CSVs or one workbook with a sheet per entity)
+
+import csv
+import io
+import re
+import zipfile
+
+# Characters not allowed in zip entry / sheet names
+_UNSAFE = re.compile(r'[\\/:*?"<>|\[\]]+')
+
+
+def _label(val, other):
+    # "Subject (Other)", or "Subject (Other, Room)" for a lesson held in a room
+    room = val.get("room")
+    return f"{val['subject']} ({other})" if room is None else f"{val['subject']} ({other}, {room})"
+
+
+def grid_rows(cells, days, periods_per_day, other_key, names):
+    """Rows of "Subject (Other)" strings for one entity's table (with ", Room"
+    after Other for lessons held in a room).
+
+    ``other_key`` is "teacher_id" for a class table and "class_id" for a
+    teacher table; ``names`` maps those ids to display names.
+    """
+    matrix = []
+    for d_idx, d in enumerate(days):
+        row = []
+        for p in range(periods_per_day):
+            val = cells[d_idx*periods_per_day + p]
+            if val is None:
+                row.append(" ")
+            else:
+                row.append(_label(val, names.get(val[other_key], 'Unknown')))
+        matrix.append(row)
+    return matrix
+
+
+def write_grid_csv(path, days, periods_per_day, matrix):
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["Day"] + [f"P{p}" for p in range(1, periods_per_day+1)])
+        for d, row in zip(days, matrix):
+            writer.writerow([d] + row)
+
+
+def period_header(periods_per_day, timings=None):
+    """Column labels "P1".."Pn", with the period's time when ``timings`` has one."""
+    timings = timings or []
+    return [f"P{p} ({timings[p-1]})" if p <= len(timings) else f"P{p}" for p in range(1, periods_per_day+1)]
+
+
+def all_grids(class_table, days, periods_per_day, class_names, teacher_names):
+    """(class grids, teacher grids): id -> grid_rows-style matrix for every class and
+    teacher, built in one pass over the class table (a teacher's cells are the
+    class cells that name them)."""
+    num_days = len(days)
+
+    def blank():
+        return [[" "]*periods_per_day for _ in range(num_days)]
+
+    class_grids = {}
+    teacher_grids = {tid: blank() for tid in teacher_names}
+    for cid, cells in class_table.items():
+        grid = blank()
+        cname = class_names.get(cid, "Unknown")
+        for sidx, val in enumerate(cells[:num_days*periods_per_day]):
+            if val is None:
+                continue
+            d, p = divmod(sidx, periods_per_day)
+            tid = val["teacher_id"]
+            grid[d][p] = _label(val, teacher_names.get(tid, 'Unknown'))
+            if tid not in teacher_grids:
+                teacher_grids[tid] = blank()
+            teacher_grids[tid][d][p] = _label(val, cname)
+        class_grids[cid] = grid
+    return class_grids, teacher_grids
+
+
+def _csv_text(days, header, matrix):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(["Day"] + header)
+    for d, row in zip(days, matrix):
+        writer.writerow([d] + row)
+    return buf.getvalue()
+
+
+def _unique(name, used, limit=None):
+    # File / sheet name for ``name``: unsafe characters replaced, cut to ``limit``
+    # and made unique among ``used`` with a numeric suffix
+    base = _UNSAFE.sub("_", name).strip() or "unnamed"
+    candidate = base[:limit]
+    n = 2
+    while candidate.lower() in used:
+        suffix = f" ({n})"
+        candidate = base[:limit - len(suffix) if limit else None] + suffix
+        n += 1
+    used.add(candidate.lower())
+    return candidate
+
+
+def export_zip(class_grids, teacher_grids, days, header, class_names, teacher_names):
+    """Bytes of a zip with classes/<name>.csv and teachers/<name>.csv for every grid."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for folder, grids, names in (("classes", class_grids, class_names), ("teachers", teacher_grids, teacher_names)):
+            used = set()
+            for key, matrix in grids.items():
+                zf.writestr(f"{folder}/{_unique(names.get(key, str(key)), used)}.csv", _csv_text(days, header, matrix))
+    return buf.getvalue()
+
+
+def export_xlsx(class_grids, teacher_grids, days, header, class_names, teacher_names):
+    """Bytes of one workbook with a sheet per class ("C <name>") and per teacher ("T <name>")."""
+    from openpyxl import Workbook  # only the Excel export needs openpyxl
+
+    wb = Workbook(write_only=True)
+    used = set()
+    for prefix, grids, names in (("C", class_grids, class_names), ("T", teacher_grids, teacher_names)):
+        for key, matrix in grids.items():
+            ws = wb.create_sheet(_unique(f"{prefix} {names.get(key, key)}", used, limit=31))
+            ws.append(["Day"] + header)
+            for d, row in zip(days, matrix):
+                ws.append([d] + [cell.strip() for cell in row])
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
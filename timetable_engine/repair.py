@@ -0,0 +1,370 @@
+# timetable_engine/repair.py
+# Local-search repair of a best-of-N result: fit the leftover units into the
+# existing timetable with move, swap (Kempe chain) and ejection moves.
+
+import random
+import time
+
+from .deadline import OPTIMAL, TIMED_OUT, as_deadline
+from .department import _cell, _name_rooms, periods_in_day
+
+
+def units_from_tables(class_table, assignments, periods_per_day):
+    """Recover placed units as (unit, start) pairs from a class table.
+
+    A class never has one subject twice on a day, so each run of equal
+    (subject, teacher) cells within a day is exactly one placed unit.
+    """
+    num_slots = len(next(iter(class_table.values()), []))
+    if not num_slots:
+        return []
+    category = {(a.class_id, a.teacher_id, a.subject): a.category for a in assignments}
+    placed = []
+    for cid, cells in class_table.items():
+        s = 0
+        while s < num_slots:
+            cell = cells[s]
+            if cell is None:
+                s += 1
+                continue
+            end = s + 1
+            while end < num_slots and end % periods_per_day != 0 and cells[end] == cell:
+                end += 1
+            block = end - s
+            kind = "lab" if block == 2 and category.get((cid, cell["teacher_id"], cell["subject"])) == "Lab" else "theory"
+            placed.append(({"teacher_id": cell["teacher_id"], "class_id": cid, "subject": cell["subject"], "block": block, "kind": kind}, s))
+            s = end
+    return placed
+
+
+def _repair_masks(units, start, classes, teachers, assignments, timeslots, constraints):
+    """(allowed start masks per unit, set of pinned unit indices) for repair_solution.
+
+    Table units carry no assignment index, so a placed unit counts as pinned when
+    it sits on a pinned start of a matching assignment; an unplaced unit of such
+    an assignment may only take a pinned start no placed unit covers yet.
+    """
+    from .constraints import usable_cells
+
+    ppd = periods_in_day(timeslots)
+    num_days = len(timeslots) // ppd if ppd else 0
+    class_free, teacher_free = usable_cells(constraints, classes, teachers, timeslots)
+    day_start = {}
+    fits = {}
+    allowed = []
+    for u in units:
+        key = (u["class_id"], u["teacher_id"], u["block"])
+        if key not in fits:
+            b = u["block"]
+            if b not in day_start:
+                day_start[b] = sum(1 << (d*ppd + p) for d in range(num_days) for p in range(ppd - b + 1))
+            free = class_free.get(u["class_id"], 0) & teacher_free.get(u["teacher_id"], 0)
+            mask = day_start[b] & free
+            for k in range(1, b):
+                mask &= free >> k
+            fits[key] = mask
+        allowed.append(fits[key])
+
+    fixed = set()
+    if not constraints or not constraints.pinned:
+        return allowed, fixed
+    slot_of = {label: s for s, label in enumerate(timeslots)}
+    open_pins = {}
+    for a in assignments:
+        for label in constraints.pinned.get(a.id, ()):
+            if label in slot_of:
+                open_pins.setdefault((a.class_id, a.teacher_id, a.subject), set()).add(slot_of[label])
+    for i, u in enumerate(units):
+        pinned = open_pins.get((u["class_id"], u["teacher_id"], u["subject"]))
+        if pinned and start[i] in pinned:
+            pinned.discard(start[i])
+            fixed.add(i)
+    for i, u in enumerate(units):
+        pinned = open_pins.get((u["class_id"], u["teacher_id"], u["subject"]))
+        if start[i] < 0 and pinned:
+            allowed[i] = 1 << pinned.pop()
+    return allowed, fixed
+
+
+def repair_solution(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining, time_budget=2.0, seed=None, deadline=None, constraints=None):
+    """Try to place ``remaining`` units into an existing solution within ``time_budget`` seconds.
+
+    Returns (class_table, teacher_table, remaining, meta) with the best state
+    seen (fewest unplaced periods). The input tables are not modified. An
+    optional ``deadline`` (see deadline.Deadline) can end the search sooner.
+    With ``constraints``, moves only use cells the class and teacher can use,
+    pinned units never move, and lessons that need a room keep one: when the
+    rooms of a lesson's kind are full at a slot, the lessons in them count as
+    blockers like those of a busy class or teacher, and a lesson that stays
+    put keeps the room its cells name where it can.
+    """
+    from .rooms import room_pool
+
+    start_time = time.time()
+    stop_time = start_time + time_budget
+    deadline = as_deadline(deadline)
+    rng = random.Random(seed)
+    num_slots = len(timeslots)
+    periods_per_day = periods_in_day(timeslots)
+
+    placed = units_from_tables(class_table, assignments, periods_per_day)
+
+    units = [u for u, _ in placed] + [dict(u) for u in remaining]
+    n = len(units)
+    start = [s for _, s in placed] + [-1]*len(remaining)
+
+    class_occ = {c.id: [-1]*num_slots for c in classes}
+    teacher_occ = {t.id: [-1]*num_slots for t in teachers}
+    day_unit = {}   # (class_id, subject, day) -> unit index
+    allowed, fixed = _repair_masks(units, start, classes, teachers, assignments, timeslots, constraints)
+
+    # Room category per unit (None: no room needed), the units in each category's
+    # rooms per slot and, for placed units, the lanes of the room their cells named
+    pool = room_pool(constraints)
+    prefer = {}
+    if pool is not None:
+        category = {(a.class_id, a.teacher_id, a.subject): a.category for a in assignments}
+        index = {name: r for r, name in enumerate(pool.categories)}
+        unit_rooms = [index.get(category.get((u["class_id"], u["teacher_id"], u["subject"]))) for u in units]
+        room_occ = [[[] for _ in range(num_slots)] for _ in pool.categories]
+        prefer = {i: pool.lanes_of(class_table[u["class_id"]][s].get("room")) for i, (u, s) in enumerate(zip(units, start)) if s >= 0 and unit_rooms[i] is not None}
+    else:
+        unit_rooms = [None]*n
+
+    def add_room_blockers(i, s, found):
+        # Add to ``found`` the units to move so that i's rooms have a free place in
+        # every slot of its block at s: per full slot, enough of the units there
+        # that are not moving yet, unpinned and longest blocks first
+        r = unit_rooms[i]
+        if r is None:
+            return
+        cap = pool.capacity[r]
+        for k in range(units[i]["block"]):
+            here = [o for o in room_occ[r][s+k] if o != i and o not in found]
+            extra = len(here) - cap + 1
+            if extra > 0:
+                here.sort(key=lambda o: (o in fixed, -units[o]["block"]))
+                found.update(here[:extra])
+
+    def blockers(i, s):
+        # Units in the way of starting unit i at s; None if i may not start there at all
+        u = units[i]
+        if not (allowed[i] >> s) & 1:
+            return None
+        found = set()
+        for k in range(u["block"]):
+            for occ in (class_occ[u["class_id"]][s+k], teacher_occ[u["teacher_id"]][s+k]):
+                if occ >= 0 and occ != i:
+                    found.add(occ)
+        other = day_unit.get((u["class_id"], u["subject"], s // periods_per_day), -1)
+        if other >= 0 and other != i:
+            found.add(other)
+        add_room_blockers(i, s, found)
+        if found & fixed:
+            return None
+        return found
+
+    def place(i, s):
+        u = units[i]
+        for k in range(u["block"]):
+            class_occ[u["class_id"]][s+k] = i
+            teacher_occ[u["teacher_id"]][s+k] = i
+        day_unit[(u["class_id"], u["subject"], s // periods_per_day)] = i
+        start[i] = s
+        if unit_rooms[i] is not None:
+            for k in range(u["block"]):
+                room_occ[unit_rooms[i]][s+k].append(i)
+
+    def remove(i):
+        u = units[i]
+        s = start[i]
+        for k in range(u["block"]):
+            class_occ[u["class_id"]][s+k] = -1
+            teacher_occ[u["teacher_id"]][s+k] = -1
+            if unit_rooms[i] is not None:
+                room_occ[unit_rooms[i]][s+k].remove(i)
+        del day_unit[(u["class_id"], u["subject"], s // periods_per_day)]
+        start[i] = -1
+
+    for i in range(n):
+        if start[i] >= 0:
+            place(i, start[i])
+
+    def free_starts(i, exclude=-1):
+        return [s for s in range(num_slots) if s != exclude and blockers(i, s) == set()]
+
+    def try_direct(i):
+        options = free_starts(i)
+        if options:
+            place(i, rng.choice(options))
+            return True
+        return False
+
+    def try_move(i):
+        # Place i on top of one or two units, then re-seat each of them elsewhere
+        slots = list(range(num_slots))
+        rng.shuffle(slots)
+        for s in slots:
+            blocking = blockers(i, s)
+            if not blocking or len(blocking) > 2:
+                continue
+            old = {b: start[b] for b in blocking}
+            for b in blocking:
+                remove(b)
+            place(i, s)
+            moved = []
+            for b in blocking:
+                options = free_starts(b, exclude=old[b])
+                if not options:
+                    break
+                place(b, rng.choice(options))
+                moved.append(b)
+            if len(moved) == len(blocking):
+                return True
+            for b in moved:
+                remove(b)
+            remove(i)
+            for b, s_old in old.items():
+                place(b, s_old)
+        return False
+
+    def try_kempe(i):
+        # Swap the Kempe chain between slots s and t (units linked by a shared class
+        # or teacher) so that s frees up for i. Only single-period units take part.
+        u = units[i]
+        if u["block"] != 1:
+            return False
+        slots = list(range(num_slots))
+        rng.shuffle(slots)
+        for s in slots[:12]:
+            blocking = blockers(i, s)
+            if not blocking or any(units[b]["block"] != 1 or start[b] != s for b in blocking):
+                continue
+            for t in slots:
+                if t == s:
+                    continue
+                chain = set()
+                queue = list(blocking)
+                ok = True
+                while queue:
+                    x = queue.pop()
+                    if x in chain:
+                        continue
+                    if units[x]["block"] != 1 or x in fixed or len(chain) >= 20:
+                        ok = False
+                        break
+                    chain.add(x)
+                    other = t if start[x] == s else s
+                    for occ in (class_occ[units[x]["class_id"]][other], teacher_occ[units[x]["teacher_id"]][other]):
+                        if occ >= 0 and occ not in chain:
+                            queue.append(occ)
+                if not ok:
+                    continue
+                old = {x: start[x] for x in chain}
+                for x in chain:
+                    remove(x)
+                swapped = []
+                for x in chain:
+                    target = t if old[x] == s else s
+                    if blockers(x, target) != set():
+                        break
+                    place(x, target)
+                    swapped.append(x)
+                if len(swapped) == len(chain) and blockers(i, s) == set():
+                    place(i, s)
+                    return True
+                for x in swapped:
+                    remove(x)
+                for x, s_old in old.items():
+                    place(x, s_old)
+        return False
+
+    tabu = {}
+    iteration = 0
+
+    def try_eject(i):
+        # Plateau / improving step: displace units worth no more periods than i,
+        # never ones that were placed in the last few iterations.
+        best = None
+        for s in range(num_slots):
+            blocking = blockers(i, s)
+            if blocking is None or not blocking:
+                continue
+            if any(tabu.get(b, -1) >= iteration for b in blocking):
+                continue
+            cost = sum(units[b]["block"] for b in blocking)
+            if cost > units[i]["block"]:
+                continue
+            key = (cost, rng.random())
+            if best is None or key < best[0]:
+                best = (key, s, blocking)
+        if best is None:
+            return []
+        _, s, blocking = best
+        for b in blocking:
+            remove(b)
+        place(i, s)
+        tabu[i] = iteration + 10
+        return list(blocking)
+
+    queue = [i for i in range(n) if start[i] < 0]
+    best_cost = sum(units[i]["block"] for i in queue)
+    best_start = list(start)
+    initial = len(queue)
+
+    while queue and time.time() < stop_time and not deadline.expired():
+        iteration += 1
+        i = queue.pop(rng.randrange(len(queue)))
+        if try_direct(i) or try_move(i) or try_kempe(i):
+            pass
+        else:
+            ejected = try_eject(i)
+            if start[i] < 0:
+                queue.append(i)
+            queue.extend(ejected)
+        cost = sum(units[j]["block"] for j in queue)
+        if cost < best_cost:
+            best_cost = cost
+            best_start = list(start)
+
+    new_class = {c.id: [None]*num_slots for c in classes}
+    new_teacher = {t.id: [None]*num_slots for t in teachers}
+    left = []
+    for i, u in enumerate(units):
+        s = best_start[i]
+        if s < 0:
+            left.append(u)
+            continue
+        for k in range(u["block"]):
+            new_class[u["class_id"]][s+k] = _cell(u["subject"], "teacher_id", u["teacher_id"])
+            new_teacher[u["teacher_id"]][s+k] = _cell(u["subject"], "class_id", u["class_id"])
+    if pool is not None:
+        room_starts = {i: s for i, s in enumerate(best_start) if s >= 0 and unit_rooms[i] is not None}
+        _name_rooms(pool, unit_rooms, room_starts, units, new_class, new_teacher, prefer)
+
+    placed_count = sum(1 for cid in new_class for v in new_class[cid] if v is not None)
+    return new_class, new_teacher, left, {"best_remaining": len(left), "placed": placed_count, "repaired": initial - len(left), "iterations": iteration, "elapsed": time.time() - start_time}
+
+
+def repair_result(classes, teachers, assignments, timeslots, result, repair_seconds, seed=None, st_progress=None, deadline=None, constraints=None):
+    """Apply repair_solution to a (class_table, teacher_table, remaining, meta) result if it has leftovers.
+
+    Repair gets at most what is left of ``deadline``. meta["status"] becomes
+    "optimal" if repair places everything and "timed out" if the deadline ran out.
+    """
+    class_table, teacher_table, remaining, meta = result
+    deadline = as_deadline(deadline)
+    if deadline.remaining() is not None:
+        repair_seconds = min(repair_seconds, deadline.remaining())
+    if not repair_seconds or not remaining or "diag" in meta:
+        return result
+    if st_progress is not None:
+        st_progress[1].text(f"Repairing {len(remaining)} unplaced units (up to {repair_seconds:g}s)")
+    class_table, teacher_table, remaining, rmeta = repair_solution(classes, teachers, assignments, timeslots, class_table, teacher_table, remaining, time_budget=repair_seconds, seed=seed, deadline=deadline, constraints=constraints)
+    meta = dict(meta, best_remaining=rmeta["best_remaining"], placed=rmeta["placed"], repaired=rmeta["repaired"], elapsed=meta["elapsed"] + rmeta["elapsed"])
+    if not remaining:
+        meta["status"] = OPTIMAL
+    elif deadline.expired():
+        meta["status"] = TIMED_OUT
+    meta.pop("solution", None)  # describes the pre-repair placement
+    return class_table, teacher_table, remaining, meta
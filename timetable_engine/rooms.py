@@ -0,0 +1,135 @@
+# timetable_engine/rooms.py
+# Rooms as a third resource next to classes and teachers. A room hosts lessons of
+# one assignment category (e.g. "Lab") and holds up to ``capacity`` classes at
+# once. While placing, all rooms of a category count as one pool: a per-slot
+# count of the classes in them and a bitmask of the slots where they are full,
+# so testing a start costs the same shifts and ANDs as the class and teacher
+# checks. Which room each lesson gets is settled once its start is known
+# (book_in_start_order), which never fails while no slot is over capacity.
+
+from array import array
+
+from .units import unit_blocks
+
+
+class RoomPool:
+    """The rooms of a run split into lanes, one per class a room can hold.
+
+    ``categories`` lists the categories that have rooms; a category's index
+    in it is how units refer to it (unit_rooms), ``capacity[r]`` is the
+    number of classes category r's rooms hold at once and ``lanes[category]``
+    the tuple of its lanes. ``lane_room[i]`` is the index in ``rooms`` of
+    lane i. Lessons of a category without rooms are placed without one.
+    """
+
+    def __init__(self, rooms):
+        self.rooms = list(rooms)
+        self.lane_room = []
+        lanes = {}
+        for r, room in enumerate(self.rooms):
+            for _ in range(max(1, int(room.capacity))):
+                lanes.setdefault(room.category, []).append(len(self.lane_room))
+                self.lane_room.append(r)
+        self.lanes = {category: tuple(ids) for category, ids in lanes.items()}
+        self.categories = list(self.lanes)
+        self.capacity = [len(self.lanes[category]) for category in self.categories]
+        self.room_index = {room.name: r for r, room in enumerate(self.rooms)}
+
+    def __len__(self):
+        return len(self.lane_room)
+
+    def unit_rooms(self, assignments):
+        """Per unit, in expand_units / UnitTable order: the index in ``categories``
+        of the rooms that may host it, or None when it needs no room."""
+        index = {category: r for r, category in enumerate(self.categories)}
+        return [index.get(a.category) for a in assignments for _ in unit_blocks(a)]
+
+    def load(self, num_slots):
+        """An empty RoomLoad for a grid of ``num_slots`` slots."""
+        return RoomLoad(self.capacity, num_slots)
+
+    def room_name(self, lane):
+        return self.rooms[self.lane_room[lane]].name
+
+    def lanes_of(self, name):
+        """The lanes of the room called ``name`` (empty if there is none)."""
+        r = self.room_index.get(name)
+        return () if r is None else tuple(i for i, room in enumerate(self.lane_room) if room == r)
+
+
+class RoomLoad:
+    """How many classes each room category holds per slot during one run.
+
+    ``full[r]`` is the mask of slots where category r's rooms are all taken;
+    ``used[r][s]`` counts the classes in them at slot s.
+    """
+
+    __slots__ = ("capacity", "used", "full")
+
+    def __init__(self, capacity, num_slots):
+        self.capacity = capacity
+        self.used = [[0]*num_slots for _ in capacity]
+        self.full = [0]*len(capacity)
+
+    def starts(self, r, block):
+        """Mask of starts from which category r has a free place for ``block`` periods."""
+        free = ~self.full[r]
+        mask = free
+        for k in range(1, block):
+            mask &= free >> k
+        return mask
+
+    def book(self, r, start, block):
+        used, cap = self.used[r], self.capacity[r]
+        for s in range(start, start + block):
+            used[s] += 1
+            if used[s] >= cap:
+                self.full[r] |= 1 << s
+
+    def release(self, r, start, block):
+        used, cap = self.used[r], self.capacity[r]
+        for s in range(start, start + block):
+            used[s] -= 1
+            if used[s] < cap:
+                self.full[r] &= ~(1 << s)
+
+
+def room_pool(constraints):
+    """A RoomPool for the rooms in ``constraints``, or None if it has none."""
+    if not constraints or not constraints.rooms:
+        return None
+    return RoomPool(constraints.rooms)
+
+
+def book_in_start_order(pool, unit_rooms, starts, blocks, prefer=None):
+    """Room lanes for units placed at ``starts`` (unit -> start slot): an array
+    of one lane per unit, -1 for units that need no room or are not placed.
+
+    Units are booked in start order (ties by unit index, so every backend
+    names the same rooms for the same placement), each into a lane of its
+    category that is free at its start, trying its ``prefer`` lanes (unit ->
+    lanes) first.
+    Every lane booked so far started no later, so a lane free at the start
+    stays free for the whole block: whenever no slot holds more classes than
+    a category's rooms can, every unit gets a lane.
+    """
+    lane_category = [None]*len(pool)
+    for r, category in enumerate(pool.categories):
+        for lane in pool.lanes[category]:
+            lane_category[lane] = r
+    lane_end = [0]*len(pool)
+    unit_lane = array("i", [-1]) * len(unit_rooms)
+    for u in sorted(starts, key=lambda u: (starts[u], u)):
+        r = unit_rooms[u]
+        if r is None:
+            continue
+        s = starts[u]
+        lanes = pool.lanes[pool.categories[r]]
+        if prefer and u in prefer:
+            lanes = prefer[u] + lanes
+        for lane in lanes:
+            if lane_end[lane] <= s and lane_category[lane] == r:
+                lane_end[lane] = s + blocks[u]
+                unit_lane[u] = lane
+                break
+    return unit_lane
@@ -0,0 +1,575 @@
+# timetable_engine/single_class.py
+# Single-class builder: splits each subject into blocks and backtracks them into a days x slots grid
+
+from typing import List
+import random, itertools, time
+
+from .deadline import FEASIBLE_PARTIAL, INVALID, OPTIMAL, TIMED_OUT, Deadline, as_deadline, combined_status
+from .stats import profiling
+
+DAYS = ["Mon","Tue","Wed","Thu","Fri"]
+SLOTS_PER_DAY = 8
+
+
+class _TimedOut(Exception):
+    pass
+
+
+def create_single_class_timetable(subjects, seed=0, days: List[str] = DAYS, slots_per_day: int = SLOTS_PER_DAY, deadline=None, busy=None, stats=None):
+    """Returns (schedule, message, status); status is "optimal", "feasible-partial"
+    (the search finished without a complete timetable), "timed out" or
+    "invalid" (the subjects break a rule checked before the search, e.g. a lab
+    under 2 periods, or exceed the week; the schedule is None). Partial and
+    timed-out runs return the fullest partial schedule reached (empty cells
+    are " "); a run stopped before placing anything returns None.
+
+    ``busy`` maps a staff name to the (day index, slot) cells they already teach
+    in other classes; this class is built around them.
+
+    ``stats`` (stats.SolverStats) gets the backtracking nodes, the deepest
+    number of blocks placed, dead ends and memo hits, and profiles the build.
+    """
+    with profiling(stats):
+        return _build_single_class(subjects, seed, days, slots_per_day, deadline, busy, stats)[:3]
+
+
+def _build_single_class(subjects, seed, days, slots_per_day, deadline, busy, stats=None):
+    # create_single_class_timetable plus a 4th value: staff name -> (day, slot) cells used
+    random.seed(seed)
+    busy = {name: cells for name, cells in (busy or {}).items() if cells}
+    start_time = time.time()
+    deadline = as_deadline(deadline)
+    total = sum((s.get("periods",0) for s in subjects))
+    if total > slots_per_day * len(days):
+        return None, f"Requested total periods {total} > available {slots_per_day*len(days)}.", INVALID, {}
+
+    blocks = []
+    for s in subjects:
+        cat = s.get("category","")
+        name = s.get("subject","")
+        staff = s.get("staff","")
+        p = int(s.get("periods",0))
+        if cat == "Laboratory":
+            if p < 2:
+                return None, f"Lab {name} has {p} periods — must be at least 2.", INVALID, {}
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"lab", "meta":{}, "room": s.get("room",""), "room_key": s.get("room_key","")})
+        elif cat == "Open Elective":
+            if p != 4:
+                return None, f"Open Elective '{name}' must be exactly 4 periods (2+2).", INVALID, {}
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"open_elective", "meta":{}})
+        elif cat == "Library":
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"library", "meta":{}})
+        elif cat == "Mentoring":
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"mentoring", "meta":{}})
+        elif cat.startswith("Main subject"):
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"main", "meta":{}})
+        elif cat.startswith("Professional Elective"):
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"prof", "meta":{}})
+        elif cat == "Project":
+            if p != 4:
+                return None, f"Project '{name}' must be 4 periods and scheduled as 2+2.", INVALID, {}
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"project", "meta":{}})
+        else:
+            blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"other", "meta":{}})
+
+    # A lab's room (see _with_lab_rooms) is booked like a second staff member
+    for b in blocks:
+        b["staff_names"] = (b["staff"], b["room_key"]) if b.get("room_key") else (b["staff"],)
+    lib = [b for b in blocks if b["kind"] == "library"]
+    ment = [b for b in blocks if b["kind"] == "mentoring"]
+    if lib and ment:
+        lib_b = lib[0]; ment_b = ment[0]
+        blocks = [b for b in blocks if b not in (lib_b, ment_b)]
+        combined = {
+            "subject": f"{lib_b['subject']}/{ment_b['subject']}",
+            "staff": f"{lib_b['staff']}/{ment_b['staff']}",
+            "periods": 2,
+            "kind": "lib_ment_combined",
+            "staff_names": (lib_b['staff'], ment_b['staff']),
+            "meta": {"order_options":[(lib_b['subject'], ment_b['subject']), (ment_b['subject'], lib_b['subject'])]}
+        }
+        blocks.append(combined)
+    elif lib or ment:
+        return None, "Library and Mentoring must both be present and scheduled together (adjacent).", INVALID, {}
+
+    def generate_partitions(total: int, max_block: int = 3):
+        results = []
+        def helper(remaining, max_part, current):
+            if remaining == 0:
+                results.append(current.copy())
+                return
+            for p in range(min(max_part, remaining), 0, -1):
+                if p > max_block:
+                    continue
+                if current and p > current[-1]:
+                    continue
+                current.append(p)
+                helper(remaining - p, p, current)
+                current.pop()
+        helper(total, max_block, [])
+        return results
+
+    def partitions_for(subject_block):
+        kind = subject_block["kind"]
+        total_p = subject_block["periods"]
+        if kind == "lab":
+            if total_p == 4:
+                return [[2,2]]
+            else:
+                parts = []
+                if total_p % 2 == 0 and total_p//2 <= 4:
+                    parts.append([2]*(total_p//2))
+                parts.append([total_p])
+                return parts
+        elif kind == "open_elective":
+            return [[2,2]]
+        elif kind == "project":
+            return [[2,2]]
+        elif kind == "lib_ment_combined":
+            return [[2]]
+        elif kind == "main":
+            return generate_partitions(total_p, max_block=3) or [[total_p]]
+        elif kind == "prof":
+            return generate_partitions(total_p, max_block=3) or [[total_p]]
+        else:
+            return generate_partitions(total_p, max_block=3) or [[total_p]]
+
+    subj_candidates = []
+    for b in blocks:
+        parts = partitions_for(b)
+        if not parts:
+            parts = [[b['periods']]]
+        # A block longer than a day can never be placed; a subject left without
+        # partitions, or over its per-day limit for the week, is rejected outright
+        parts = [p for p in parts if max(p) <= slots_per_day]
+        if not parts:
+            return None, f"'{b['subject']}' cannot be split into blocks that fit in a {slots_per_day}-period day.", INVALID, {}
+        if b["kind"] in ("main","prof") and b["periods"] > 3 * len(days):
+            return None, f"'{b['subject']}' needs {b['periods']} periods but at most 3 a day fit in {len(days)} days.", INVALID, {}
+        subj_candidates.append({"block": b, "candidates": parts})
+
+    MAX_PARTITION_COMBINATIONS = 6000
+    choices_lists = [c["candidates"] for c in subj_candidates]
+    prod_count = 1
+    for ch in choices_lists:
+        prod_count *= max(1, len(ch))
+
+    def partition_combinations_iter():
+        if prod_count <= MAX_PARTITION_COMBINATIONS:
+            for combo in itertools.product(*choices_lists):
+                yield combo
+        else:
+            tried = set()
+            attempts = 0
+            while attempts < MAX_PARTITION_COMBINATIONS:
+                combo = tuple(tuple(random.choice(lst)) for lst in choices_lists)
+                if combo not in tried:
+                    tried.add(combo)
+                    yield combo
+                attempts += 1
+
+    def make_block_instances(combo):
+        insts = []
+        for subj_choice, subinfo in zip(combo, subj_candidates):
+            b = subinfo["block"]
+            sizes = list(subj_choice)
+            for sz in sizes:
+                # Staff teaching each period of the block: Library then Mentoring for the combined block
+                if b["kind"] == "lib_ment_combined" and sz == len(b["staff_names"]):
+                    cell_staff = [(n,) for n in b["staff_names"]]
+                else:
+                    cell_staff = [b["staff_names"]]*sz
+                inst = {"subject": b["subject"], "staff": b["staff"], "room": b.get("room",""), "cell_staff": cell_staff, "size": sz, "kind": b["kind"], "orig_periods": b["periods"], "meta": b.get("meta", {})}
+                insts.append(inst)
+        insts.sort(key=lambda x: (-x["size"], x["kind"]))
+        return insts
+
+    # Where a block sits inside its day does not matter, only which day it is on:
+    # any set of blocks whose sizes add up to at most slots_per_day can be laid
+    # out back to back. The search therefore assigns blocks to days, keeping per
+    # day the filled count and, for main / professional subjects, the periods of
+    # each subject (at most 3 a day). Days are interchangeable, so a sorted tuple
+    # of day states is canonical, and a block is identified for feasibility by
+    # its size (plus its subject when the per-day limit applies).
+    #
+    # Staff booked elsewhere (``busy``) pin cells, so position inside a day and
+    # the day itself start to matter for their blocks: such a block also carries
+    # its booked staff in its key, a day holding one is only accepted if its
+    # blocks can still be arranged around the bookings, and days are no longer
+    # treated as interchangeable.
+    def limited(inst):
+        return inst["kind"] in ("main","prof")
+
+    def block_key(inst):
+        booked = {}
+        for names in inst["cell_staff"]:
+            for n in names:
+                if n in busy:
+                    booked[n] = booked.get(n, 0) + 1
+        return (inst["subject"] if limited(inst) else "", inst["size"], tuple(sorted(booked.items())))
+
+    symmetric = not busy
+    arrangements = {}   # (day, block keys) -> start slots in the order given, or None
+
+    def arrange(d, placed):
+        # Start slots for the day's blocks that avoid their staff's bookings
+        sig = (d, tuple(block_key(i) for i in placed))
+        if sig in arrangements:
+            return arrangements[sig]
+        order = sorted(range(len(placed)), key=lambda j: (not block_key(placed[j])[2], -placed[j]["size"]))
+        taken = [False]*slots_per_day
+        starts = [0]*len(placed)
+
+        def free_at(j, s):
+            inst = placed[j]
+            for k in range(inst["size"]):
+                if taken[s+k] or any(n in busy and (d, s+k) in busy[n] for n in inst["cell_staff"][k]):
+                    return False
+            return True
+
+        def step(pos):
+            if pos == len(order):
+                return True
+            j = order[pos]
+            size = placed[j]["size"]
+            for s in range(slots_per_day - size + 1):
+                if free_at(j, s):
+                    for k in range(size):
+                        taken[s+k] = True
+                    starts[j] = s
+                    if step(pos+1):
+                        return True
+                    for k in range(size):
+                        taken[s+k] = False
+            return False
+
+        result = list(starts) if step(0) else None
+        arrangements[sig] = result
+        return result
+
+    failed = set()   # (canonical day states, canonical remaining blocks) known to have no solution
+    best_partial = {"periods": -1, "days": None}   # fullest placement seen, returned unless complete
+
+    # Per booked staff member and day: slots they are still free in
+    busy_free = {n: [slots_per_day - sum(1 for dd, _ in cells if dd == d) for d in range(len(days))] for n, cells in busy.items()}
+
+    def within_bounds(day_fill, day_counts, remaining, day_blocks=None):
+        # Capacity bounds: blocks of size >= k only fit in days with at least k free
+        # slots, a limited subject gets at most 3 - placed periods on a day, and a
+        # booked staff member's blocks need cells where they are still free.
+        free = [slots_per_day - f for f in day_fill]
+        for k in sorted({key[1] for key in remaining}):
+            need = sum(key[1] for key in remaining if key[1] >= k)
+            if need > sum(f for f in free if f >= k):
+                return False
+        need_by_subject = {}
+        for subj, size, _ in remaining:
+            if subj:
+                need_by_subject[subj] = need_by_subject.get(subj, 0) + size
+        for subj, need in need_by_subject.items():
+            room = sum(min(free[d], 3 - day_counts[d].get(subj, 0)) for d in range(len(days)))
+            if need > room:
+                return False
+        need_by_staff = {}
+        for _, _, booked in remaining:
+            for n, periods in booked:
+                need_by_staff[n] = need_by_staff.get(n, 0) + periods
+        for n, need in need_by_staff.items():
+            room = 0
+            for d in range(len(days)):
+                used = sum(1 for i in day_blocks[d] for names in i["cell_staff"] if n in names) if day_blocks else 0
+                room += min(free[d], busy_free[n][d] - used)
+            if need > room:
+                return False
+        return True
+
+    def try_place(instances, keys):
+        if not within_bounds([0]*len(days), [{} for _ in days], keys):
+            return None
+        pending = {}   # block key -> instances still to place
+        for inst, k in zip(instances, keys):
+            pending.setdefault(k, []).append(inst)
+        day_fill = [0]*len(days)
+        day_counts = [{} for _ in days]
+        day_blocks = [[] for _ in days]
+
+        def day_state_of(d):
+            if symmetric:
+                return (day_fill[d], tuple(sorted(day_counts[d].items())))
+            return (d, tuple(sorted(block_key(i) for i in day_blocks[d])))
+
+        def day_states():
+            states = (day_state_of(d) for d in range(len(days)))
+            return tuple(sorted(states)) if symmetric else tuple(states)
+
+        def fits(k, d):
+            subj, size, _ = k
+            return day_fill[d] + size <= slots_per_day and (not subj or day_counts[d].get(subj, 0) + size <= 3)
+
+        def backtrack():
+            if deadline.expired():
+                raise _TimedOut()
+            remaining = tuple(sorted(k for k, insts in pending.items() for _ in insts))
+            if stats is not None:
+                stats.nodes += 1
+                stats.max_depth = max(stats.max_depth, len(keys) - len(remaining))
+            if not remaining:
+                return True
+            placed = total - sum(key[1] for key in remaining)
+            if placed > best_partial["periods"]:
+                best_partial["periods"] = placed
+                best_partial["days"] = [list(b) for b in day_blocks]
+            key = (day_states(), remaining)
+            if key in failed or not within_bounds(day_fill, day_counts, remaining, day_blocks):
+                if stats is not None:
+                    if key in failed:
+                        stats.memo_hits += 1
+                    else:
+                        stats.dead_ends += 1
+                failed.add(key)
+                return False
+            # Most constrained block first: fewest days it fits on, then the longest
+            k = min((k for k, insts in pending.items() if insts), key=lambda k: (sum(1 for d in range(len(days)) if fits(k, d)), -k[1], k))
+            subj, size, booked = k
+            inst = pending[k].pop()
+
+            day_order = list(range(len(days)))
+            day_order.sort(key=lambda d: slots_per_day - day_fill[d], reverse=True)
+            tried = set()
+            for d in day_order:
+                if not fits(k, d):
+                    continue
+                # Days in the same state lead to the same subproblem
+                day_state = day_state_of(d)
+                if day_state in tried:
+                    continue
+                tried.add(day_state)
+                if not symmetric and arrange(d, day_blocks[d] + [inst]) is None:
+                    continue
+
+                day_fill[d] += size
+                if subj:
+                    day_counts[d][subj] = day_counts[d].get(subj, 0) + size
+                day_blocks[d].append(inst)
+
+                if backtrack():
+                    return True
+
+                day_blocks[d].pop()
+                day_fill[d] -= size
+                if subj:
+                    day_counts[d][subj] -= size
+                    if day_counts[d][subj] == 0:
+                        del day_counts[d][subj]
+            pending[k].append(inst)
+            if stats is not None:
+                stats.dead_ends += 1
+            failed.add(key)
+            return False
+
+        if not backtrack():
+            return None
+        return layout_days(day_blocks)
+
+    def layout_days(day_blocks):
+        # Returns (schedule, staff name -> cells used)
+        sched = [[" "]*slots_per_day for _ in days]
+        staff_cells = {}
+        for d, placed in enumerate(day_blocks):
+            starts = None if symmetric else arrange(d, placed)
+            s = 0
+            for j, inst in enumerate(placed):
+                size = inst["size"]
+                if starts is not None:
+                    s = starts[j]
+                for k, names in enumerate(inst["cell_staff"]):
+                    for name in names:
+                        if name:
+                            staff_cells.setdefault(name, set()).add((d, s+k))
+                if inst["kind"] == "lib_ment_combined" and inst["meta"].get("order_options"):
+                    first, second = inst["meta"]["order_options"][0]
+                    labels = [first, second]
+                    if size != 2:
+                        labels = [inst["subject"]] * size
+                    for k in range(size):
+                        sched[d][s+k] = f"{labels[k]} ({inst['staff']})"
+                else:
+                    who = f"{inst['staff']}, {inst['room']}" if inst["room"] else inst["staff"]
+                    for k in range(size):
+                        sched[d][s+k] = f"{inst['subject']} ({who})"
+                s += size
+        return sched, staff_cells
+
+    # Combos that give the same canonical block multiset are the same problem
+    seen = set()
+    try:
+        for combo in partition_combinations_iter():
+            if deadline.expired():
+                raise _TimedOut()
+            insts = make_block_instances(combo)
+            if sum(i["size"] for i in insts) != total:
+                continue
+            keys = [block_key(i) for i in insts]
+            canonical = tuple(sorted(keys))
+            if canonical in seen:
+                continue
+            seen.add(canonical)
+            laid_out = try_place(insts, keys)
+            if laid_out is not None:
+                return laid_out[0], "ok", OPTIMAL, laid_out[1]
+    except _TimedOut:
+        elapsed = time.time() - start_time
+        if best_partial["days"] is None:
+            return None, f"Stopped after {elapsed:.2f}s before any subjects were placed.", TIMED_OUT, {}
+        sched, staff_cells = layout_days(best_partial["days"])
+        return sched, f"Stopped after {elapsed:.2f}s — placed {best_partial['periods']} of {total} periods; showing the fullest partial timetable.", TIMED_OUT, staff_cells
+    # Capacity bounds can rule out every partition before a block is placed
+    placed = max(best_partial["periods"], 0)
+    sched, staff_cells = layout_days(best_partial["days"] or [[] for _ in days])
+    return sched, f"No complete arrangement exists for these subject partitions — placed {placed} of {total} periods; showing the fullest partial timetable.", FEASIBLE_PARTIAL, staff_cells
+
+
+def _staff_groups(class_subjects):
+    # Classes linked through a shared staff member, as lists of class names
+    parent = {name: name for name in class_subjects}
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    owner = {}
+    for cname, subjects in class_subjects.items():
+        for s in subjects:
+            # A shared lab room links classes like a shared staff member
+            for staff in (s.get("staff",""), s.get("room_key","")):
+                if not staff:
+                    continue
+                if staff in owner:
+                    parent[find(cname)] = find(owner[staff])
+                else:
+                    owner[staff] = cname
+    groups = {}
+    for cname in class_subjects:
+        groups.setdefault(find(cname), []).append(cname)
+    return list(groups.values())
+
+
+def _with_lab_rooms(class_subjects, rooms):
+    # Give each class's Laboratory subjects one "Lab" room: the one with the fewest
+    # lab periods per place so far. "room" is shown in the timetable and "room_key"
+    # is booked like a staff member who can be in "room_capacity" classes at once
+    # (see _solve_group), so classes sharing a room are built around each other's
+    # labs. Returns (class_subjects, [(room, lab periods, capacity)]).
+    labs = [(room.name, f"room:{room.id}", max(1, int(room.capacity))) for room in rooms or () if room.category == "Lab"]
+    if not labs:
+        return class_subjects, []
+    load = [0]*len(labs)
+    assigned = {}
+    for cname, subjects in class_subjects.items():
+        periods = sum(int(s.get("periods",0)) for s in subjects if s.get("category") == "Laboratory")
+        if not periods:
+            assigned[cname] = subjects
+            continue
+        i = min(range(len(labs)), key=lambda i: load[i] / labs[i][2])
+        load[i] += periods
+        name, key, capacity = labs[i]
+        assigned[cname] = [dict(s, room=name, room_key=key, room_capacity=capacity) if s.get("category") == "Laboratory" else s for s in subjects]
+    return assigned, [(name, periods, capacity) for (name, _, capacity), periods in zip(labs, load)]
+
+
+def _solve_group(items, seed, days, slots_per_day, deadline):
+    # Solve linked classes one at a time around the staff bookings made so far.
+    # If one fails, it moves to the front and the group is tried again. A lab
+    # room only counts as busy in a cell once it holds its capacity of classes.
+    if not isinstance(deadline, Deadline):
+        deadline = Deadline.until(deadline)
+    subjects = dict(items)
+    capacity = {s["room_key"]: s["room_capacity"] for subs in subjects.values() for s in subs if s.get("room_key")}
+    order = sorted(subjects, key=lambda n: -sum(s.get("periods",0) for s in subjects[n]))
+    best = None
+    for _ in range(len(order)):
+        busy = {}
+        room_used = {}   # room key -> {(day, slot): classes in it}
+        results = {}
+        for left, name in enumerate(order):
+            # An even share of the time left, so one hard class cannot starve the rest
+            remaining = deadline.remaining()
+            class_deadline = deadline if remaining is None else deadline.sub(remaining / (len(order) - left))
+            sched, msg, status, staff_cells = _build_single_class(subjects[name], seed, days, slots_per_day, class_deadline, busy)
+            booked = any(busy.get(s.get(key, "")) for s in subjects[name] for key in ("staff", "room_key"))
+            if status == FEASIBLE_PARTIAL and booked:
+                msg = f"{msg} Staff are already booked in other classes at the remaining times."
+            results[name] = (sched, msg, status)
+            for staff, cells in staff_cells.items():
+                if staff not in capacity:
+                    busy.setdefault(staff, set()).update(cells)
+                    continue
+                used = room_used.setdefault(staff, {})
+                for cell in cells:
+                    used[cell] = used.get(cell, 0) + 1
+                    if used[cell] >= capacity[staff]:
+                        busy.setdefault(staff, set()).add(cell)
+        solved = sum(1 for r in results.values() if r[2] == OPTIMAL)
+        if best is None or solved > best[0]:
+            best = (solved, results)
+        # Invalid input fails in any order, so it never moves a class forward
+        failed = [n for n in order if results[n][2] not in (OPTIMAL, INVALID)]
+        if not failed or failed[0] == order[0] or deadline.expired():
+            break
+        order = failed[:1] + [n for n in order if n != failed[0]]
+    return best[1]
+
+
+def create_batch_timetables(class_subjects, seed=0, days: List[str] = DAYS, slots_per_day: int = SLOTS_PER_DAY, deadline=None, workers=1, rooms=None):
+    """Build timetables for many classes at once without staff clashes.
+
+    ``class_subjects`` maps a class name to its subject list (as for
+    create_single_class_timetable). Classes that share a staff member are
+    built one after another around each other's bookings; groups with no staff
+    in common are independent and run on a process pool when ``workers`` > 1.
+
+    ``rooms`` (models.Room) with category "Lab" host the Laboratory subjects:
+    each class's labs go to one room, the least booked for its size, and no
+    room holds more than ``capacity`` classes at the same time.
+
+    Returns ({class name: (schedule, message, status)}, meta) with meta
+    "status" ("optimal" when every class is complete, otherwise the first of
+    "invalid", "timed out" and "feasible-partial" among the classes; see
+    deadline.combined_status), "groups", "elapsed",
+    "staff_overload": (staff, periods, available) for anyone booked beyond the
+    week, in which case some classes cannot be completed, and "room_overload":
+    (room, periods, available) for lab rooms booked beyond their capacity
+    for the week.
+    """
+    start_time = time.time()
+    deadline = as_deadline(deadline)
+    class_subjects, room_load = _with_lab_rooms(class_subjects, rooms)
+    # Library and Mentoring share one 2-period block, one period each
+    load = {}
+    for subjects in class_subjects.values():
+        for s in subjects:
+            if s.get("staff",""):
+                periods = 1 if s.get("category") in ("Library","Mentoring") else int(s.get("periods",0))
+                load[s["staff"]] = load.get(s["staff"], 0) + periods
+    available = slots_per_day * len(days)
+    staff_overload = [(name, periods, available) for name, periods in load.items() if periods > available]
+    room_overload = [(name, periods, available*capacity) for name, periods, capacity in room_load if periods > available*capacity]
+
+    groups = _staff_groups(class_subjects)
+    jobs = [[(name, class_subjects[name]) for name in g] for g in groups]
+    if workers > 1 and len(jobs) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        # Worker processes get the absolute deadline; cancel() does not reach them
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            parts = list(pool.map(_solve_group, jobs, [seed]*len(jobs), [days]*len(jobs), [slots_per_day]*len(jobs), [deadline.at]*len(jobs)))
+    else:
+        parts = [_solve_group(job, seed, days, slots_per_day, deadline) for job in jobs]
+
+    merged = {}
+    for part in parts:
+        merged.update(part)
+    results = {name: merged[name] for name in class_subjects}
+    status = combined_status(r[2] for r in results.values())
+    return results, {"status": status, "groups": len(groups), "staff_overload": staff_overload, "room_overload": room_overload, "elapsed": time.time() - start_time}
@@ -0,0 +1,279 @@
+# timetable_engine/solution.py
+# Compact solution form: classes, teachers and subjects are interned once per run
+# (Layout) and a trial result is a flat array of unit indices per class slot
+# (Solution). Dict tables are only built when a view is asked for.
+
+import random
+from array import array
+
+from .department import periods_in_day
+from .rooms import book_in_start_order, room_pool
+from .units import KINDS, UnitTable
+
+
+class Layout:
+    """Everything a trial needs that does not change between trials: the unit
+    table, the grid shape and the day / block-start masks.
+
+    ``allowed[u]`` is the mask of start slots unit ``u`` may use and ``pins``
+    maps pinned units to their fixed start (see constraints.unit_starts).
+    ``rooms`` is the constraints' RoomPool (None without rooms) and
+    ``unit_rooms[u]`` the room category unit ``u`` needs (None: no room).
+    """
+
+    def __init__(self, classes, teachers, assignments, timeslots, constraints=None):
+        self.num_slots = len(timeslots)
+        self.periods_per_day = periods_in_day(timeslots)
+        self.units = UnitTable(classes, teachers, assignments)
+        self.class_ids = self.units.class_ids
+        self.teacher_ids = self.units.teacher_ids
+        self.subjects = self.units.subjects
+        # Stable sort key for "longest blocks first", applied after each shuffle
+        self.neg_block = [-b for b in self.units.block]
+        self.slot_range = list(range(self.num_slots))
+
+        ppd = self.periods_per_day
+        num_days = self.num_slots // ppd if ppd else 0
+        self.day_masks = [((1 << ppd) - 1) << (d*ppd) for d in range(num_days)]
+        # start_ok[b]: slots where a block of length b fits without crossing a day boundary
+        self.start_ok = {}
+        for b in set(self.units.block) | {1, 2}:
+            mask = 0
+            for d in range(num_days):
+                for p in range(ppd - b + 1):
+                    mask |= 1 << (d*ppd + p)
+            self.start_ok[b] = mask
+        if constraints:
+            from .constraints import unit_starts
+            self.allowed, self.pins = unit_starts(constraints, classes, teachers, assignments, timeslots)
+        else:
+            self.allowed = [self.start_ok[b] for b in self.units.block]
+            self.pins = {}
+        self.rooms = room_pool(constraints)
+        self.unit_rooms = self.rooms.unit_rooms(assignments) if self.rooms else None
+
+
+class Solution:
+    """One trial's placement, immutable once built.
+
+    ``class_slots[c*num_slots + s]`` is the unit index in class ``c`` at slot
+    ``s`` (or -1). ``remaining`` lists unplaced unit indices in the order the
+    trial gave up on them. Keeping the best solution is a reference swap.
+    """
+    __slots__ = ("layout", "class_slots", "remaining", "placed_count")
+
+    def __init__(self, layout, class_slots, remaining, placed_count):
+        self.layout = layout
+        self.class_slots = class_slots
+        self.remaining = tuple(remaining)
+        self.placed_count = placed_count
+
+    @property
+    def remaining_count(self):
+        return len(self.remaining)
+
+    def room_lanes(self):
+        """Room lane per unit (-1 for none), booked from the placed starts with
+        rooms.book_in_start_order; None when the layout has no rooms."""
+        lay = self.layout
+        if lay.rooms is None:
+            return None
+        unit_rooms = lay.unit_rooms
+        n = lay.num_slots
+        starts = {}
+        for base in range(0, len(self.class_slots), n):
+            for s in range(n):
+                u = self.class_slots[base + s]
+                if u >= 0 and unit_rooms[u] is not None and u not in starts:
+                    starts[u] = s
+        return book_in_start_order(lay.rooms, unit_rooms, starts, lay.units.block)
+
+    def _room_names(self):
+        # Room name per unit (None if it has none), or None when there are no rooms
+        lanes = self.room_lanes()
+        if lanes is None:
+            return None
+        pool = self.layout.rooms
+        return [None if lane < 0 else pool.room_name(lane) for lane in lanes]
+
+    def class_table(self):
+        lay = self.layout
+        n = lay.num_slots
+        rooms = self._room_names()
+        table = {}
+        for c, cid in enumerate(lay.class_ids):
+            row = []
+            for u in self.class_slots[c*n:(c+1)*n]:
+                cell = None if u < 0 else {"subject": lay.subjects[lay.units.subject[u]], "teacher_id": lay.teacher_ids[lay.units.teacher[u]]}
+                if rooms and u >= 0 and rooms[u] is not None:
+                    cell["room"] = rooms[u]
+                row.append(cell)
+            table[cid] = row
+        return table
+
+    def teacher_table(self):
+        lay = self.layout
+        n = lay.num_slots
+        rooms = self._room_names()
+        table = {tid: [None]*n for tid in lay.teacher_ids}
+        for c, cid in enumerate(lay.class_ids):
+            base = c*n
+            for s in range(n):
+                u = self.class_slots[base + s]
+                if u >= 0:
+                    cell = table[lay.teacher_ids[lay.units.teacher[u]]][s] = {"subject": lay.subjects[lay.units.subject[u]], "class_id": cid}
+                    if rooms and rooms[u] is not None:
+                        cell["room"] = rooms[u]
+        return table
+
+    def remaining_units(self):
+        return [self.layout.units.unit(u) for u in self.remaining]
+
+    def tables(self):
+        """The (class_table, teacher_table, remaining) dict view used by the UI."""
+        return self.class_table(), self.teacher_table(), self.remaining_units()
+
+
+def place_once_compact(layout, seed=None, scorer=None, stats=None):
+    # Same rules and random stream as try_place_once, on bitmasks, producing a Solution.
+    # The unit table is shared; a trial only shuffles an index permutation.
+    # With a scorer (quality.SoftScorer) each unit takes the free slot with the lowest
+    # placement_cost instead of the first one in its shuffled order (ties keep that order).
+    # stats (stats.SolverStats) gets the same probe and rejection counts try_place_once reports.
+    # Units that need a room also need a place in one of its category's rooms for
+    # the whole block (rooms.RoomLoad); Solution books the actual rooms.
+    if seed is not None:
+        random.seed(seed)
+
+    num_slots = layout.num_slots
+    ppd = layout.periods_per_day
+    units = layout.units
+    u_class, u_teacher, u_group, u_block, u_kind = units.cls, units.teacher, units.group, units.block, units.kind
+    num_days = len(layout.day_masks)
+    day_masks, allowed, pins, slot_range = layout.day_masks, layout.allowed, layout.pins, layout.slot_range
+
+    class_busy = [0]*len(layout.class_ids)
+    teacher_busy = [0]*len(layout.teacher_ids)
+    group_days = [0]*units.num_groups   # per (class, subject): mask of every slot on days it already uses
+    class_slots = array("i", [-1]) * (len(layout.class_ids) * num_slots)
+    unit_rooms = layout.unit_rooms
+    if unit_rooms is not None:
+        room_load = layout.rooms.load(num_slots)
+
+    # Shuffling indices draws the same permutation as shuffling the unit list itself
+    order = list(range(len(units)))
+    random.shuffle(order)
+    order.sort(key=layout.neg_block.__getitem__)
+
+    remaining = []
+    placed_count = 0
+    # Pinned units take their fixed start before anything else is placed
+    for u, sidx in pins.items():
+        block = u_block[u]
+        block_mask = ((1 << block) - 1) << sidx
+        class_busy[u_class[u]] |= block_mask
+        teacher_busy[u_teacher[u]] |= block_mask
+        group_days[u_group[u]] |= day_masks[sidx // ppd]
+        if unit_rooms is not None and unit_rooms[u] is not None:
+            room_load.book(unit_rooms[u], sidx, block)
+        base = u_class[u]*num_slots + sidx
+        for k in range(block):
+            class_slots[base + k] = u
+        placed_count += block
+
+    shuffle = random.shuffle
+    for u in order:
+        if pins and u in pins:
+            continue
+        block = u_block[u]
+        c = u_class[u]
+        t = u_teacher[u]
+        g = u_group[u]
+
+        slot_order = slot_range[:]
+        shuffle(slot_order)
+
+        free = ~(class_busy[c] | teacher_busy[t] | group_days[g])
+        candidates = allowed[u] & free
+        for k in range(1, block):
+            candidates &= free >> k
+        r = room_ok = None
+        if unit_rooms is not None:
+            r = unit_rooms[u]
+            if r is not None:
+                room_ok = room_load.starts(r, block)
+                candidates &= room_ok
+
+        if stats is not None:
+            _tally(stats, layout, u, slot_order, candidates, scorer is not None, class_busy[c], teacher_busy[t], room_ok)
+        if not candidates:
+            remaining.append(u)
+            continue
+
+        if scorer is not None:
+            cost = scorer.placement_cost
+            is_lab = u_kind[u] == KINDS.index("lab")
+            busy = teacher_busy[t]
+            best_cost = None
+            for sidx in slot_order:
+                if (candidates >> sidx) & 1:
+                    c_cost = cost(busy, sidx, block, is_lab, ppd, num_days)
+                    if best_cost is None or c_cost < best_cost:
+                        best_cost, best_sidx = c_cost, sidx
+            slot_order = (best_sidx,)
+
+        for sidx in slot_order:
+            if not (candidates >> sidx) & 1:
+                continue
+            block_mask = ((1 << block) - 1) << sidx
+            class_busy[c] |= block_mask
+            teacher_busy[t] |= block_mask
+            group_days[g] |= day_masks[sidx // ppd]
+            if r is not None:
+                room_load.book(r, sidx, block)
+            base = c*num_slots + sidx
+            for k in range(block):
+                class_slots[base + k] = u
+            placed_count += block
+            break
+
+    return Solution(layout, class_slots, remaining, placed_count)
+
+
+def _tally(stats, layout, u, slot_order, candidates, probe_all, class_busy, teacher_busy, room_ok=None):
+    # The slots try_place_once would look at for unit u (all of them with a scorer or
+    # when none fits, else up to the first that does), with each miss put down to
+    # the first rule it breaks, in try_place_once's order. room_ok is the mask of
+    # starts with a free room place, for units that need a room
+    if probe_all or not candidates:
+        probed = slot_order
+    else:
+        probed = slot_order[:next(j for j, s in enumerate(slot_order) if (candidates >> s) & 1) + 1]
+    block = layout.units.block[u]
+    class_hit, teacher_hit = class_busy, teacher_busy
+    for k in range(1, block):
+        class_hit |= class_busy >> k
+        teacher_hit |= teacher_busy >> k
+    start_ok = layout.start_ok[block]
+    allowed = layout.allowed[u]
+    rejections = stats.rejections
+    for sidx in probed:
+        bit = 1 << sidx
+        if candidates & bit:
+            continue
+        if not start_ok & bit:
+            rejections["day_overflow"] += 1
+        elif not allowed & bit:
+            rejections["unavailable"] += 1
+        elif class_hit & bit:
+            rejections["class_busy"] += 1
+        elif teacher_hit & bit:
+            rejections["teacher_busy"] += 1
+        elif room_ok is not None and not room_ok & bit:
+            rejections["room_busy"] += 1
+        else:
+            rejections["same_subject_day"] += 1
+    stats.slots_probed += len(probed)
+    if not candidates:
+        units = layout.units
+        stats.unplaced[(layout.class_ids[units.cls[u]], layout.teacher_ids[units.teacher[u]], layout.subjects[units.subject[u]])] += 1
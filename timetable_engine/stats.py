@@ -0,0 +1,96 @@
+# timetable_engine/stats.py
+# Opt-in solver telemetry: pass a SolverStats as ``stats`` and the solvers count
+# what they probe and reject, time each trial and, with a profiler, profile the run.
+
+from collections import Counter
+from contextlib import contextmanager
+
+# Why a start slot was turned down, in the order the placement rules test them
+REJECTIONS = ("day_overflow", "unavailable", "class_busy", "teacher_busy", "room_busy", "same_subject_day")
+
+
+class SolverStats:
+    """Counters filled in by the solvers that were given this object.
+
+    Trial solvers (schedule_best_of_n and its backends) fill ``trials``,
+    ``trial_seconds``, ``slots_probed`` (start slots looked at before a unit was
+    placed or given up), ``rejections`` (per REJECTIONS reason) and
+    ``unplaced`` ((class id, teacher id, subject) -> units of that lesson left
+    unplaced, summed over all trials).
+    The search solvers (schedule_cp, the single-class builder) fill ``nodes``,
+    ``max_depth``, ``dead_ends`` and ``memo_hits``.
+
+    ``profiler`` is any object with enable() / disable(), e.g. a
+    cProfile.Profile; it runs around the solver's main loop in this process
+    only (worker processes of a parallel run are not profiled).
+    """
+
+    def __init__(self, profiler=None):
+        self.trials = 0
+        self.trial_seconds = []
+        self.slots_probed = 0
+        self.rejections = dict.fromkeys(REJECTIONS, 0)
+        self.unplaced = Counter()
+        self.nodes = 0
+        self.max_depth = 0
+        self.dead_ends = 0
+        self.memo_hits = 0
+        self.profiler = profiler
+
+    def reject(self, reason):
+        self.rejections[reason] += 1
+
+    def merge(self, other):
+        """Add another SolverStats' counters (e.g. from a worker process) to this one."""
+        self.trials += other.trials
+        self.trial_seconds.extend(other.trial_seconds)
+        self.slots_probed += other.slots_probed
+        for reason, count in other.rejections.items():
+            self.rejections[reason] += count
+        self.unplaced.update(other.unplaced)
+        self.nodes += other.nodes
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.dead_ends += other.dead_ends
+        self.memo_hits += other.memo_hits
+
+    @contextmanager
+    def profiling(self):
+        if self.profiler is None:
+            yield
+            return
+        self.profiler.enable()
+        try:
+            yield
+        finally:
+            self.profiler.disable()
+
+    def as_dict(self, top=10):
+        """JSON-friendly summary; per-trial times are reduced to count / mean / max
+        and only the ``top`` most often unplaced lessons are listed."""
+        seconds = self.trial_seconds
+        return {
+            "trials": self.trials,
+            "trial_seconds": {
+                "total": sum(seconds),
+                "mean": sum(seconds) / len(seconds) if seconds else 0.0,
+                "max": max(seconds, default=0.0),
+            },
+            "slots_probed": self.slots_probed,
+            "rejections": dict(self.rejections),
+            "unplaced": [{"class_id": cid, "teacher_id": tid, "subject": subject, "count": count}
+                         for (cid, tid, subject), count in self.unplaced.most_common(top)],
+            "nodes": self.nodes,
+            "max_depth": self.max_depth,
+            "dead_ends": self.dead_ends,
+            "memo_hits": self.memo_hits,
+        }
+
+
+@contextmanager
+def profiling(stats):
+    """stats.profiling() that also accepts stats=None."""
+    if stats is None:
+        yield
+    else:
+        with stats.profiling():
+            yield
@@ -0,0 +1,196 @@
+# timetable_engine/store.py
+# Saved projects: each department's teachers, classes, assignments, rules and
+# solved timetables as SQLite tables, so a new session reopens them without
+# re-importing the spreadsheet.
+
+import json
+import sqlite3
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .constraints import Constraints
+from .models import Teacher, ClassGroup, Assignment
+
+DEFAULT_DB = "timetable_projects.sqlite"
+# Solved timetables kept per project, newest first
+KEEP_TIMETABLES = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    updated REAL NOT NULL,
+    days TEXT,
+    periods_per_day INTEGER,
+    constraints TEXT NOT NULL DEFAULT '{}',
+    teachers INTEGER NOT NULL DEFAULT 0,
+    classes INTEGER NOT NULL DEFAULT 0,
+    assignments INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS teachers (
+    project TEXT NOT NULL, id INTEGER NOT NULL, name TEXT NOT NULL, subjects TEXT NOT NULL,
+    PRIMARY KEY (project, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS classes (
+    project TEXT NOT NULL, id INTEGER NOT NULL, name TEXT NOT NULL,
+    PRIMARY KEY (project, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS assignments (
+    project TEXT NOT NULL, id INTEGER NOT NULL, teacher_id INTEGER NOT NULL, class_id INTEGER NOT NULL,
+    subject TEXT NOT NULL, category TEXT NOT NULL, periods_per_week INTEGER NOT NULL,
+    PRIMARY KEY (project, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS timetables (
+    project TEXT NOT NULL, key TEXT NOT NULL, created REAL NOT NULL,
+    days TEXT NOT NULL, periods_per_day INTEGER NOT NULL, settings TEXT NOT NULL, result TEXT NOT NULL,
+    PRIMARY KEY (project, key)
+);
+"""
+_ENTITY_TABLES = ("teachers", "classes", "assignments")
+
+
+def _json_default(obj):
+    # numpy / pandas scalars from the diagnostics
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def encode_result(result):
+    """JSON text for a solver result. The compact Solution is dropped from meta
+    and diagnostics are reduced to their "problems" lists."""
+    class_table, teacher_table, remaining, meta = result
+    meta = {name: value for name, value in meta.items() if name != "solution"}
+    if "diag" in meta:
+        meta["diag"] = {"problems": meta["diag"]["problems"]}
+    payload = {
+        "class_table": None if class_table is None else {str(cid): row for cid, row in class_table.items()},
+        "teacher_table": None if teacher_table is None else {str(tid): row for tid, row in teacher_table.items()},
+        "remaining": remaining,
+        "meta": meta,
+    }
+    return json.dumps(payload, default=_json_default)
+
+
+def decode_result(text):
+    """The (class_table, teacher_table, remaining, meta) stored by encode_result."""
+    payload = json.loads(text)
+    class_table, teacher_table = payload["class_table"], payload["teacher_table"]
+    if class_table is not None:
+        class_table = {int(cid): row for cid, row in class_table.items()}
+    if teacher_table is not None:
+        teacher_table = {int(tid): row for tid, row in teacher_table.items()}
+    return class_table, teacher_table, payload["remaining"], payload["meta"]
+
+
+@dataclass
+class Project:
+    name: str
+    teachers: List[Teacher]
+    classes: List[ClassGroup]
+    assignments: List[Assignment]
+    constraints: Constraints = field(default_factory=Constraints)
+    days: Optional[List[str]] = None
+    periods_per_day: Optional[int] = None
+
+
+class ProjectStore:
+    """Named projects in one SQLite file.
+
+    Entities live in one table per kind, keyed by (project, id), so opening a
+    project reads only its own rows and listing projects reads none.
+    Timetables are stored separately and only decoded when asked for.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        with self._db() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+
+    @contextmanager
+    def _db(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._db() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def projects(self):
+        """[{name, updated, teachers, classes, assignments}] (entity counts), newest first."""
+        with self._db() as db:
+            rows = db.execute("SELECT name, updated, teachers, classes, assignments FROM projects ORDER BY updated DESC").fetchall()
+        return [dict(zip(("name", "updated", "teachers", "classes", "assignments"), row)) for row in rows]
+
+    def save(self, name, teachers, classes, assignments, constraints=None, days=None, periods_per_day=None):
+        """Create or overwrite project ``name``; its saved timetables are kept."""
+        cons = (constraints or Constraints()).to_dict()
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO projects (name, updated, days, periods_per_day, constraints, teachers, classes, assignments) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                       (name, time.time(), None if days is None else json.dumps(list(days)), periods_per_day, json.dumps(cons),
+                        len(teachers), len(classes), len(assignments)))
+            for table in _ENTITY_TABLES:
+                db.execute(f"DELETE FROM {table} WHERE project = ?", (name,))
+            db.executemany("INSERT INTO teachers VALUES (?, ?, ?, ?)", ((name, t.id, t.name, json.dumps(list(t.subjects))) for t in teachers))
+            db.executemany("INSERT INTO classes VALUES (?, ?, ?)", ((name, c.id, c.name) for c in classes))
+            db.executemany("INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?)",
+                           ((name, a.id, a.teacher_id, a.class_id, a.subject, a.category, a.periods_per_week) for a in assignments))
+
+    def load(self, name):
+        """The saved Project, or None."""
+        with self._db() as db:
+            head = db.execute("SELECT days, periods_per_day, constraints FROM projects WHERE name = ?", (name,)).fetchone()
+            if head is None:
+                return None
+            teachers = [Teacher(tid, tname, json.loads(subjects)) for tid, tname, subjects in
+                        db.execute("SELECT id, name, subjects FROM teachers WHERE project = ? ORDER BY id", (name,))]
+            classes = [ClassGroup(*row) for row in db.execute("SELECT id, name FROM classes WHERE project = ? ORDER BY id", (name,))]
+            assignments = [Assignment(*row) for row in
+                           db.execute("SELECT id, teacher_id, class_id, subject, category, periods_per_week FROM assignments WHERE project = ? ORDER BY id", (name,))]
+        days, periods_per_day, cons = head
+        return Project(name, teachers, classes, assignments, Constraints.from_dict(json.loads(cons)),
+                       None if days is None else json.loads(days), periods_per_day)
+
+    def delete(self, name):
+        with self._transaction() as db:
+            db.execute("DELETE FROM projects WHERE name = ?", (name,))
+            for table in ("timetables",) + _ENTITY_TABLES:
+                db.execute(f"DELETE FROM {table} WHERE project = ?", (name,))
+
+    def save_timetable(self, name, key, days, periods_per_day, settings, result):
+        """Store a solver result for project ``name`` under ``key`` (e.g. its
+        problem_key); only the KEEP_TIMETABLES newest are kept."""
+        with self._transaction() as db:
+            db.execute("INSERT OR REPLACE INTO timetables VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (name, key, time.time(), json.dumps(list(days)), int(periods_per_day), json.dumps(settings), encode_result(result)))
+            db.execute("DELETE FROM timetables WHERE project = ? AND key NOT IN (SELECT key FROM timetables WHERE project = ? ORDER BY created DESC LIMIT ?)",
+                       (name, name, KEEP_TIMETABLES))
+
+    def timetable(self, name, key=None):
+        """(key, days, periods_per_day, settings, result) stored under ``key``, or
+        the newest one without a key; None if there is none."""
+        query = "SELECT key, days, periods_per_day, settings, result FROM timetables WHERE project = ?"
+        params = (name,)
+        if key is None:
+            query += " ORDER BY created DESC LIMIT 1"
+        else:
+            query += " AND key = ?"
+            params += (key,)
+        with self._db() as db:
+            row = db.execute(query, params).fetchone()
+        if row is None:
+            return None
+        key, days, periods_per_day, settings, result = row
+        return key, json.loads(days), periods_per_day, json.loads(settings), decode_result(result)
@@ -0,0 +1,94 @@
+# timetable_engine/units.py
+# Placement units: the block rules for splitting an Assignment, and a column-wise
+# unit table that interns classes, teachers and subjects once per run.
+
+from array import array
+
+KINDS = ("theory", "lab")
+# Assignment categories unit_blocks knows about
+CATEGORIES = ("Theory", "Lab", "Library", "Mentoring")
+
+
+def unit_blocks(a):
+    """Yield (block, kind) for each placement unit of assignment ``a``."""
+    # 🧪 LAB — always 2 continuous periods
+    if a.category == "Lab":
+        for _ in range(a.periods_per_week // 2):
+            yield 2, "lab"
+        if a.periods_per_week % 2 == 1:
+            yield 1, "theory"
+
+    # 📘 LIBRARY or MENTORING — single period
+    elif a.category in ("Library", "Mentoring"):
+        yield 1, "theory"
+
+    # 🧮 THEORY / PH / TP — normal subjects
+    else:
+        # TP → always 2 continuous periods
+        if a.subject.strip().upper() == "TP":
+            for _ in range(a.periods_per_week // 2):
+                yield 2, "theory"
+            if a.periods_per_week % 2 == 1:
+                yield 1, "theory"
+
+        # PH → treat like normal theory
+        else:
+            for _ in range(a.periods_per_week):
+                yield 1, "theory"
+
+
+class UnitTable:
+    """All units of a run as parallel int arrays, in expand_units order.
+
+    ``cls``/``teacher`` are dense indices into ``class_ids``/``teacher_ids``,
+    ``subject`` indexes ``subjects`` and ``group`` interns the (class, subject)
+    pair that the one-subject-per-day rule is about.
+    """
+    __slots__ = ("class_ids", "teacher_ids", "subjects", "assignment", "cls", "teacher", "subject", "group", "block", "kind", "num_groups")
+
+    def __init__(self, classes, teachers, assignments):
+        self.class_ids = [c.id for c in classes]
+        self.teacher_ids = [t.id for t in teachers]
+        class_index = {cid: i for i, cid in enumerate(self.class_ids)}
+        teacher_index = {tid: i for i, tid in enumerate(self.teacher_ids)}
+        subject_index = {}
+        group_index = {}
+        self.subjects = []
+        self.assignment = array("i")
+        self.cls = array("i")
+        self.teacher = array("i")
+        self.subject = array("i")
+        self.group = array("i")
+        self.block = array("b")
+        self.kind = array("b")
+
+        for ai, a in enumerate(assignments):
+            sid = subject_index.get(a.subject)
+            if sid is None:
+                sid = subject_index[a.subject] = len(self.subjects)
+                self.subjects.append(a.subject)
+            c = class_index[a.class_id]
+            t = teacher_index[a.teacher_id]
+            g = group_index.setdefault((c, sid), len(group_index))
+            for block, kind in unit_blocks(a):
+                self.assignment.append(ai)
+                self.cls.append(c)
+                self.teacher.append(t)
+                self.subject.append(sid)
+                self.group.append(g)
+                self.block.append(block)
+                self.kind.append(KINDS.index(kind))
+        self.num_groups = len(group_index)
+
+    def __len__(self):
+        return len(self.block)
+
+    def unit(self, i):
+        """Dict view of unit ``i``, shaped like an expand_units entry."""
+        return {
+            "teacher_id": self.teacher_ids[self.teacher[i]],
+            "class_id": self.class_ids[self.cls[i]],
+            "subject": self.subjects[self.subject[i]],
+            "block": self.block[i],
+            "kind": KINDS[self.kind[i]],
+        }
@@ -1,11 +1,22 @@
 # timetable_generator_improved.py
 # Complete app with Teachers / Classes / Assignments side-by-side inside expanders
 
+import hashlib
+import os
+
 import streamlit as st
 import pandas as pd
-from dataclasses import dataclass
-from typing import List, Dict, Tuple, Any
-import random, copy, time, itertools, json
+
+from timetable_engine import (
+    Registry, ResultCache, problem_key, Constraints, unit_blocks, CATEGORIES as ASSIGNMENT_CATEGORIES, SoftScorer, DEFAULT_WEIGHTS, score_result, SolverStats,
+    build_grid, diagnose, schedule_best_of_n, schedule_cp, schedule_incremental, default_workers,
+    create_single_class_timetable, create_batch_timetables,
+    all_grids, period_header, export_zip, export_xlsx,
+    EXCEL_COLUMNS, BATCH_COLUMNS, state_to_json, state_from_json, constraints_from_json, entities_from_frame, batch_from_frame,
+    ProjectStore,
+)
+from timetable_engine.jobs import DEFAULT_DB as DEFAULT_JOBS_DB, FINISHED, JobStore, WorkerPool, job_request, request_entities
+from timetable_engine.store import DEFAULT_DB as DEFAULT_PROJECTS_DB
 
 # -----------------------
 # Page config & CSS
@@ -71,44 +82,34 @@ st.markdown("""
 
 
 
-# -----------------------
-# Domain dataclasses
-# -----------------------
-@dataclass
-class Teacher:
-    id: int
-    name: str
-    subjects: List[str]
-
-@dataclass
-class ClassGroup:
-    id: int
-    name: str
-
-@dataclass
-class Assignment:
-    id: int
-    teacher_id: int
-    class_id: int
-    subject: str
-    category: str      # NEW FIELD
-    periods_per_week: int
-
 # -----------------------
 # Session state init
 # -----------------------
-if "teachers" not in st.session_state:
-    st.session_state.teachers = []
-if "classes" not in st.session_state:
-    st.session_state.classes = []
-if "assignments" not in st.session_state:
-    st.session_state.assignments = []
-if "next_teacher_id" not in st.session_state:
-    st.session_state.next_teacher_id = 1
-if "next_class_id" not in st.session_state:
-    st.session_state.next_class_id = 1
-if "next_assign_id" not in st.session_state:
-    st.session_state.next_assign_id = 1
+# teachers / classes / assignments with id indexes (see timetable_engine.registry)
+if "registry" not in st.session_state:
+    st.session_state.registry = Registry()
+reg = st.session_state.registry
+# unavailable periods per teacher / class and pinned lessons (see timetable_engine.constraints)
+if "constraints" not in st.session_state:
+    st.session_state.constraints = Constraints()
+if "dept_results" not in st.session_state:
+    st.session_state.dept_results = ResultCache(maxsize=8)
+if "last_dept" not in st.session_state:
+    st.session_state.last_dept = None   # (days, periods/day, class table) of the timetable last shown
+if "dept_jobs" not in st.session_state:
+    st.session_state.dept_jobs = []     # background jobs submitted from this session and not yet collected
+if "job_notice" not in st.session_state:
+    st.session_state.job_notice = None  # (level, message) about the last collected job
+if "opened_result" not in st.session_state:
+    st.session_state.opened_result = None  # (caption, key, days, periods/day, settings, result) of a reopened job or project
+if "shown_result" not in st.session_state:
+    st.session_state.shown_result = None   # (key, days, periods/day, settings, result) last rendered, saved with the project
+if "project" not in st.session_state:
+    st.session_state.project = None        # name of the saved project last opened or saved
+if "json_import" not in st.session_state:
+    st.session_state.json_import = None    # hash of the last imported JSON state file
+if "excel_import" not in st.session_state:
+    st.session_state.excel_import = (None, None)   # (file hash, sheet) of the last imported upload
 
 # single-class specific
 if "single_assignments" not in st.session_state:
@@ -117,37 +118,64 @@ if "single_schedule" not in st.session_state:
     st.session_state.single_schedule = None
 if "attempt_seed" not in st.session_state:
     st.session_state.attempt_seed = 0
+# batch mode: class name -> subject list, the last uploaded batch sheet's hash, and the last result
+if "batch_classes" not in st.session_state:
+    st.session_state.batch_classes = {}
+if "batch_import" not in st.session_state:
+    st.session_state.batch_import = None
+if "batch_result" not in st.session_state:
+    st.session_state.batch_result = None
 
 # -----------------------
 # Utility: save / load JSON for portability
 # -----------------------
 def export_state_json():
-    payload = {
-        "teachers":[{"id":t.id,"name":t.name,"subjects":t.subjects} for t in st.session_state.teachers],
-        "classes":[{"id":c.id,"name":c.name} for c in st.session_state.classes],
-        "assignments":[{"id":a.id,"teacher_id":a.teacher_id,"class_id":a.class_id,"subject":a.subject,"periods_per_week":a.periods_per_week} for a in st.session_state.assignments]
-    }
-    return json.dumps(payload, indent=2)
+    return state_to_json(reg.teachers, reg.classes, reg.assignments, st.session_state.constraints)
 
 def import_state_json(text):
     try:
-        obj = json.loads(text)
-        st.session_state.teachers = [Teacher(**t) for t in obj.get("teachers",[])]
-        st.session_state.classes = [ClassGroup(**c) for c in obj.get("classes",[])]
-        loaded_assignments = []
-        for a in obj.get("assignments", []):
-            if "category" not in a:
-                a["category"] = "Theory"
-            loaded_assignments.append(Assignment(**a))
-        st.session_state.assignments = loaded_assignments
-       # update next ids
-        st.session_state.next_teacher_id = max([t.id for t in st.session_state.teachers], default=0) + 1
-        st.session_state.next_class_id = max([c.id for c in st.session_state.classes], default=0) + 1
-        st.session_state.next_assign_id = max([a.id for a in st.session_state.assignments], default=0) + 1
+        teachers, classes, assignments = state_from_json(text)
+        reg.replace(teachers, classes, assignments)
+        st.session_state.constraints = constraints_from_json(text)
         return True, "Imported state successfully"
     except Exception as e:
         return False, str(e)
 
+# -----------------------
+# Saved projects: entities, rules, week and the shown timetable in one SQLite file
+# (TIMETABLE_PROJECTS_DB), shared by every session of this server
+# -----------------------
+@st.cache_resource
+def _project_store():
+    return ProjectStore(os.environ.get("TIMETABLE_PROJECTS_DB", DEFAULT_PROJECTS_DB))
+
+def _save_project():
+    name = st.session_state.proj_name.strip()
+    store = _project_store()
+    store.save(name, reg.teachers, reg.classes, reg.assignments, st.session_state.constraints, st.session_state.cfg_days, int(st.session_state.cfg_ppd))
+    if st.session_state.shown_result is not None:
+        store.save_timetable(name, *st.session_state.shown_result)
+    st.session_state.project = name
+    st.session_state.project_notice = f"Saved project {name}" + (" with its timetable" if st.session_state.shown_result is not None else "")
+
+def _open_project(name):
+    store = _project_store()
+    project = store.load(name)
+    if project is None:
+        st.session_state.project_notice = f"Project {name} no longer exists"
+        return
+    reg.replace(project.teachers, project.classes, project.assignments)
+    st.session_state.constraints = project.constraints
+    if project.days:
+        st.session_state.cfg_days = project.days
+    if project.periods_per_day:
+        st.session_state.cfg_ppd = project.periods_per_day
+    st.session_state.project = st.session_state.proj_name = name
+    st.session_state.last_dept = None
+    saved = store.timetable(name)
+    st.session_state.opened_result = None if saved is None else (f"Showing the timetable saved with project {name}.", *saved)
+    st.session_state.project_notice = f"Opened project {name}"
+
 # -----------------------
 # Header
 # -----------------------
@@ -181,14 +209,119 @@ with st.sidebar:
     "3:10pm - 3:55pm"
     ]
     st.divider()
-    trials = st.number_input("Randomized trials (best-of-N)", min_value=10, max_value=2000, value=300, step=10, key="cfg_trials")
+    solver = st.selectbox("Solver", ["Randomized trials", "Constraint propagation"], index=0, key="cfg_solver", help="Constraint propagation searches systematically and can prove that no timetable exists")
+    trials = st.number_input("Randomized trials (best-of-N)", min_value=10, max_value=100000, value=300, step=10, key="cfg_trials", help="Upper bound on trials; the time budget may stop the run earlier")
+    adaptive = st.checkbox("Adaptive trials", value=False, key="cfg_adaptive", help="Each trial learns from the earlier ones: lessons left unplaced go first next time, contested periods are tried last, and the run stops once the best result stops improving")
+    repair_seconds = st.number_input("Repair time budget (s)", min_value=0.0, max_value=60.0, value=2.0, step=0.5, key="cfg_repair", help="Local search that fits leftover units into the best trial; 0 turns it off")
+    backend = st.selectbox("Occupancy backend", ["Bitset","Lists"], index=0, key="cfg_backend")
+    workers = st.number_input("Worker processes", min_value=1, max_value=default_workers(), value=1, step=1, key="cfg_workers", help="More than 1 runs the trials in parallel on a process pool")
+    master_seed = st.number_input("Master seed (0 = random)", min_value=0, value=0, step=1, key="cfg_seed")
+    time_budget = st.number_input("Time budget (s, 0 = no limit)", min_value=0.0, max_value=600.0, value=30.0, step=5.0, key="cfg_budget", help="Solvers stop at this wall-clock limit and return the best timetable found so far")
+    optimize_quality = st.checkbox("Optimize timetable quality", value=False, key="cfg_quality", help="Trials prefer slots that avoid teacher gaps, long runs and lopsided days, and keep going after the first complete timetable to find a better one")
+    quality_weights = None
+    if optimize_quality:
+        with st.expander("Soft constraint weights", expanded=False):
+            quality_weights = {name: st.number_input(name.replace("_", " ").capitalize(), min_value=0, max_value=10, value=weight, step=1, key=f"cfg_w_{name}") for name, weight in DEFAULT_WEIGHTS.items()}
+            max_consecutive = st.number_input("Max periods in a row", min_value=1, max_value=12, value=3, step=1, key="cfg_max_run")
+    scorer = SoftScorer(quality_weights, max_consecutive=int(max_consecutive)) if optimize_quality else None
+    collect_stats = st.checkbox("Collect solver statistics", value=False, key="cfg_stats", help="Count probed slots and why they were rejected, time each trial and count search nodes; shown under the timetables")
+    background = st.checkbox("Run as a background job", value=False, key="cfg_background", help="Queue the solve for the job workers instead of running it in this page; it keeps going if the tab is closed and can be reopened from the job list")
+
+    st.divider()
+    st.subheader("Project")
+    project_name = st.text_input("Project name", key="proj_name", placeholder="e.g. CSE department 2025")
+    st.button("Save project", key="proj_save", on_click=_save_project, disabled=not project_name.strip(),
+              help="Stores the teachers, classes, assignments, rules, week and the timetable shown below; saving under an existing name overwrites it")
+    saved_projects = _project_store().projects()
+    if saved_projects:
+        counts = {p["name"]: f"{p['classes']} classes, {p['assignments']} assignments" for p in saved_projects}
+        chosen_project = st.selectbox("Saved projects", options=list(counts), format_func=lambda n: f"{n} ({counts[n]})", key="proj_sel")
+        st.button("Open project", key="proj_open", on_click=_open_project, args=(chosen_project,), help="Replaces the current data with the saved project")
+    if st.session_state.get("project_notice"):
+        st.caption(st.session_state.pop("project_notice"))
+    st.download_button("Download state (JSON)", export_state_json, file_name="timetable_state.json", mime="application/json", key="state_download")
+    state_file = st.file_uploader("Import state (JSON)", type=["json"], key="state_upload")
+    if state_file is not None:
+        # Like the Excel upload, a file is only imported once, not on every rerun
+        state_hash = hashlib.sha256(state_file.getvalue()).hexdigest()
+        if st.session_state.json_import != state_hash:
+            ok, message = import_state_json(state_file.getvalue().decode("utf-8"))
+            if ok:
+                st.session_state.json_import = state_hash
+                st.success(message)
+            else:
+                st.error(message)
+
+# -----------------------
+# Background jobs: one queue file and worker pool per server process, shared by all
+# sessions. TIMETABLE_JOB_WORKERS=0 leaves the jobs to `python -m timetable_engine.jobs worker`.
+# -----------------------
+@st.cache_resource
+def _job_queue():
+    store = JobStore(os.environ.get("TIMETABLE_JOBS_DB", DEFAULT_JOBS_DB))
+    processes = int(os.environ.get("TIMETABLE_JOB_WORKERS", "2"))
+    if processes > 0:
+        WorkerPool(store.path, processes).start()
+    return store
+
+def _last_line(text):
+    lines = (text or "").strip().splitlines()
+    return lines[-1] if lines else ""
+
+def _open_job(job_id):
+    # Load a finished job's inputs into the editor and show its timetables
+    store = _job_queue()
+    request, result = store.request(job_id), store.result(job_id)
+    if result is None or "diag" in result[3]:
+        st.session_state.job_notice = ("error", f"Job {job_id[:8]} has no timetable to open.")
+        return
+    teachers, classes, assignments, constraints = request_entities(request)
+    reg.replace(teachers, classes, assignments)
+    st.session_state.constraints = constraints
+    st.session_state.opened_result = (f"Showing background job {job_id[:8]}, solved with its own week and solver settings.", store.get(job_id)["key"], request["days"], request["periods_per_day"], request["settings"], result)
+
+@st.fragment(run_every=2)
+def _job_monitor():
+    # Polls this session's jobs; a finished one goes into the result cache and the page reruns to show it
+    store = _job_queue()
+    for job_id in list(st.session_state.dept_jobs):
+        job = store.get(job_id)
+        if job is None or job["status"] in FINISHED:
+            st.session_state.dept_jobs.remove(job_id)
+            result = store.result(job_id) if job is not None else None
+            if result is not None and "diag" not in result[3]:
+                st.session_state.dept_results.put(job["key"], result)
+                st.session_state.job_notice = ("success", f"Background job {job_id[:8]} finished ({job['status']}).")
+            elif job is not None and job["status"] == "failed":
+                st.session_state.job_notice = ("error", f"Background job {job_id[:8]} failed: {_last_line(job['error'])}")
+            else:
+                st.session_state.job_notice = ("warning", f"Background job {job_id[:8]} ended without a timetable.")
+            st.rerun()
+        st.progress(int(job["progress"]*100), text=f"Job {job_id[:8]} — {job['status']}: {job['message'] or 'waiting for a worker'}")
+
+def _render_job_list():
+    store = _job_queue()
+    jobs = store.jobs(limit=20)
+    if not jobs:
+        st.info("No background jobs yet")
+        return
+    rows = [{"job": j["id"][:8], "label": j["label"], "status": j["status"], "progress": f"{j['progress']*100:.0f}%", "message": j["message"] or _last_line(j["error"]),
+             "submitted": pd.to_datetime(j["created"], unit="s").strftime("%Y-%m-%d %H:%M")} for j in jobs]
+    st.dataframe(pd.DataFrame(rows), use_container_width=True)
+    by_id = {j["id"]: j for j in jobs}
+    job_id = st.selectbox("Job", options=list(by_id), format_func=lambda i: f"{i[:8]} — {by_id[i]['label']} ({by_id[i]['status']})", key="job_sel")
+    job = by_id[job_id]
+    cols = st.columns(2)
+    cols[0].button("Cancel job", key="job_cancel", disabled=job["status"] in FINISHED, on_click=store.cancel, args=(job_id,))
+    cols[1].button("Open timetables", key="job_open", disabled=job["status"] not in ("done", "cancelled") or job["finished"] is None, on_click=_open_job, args=(job_id,),
+                   help="Loads the job's teachers, classes, assignments and rules into the editor")
 
 # -----------------------
 # Helper: render side-by-side tables (expanders inside columns)
 # -----------------------
 def _render_teachers_table():
-    if st.session_state.teachers:
-        rows = [{"id": t.id, "name": t.name, "subjects": ", ".join(t.subjects)} for t in st.session_state.teachers]
+    if reg.teachers:
+        rows = [{"id": t.id, "name": t.name, "subjects": ", ".join(t.subjects)} for t in reg.teachers]
         st.dataframe(pd.DataFrame(rows), use_container_width=True)
         # simple delete control
         options = [f"{r['id']} - {r['name']}" for r in rows] + ["None"]
@@ -196,33 +329,31 @@ def _render_teachers_table():
         choice = st.selectbox("Delete teacher", options=options, index=default_index, key="del_teacher_sel")
         if choice != "None" and st.button("Delete selected teacher", key="del_teacher_btn"):
             tid = int(choice.split(" - ")[0])
-            st.session_state.teachers = [t for t in st.session_state.teachers if t.id != tid]
-            st.session_state.assignments = [a for a in st.session_state.assignments if a.teacher_id != tid]
+            reg.delete_teacher(tid)
             st.success("Deleted teacher and related assignments")
     else:
         st.info("No teachers added yet")
 
 def _render_classes_table():
-    if st.session_state.classes:
-        rows = [{"id": c.id, "name": c.name} for c in st.session_state.classes]
+    if reg.classes:
+        rows = [{"id": c.id, "name": c.name} for c in reg.classes]
         st.dataframe(pd.DataFrame(rows), use_container_width=True)
         options = [f"{r['id']} - {r['name']}" for r in rows] + ["None"]
         default_index = len(options)-1
         choice = st.selectbox("Delete class", options=options, index=default_index, key="del_class_sel")
         if choice != "None" and st.button("Delete selected class", key="del_class_btn"):
             cid = int(choice.split(" - ")[0])
-            st.session_state.classes = [c for c in st.session_state.classes if c.id != cid]
-            st.session_state.assignments = [a for a in st.session_state.assignments if a.class_id != cid]
+            reg.delete_class(cid)
             st.success("Deleted class and related assignments")
     else:
         st.info("No classes added yet.")
 
 def _render_assignments_table():
-    if st.session_state.assignments:
+    if reg.assignments:
         rows = []
-        for a in st.session_state.assignments:
-            tname = next((t.name for t in st.session_state.teachers if t.id == a.teacher_id), "Unknown")
-            cname = next((c.name for c in st.session_state.classes if c.id == a.class_id), "Unknown")
+        for a in reg.assignments:
+            tname = reg.teacher_name(a.teacher_id)
+            cname = reg.class_name(a.class_id)
             rows.append({
                 "id": a.id,
                 "teacher": tname,
@@ -238,11 +369,137 @@ def _render_assignments_table():
         choice = st.selectbox("Delete assignment", options=options, index=default_index, key="del_assign_sel")
         if choice != "None" and st.button("Delete selected assignment", key="del_assign_btn"):
             aid = int(choice.split(" - ")[0])
-            st.session_state.assignments = [a for a in st.session_state.assignments if a.id != aid]
+            reg.delete_assignment(aid)
             st.success("Deleted assignment")
     else:
         st.info("No assignments added yet.")
 
+def _render_solver_stats(stats):
+    # meta["stats"] (stats.SolverStats.as_dict()) of the last department run
+    if stats["trials"]:
+        times = stats["trial_seconds"]
+        st.markdown(f"**{stats['trials']}** trials, {times['mean']*1000:.1f} ms each on average (slowest {times['max']*1000:.1f} ms), **{stats['slots_probed']}** start slots probed")
+        st.bar_chart(pd.Series({reason.replace("_", " "): count for reason, count in stats["rejections"].items()}, name="Rejected slots"))
+        if stats["unplaced"]:
+            st.markdown("Lessons most often left unplaced:")
+            st.dataframe(pd.DataFrame([{"Class": reg.class_name(r["class_id"]), "Teacher": reg.teacher_name(r["teacher_id"]), "Subject": r["subject"], "Times unplaced": r["count"]} for r in stats["unplaced"]]), use_container_width=True)
+    if stats["nodes"]:
+        st.markdown(f"Search nodes **{stats['nodes']}**, deepest partial timetable **{stats['max_depth']}** units, dead ends **{stats['dead_ends']}**")
+
+def _render_dept_result(result, days, periods_per_day, time_budget, trials):
+    # Timetables, downloads and leftovers of one department result (solved here or by a job)
+    class_table, teacher_table, remaining, meta = result
+    st.session_state.last_dept = (tuple(days), int(periods_per_day), class_table)
+    st.success("Scheduling finished — see timetables below.")
+    if "penalty" in meta:
+        st.caption(f"Soft-constraint penalty {meta['penalty']} — " + ", ".join(f"{name.replace('_', ' ')}: {value}" for name, value in meta["penalty_terms"].items()))
+    if "stats" in meta:
+        with st.expander("Solver statistics", expanded=False):
+            _render_solver_stats(meta["stats"])
+
+    # One pass over the class table gives every class and teacher grid; only the
+    # selected one is rendered, and the bulk files are only built when downloaded
+    class_grids, teacher_grids = all_grids(class_table, days, periods_per_day, reg.class_names, reg.teacher_names)
+    export_args = (class_grids, teacher_grids, days, period_header(periods_per_day, period_timings), dict(reg.class_names), dict(reg.teacher_names))
+    dl_cols = st.columns(2)
+    dl_cols[0].download_button("Download all timetables (ZIP of CSVs)", lambda: export_zip(*export_args), file_name="timetables.zip", mime="application/zip", key="download_all_zip")
+    dl_cols[1].download_button("Download all timetables (Excel, one sheet each)", lambda: export_xlsx(*export_args), file_name="timetables.xlsx", mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", key="download_all_xlsx")
+
+    st.markdown("### Timetables")
+    view = st.radio("Show", ["Class", "Teacher"], horizontal=True, key="dept_view_kind")
+    entities = reg.classes if view == "Class" else reg.teachers
+    names = {e.id: e.name for e in entities}
+    chosen = st.selectbox(view, options=list(names), format_func=names.get, key=f"dept_view_{view}")
+    if chosen is not None:
+        grids = class_grids if view == "Class" else teacher_grids
+        st.subheader(names[chosen])
+        cols = [(f"P{p}", period_timings[p-1]) for p in range(1, periods_per_day+1)]
+        df = pd.DataFrame(grids[chosen], index=days, columns=pd.MultiIndex.from_tuples(cols))
+        st.markdown(df.to_html(classes='centered-table', index=True, escape=False), unsafe_allow_html=True)
+        st.download_button(
+            label=f"Download {names[chosen]} CSV",
+            data=df.to_csv(),
+            file_name=f"timetable_{names[chosen]}.csv",
+            mime="text/csv",
+            key=f"download_{view.lower()}_{chosen}"
+        )
+
+    if meta.get("best_remaining", 0) > 0:
+        if meta.get("status") == "timed out":
+            st.warning(f"Stopped at the {time_budget:g}s time budget with {meta.get('best_remaining')} units left — showing the best timetable found so far.")
+        elif meta.get("status") == "infeasible":
+            st.error(f"No complete timetable exists under these rules — the constraint search proved it. Showing the deepest partial placement ({meta.get('best_remaining')} units left).")
+        elif meta.get("nodes") is not None:
+            st.warning(f"Constraint search stopped after {meta.get('nodes')} placements with {meta.get('best_remaining')} units left.")
+        else:
+            st.warning(f"Could not place {meta.get('best_remaining')} periods even after {meta.get('trials', trials)} trials and repair." + (" The adaptive search stopped when its best result stopped improving." if meta.get("plateau") else ""))
+        rem_df = pd.DataFrame(remaining) if remaining else pd.DataFrame()
+        if not rem_df.empty:
+            rem_df['teacher_name'] = rem_df['teacher_id'].map(reg.teacher_names.get)
+            rem_df['class_name'] = rem_df['class_id'].map(reg.class_names.get)
+            st.dataframe(rem_df[['teacher_name','class_name','subject']])
+
+def _render_constraints_panel():
+    # Hard rules the solvers apply: periods a teacher or class cannot use,
+    # lessons fixed to a start period and the rooms some lessons need
+    cons = st.session_state.constraints
+    timeslots, _ = build_grid(days, periods_per_day)
+    kind = st.radio("Rule", ["Teacher unavailable", "Class unavailable", "Pinned lesson", "Rooms"], horizontal=True, key="con_kind")
+    if kind == "Teacher unavailable" and reg.teachers:
+        tid = st.selectbox("Teacher", options=[t.id for t in reg.teachers], format_func=reg.teacher_name, key="con_teacher")
+        current = cons.teacher_unavailable.get(tid, set())
+        labels = st.multiselect("Unavailable periods", timeslots, default=[l for l in timeslots if l in current], key=f"con_t_{tid}")
+        if st.button("Save teacher availability", key="con_t_save"):
+            cons.set_teacher_unavailable(tid, labels)
+            st.success(f"Saved — {reg.teacher_name(tid)} unavailable for {len(labels)} periods")
+    elif kind == "Class unavailable" and reg.classes:
+        cid = st.selectbox("Class", options=[c.id for c in reg.classes], format_func=reg.class_name, key="con_class")
+        current = cons.class_unavailable.get(cid, set())
+        labels = st.multiselect("Unavailable periods", timeslots, default=[l for l in timeslots if l in current], key=f"con_c_{cid}")
+        if st.button("Save class availability", key="con_c_save"):
+            cons.set_class_unavailable(cid, labels)
+            st.success(f"Saved — {reg.class_name(cid)} unavailable for {len(labels)} periods")
+    elif kind == "Pinned lesson" and reg.assignments:
+        aid = st.selectbox("Assignment", options=[a.id for a in reg.assignments], key="con_assign",
+                           format_func=lambda i: f"{i} - {reg.teacher_name(reg.assignment_by_id[i].teacher_id)} → {reg.class_name(reg.assignment_by_id[i].class_id)} ({reg.assignment_by_id[i].subject})")
+        lessons = [block for block, _ in unit_blocks(reg.assignment_by_id[aid])]
+        st.caption("Lessons of this assignment, in order: " + ", ".join(f"{b} period{'s' if b > 1 else ''}" for b in lessons) + ". Each pinned period fixes where the next lesson starts.")
+        labels = st.multiselect("Pinned start periods", timeslots, default=[l for l in cons.pinned.get(aid, []) if l in timeslots], max_selections=len(lessons), key=f"con_a_{aid}")
+        if st.button("Save pinned lessons", key="con_a_save"):
+            cons.set_pinned(aid, labels)
+            st.success(f"Saved — {len(labels)} lesson(s) pinned")
+    elif kind == "Rooms":
+        st.caption("Every lesson of a category that has rooms is given one of them, and a room never holds more classes at once than its capacity. Lab rooms are also used for Laboratory subjects in the batch class scheduler.")
+        rc1, rc2, rc3 = st.columns([2,1,1])
+        room_name = rc1.text_input("Room name", key="con_room_name", placeholder="e.g. Chemistry lab")
+        room_category = rc2.selectbox("Hosts", ASSIGNMENT_CATEGORIES, index=ASSIGNMENT_CATEGORIES.index("Lab"), key="con_room_category")
+        room_capacity = rc3.number_input("Classes at once", min_value=1, max_value=20, value=1, key="con_room_capacity")
+        if st.button("Add room", key="con_room_add"):
+            if not room_name.strip():
+                st.warning("Enter a room name")
+            elif any(r.name == room_name.strip() for r in cons.rooms):
+                st.warning("A room with that name already exists")
+            else:
+                cons.add_room(room_name.strip(), room_category, room_capacity)
+                st.success(f"Added {room_name.strip()}")
+        if cons.rooms:
+            st.dataframe(pd.DataFrame([{"room": r.name, "hosts": r.category, "classes at once": r.capacity} for r in cons.rooms]), use_container_width=True)
+            rid = st.selectbox("Room", options=[r.id for r in cons.rooms], format_func=lambda i: next(r.name for r in cons.rooms if r.id == i), key="con_room_sel")
+            if st.button("Remove room", key="con_room_remove"):
+                cons.remove_room(rid)
+                st.rerun()
+    else:
+        st.info("Nothing to constrain yet")
+
+    rows = [{"rule": "Teacher unavailable", "for": reg.teacher_name(tid), "periods": ", ".join(l for l in timeslots if l in labels)} for tid, labels in cons.teacher_unavailable.items()]
+    rows += [{"rule": "Class unavailable", "for": reg.class_name(cid), "periods": ", ".join(l for l in timeslots if l in labels)} for cid, labels in cons.class_unavailable.items()]
+    rows += [{"rule": "Pinned", "for": f"{reg.assignment_by_id[aid].subject} ({reg.class_name(reg.assignment_by_id[aid].class_id)})", "periods": ", ".join(labels)} for aid, labels in cons.pinned.items() if aid in reg.assignment_by_id]
+    if rows:
+        st.dataframe(pd.DataFrame(rows), use_container_width=True)
+        if st.button("Clear all rules", key="con_clear"):
+            st.session_state.constraints = Constraints()
+            st.rerun()
+
 def render_side_by_side_tables(use_expanders=True, expand_teachers=True, expand_classes=True, expand_assignments=True):
     col1, col2, col3 = st.columns([1,1,1])
     with col1:
@@ -267,237 +524,6 @@ def render_side_by_side_tables(use_expanders=True, expand_teachers=True, expand_
             st.subheader("Assignments")
             _render_assignments_table()
 
-# -----------------------
-# Scheduling helpers (kept same as original)
-# -----------------------
-def build_grid(days: List[str], periods_per_day: int) -> Tuple[List[str], Dict[int, Tuple[str,int]]]:
-    timeslots = []
-    idx2dp = {}
-    idx = 0
-    for d in days:
-        for p in range(1, periods_per_day+1):
-            label = f"{d}-P{p}"
-            timeslots.append(label)
-            idx2dp[idx] = (d, p)
-            idx += 1
-    return timeslots, idx2dp
-
-def compute_totals(classes, teachers, assignments):
-    class_totals = {}
-    teacher_totals = {}
-    for a in assignments:
-        class_totals[a.class_id] = class_totals.get(a.class_id, 0) + a.periods_per_week
-        teacher_totals[a.teacher_id] = teacher_totals.get(a.teacher_id, 0) + a.periods_per_week
-    return class_totals, teacher_totals
-
-def diagnose(classes, teachers, assignments, num_slots):
-    class_totals, teacher_totals = compute_totals(classes, teachers, assignments)
-    class_map = {c.id:c.name for c in classes}
-    teacher_map = {t.id:t.name for t in teachers}
-
-    class_rows = []
-    for cid, tot in class_totals.items():
-        class_rows.append({
-            "Class": class_map.get(cid, str(cid)),
-            "Requested (pw)": tot,
-            "Available": num_slots,
-            "Overload": max(0, tot - num_slots)
-        })
-    teacher_rows = []
-    for tid, tot in teacher_totals.items():
-        teacher_rows.append({
-            "Teacher": teacher_map.get(tid, str(tid)),
-            "Requested (pw)": tot,
-            "Available": num_slots,
-            "Overload": max(0, tot - num_slots)
-        })
-
-    class_df = pd.DataFrame(class_rows).sort_values(by="Overload", ascending=False) if class_rows else pd.DataFrame()
-    teacher_df = pd.DataFrame(teacher_rows).sort_values(by="Overload", ascending=False) if teacher_rows else pd.DataFrame()
-
-    problems = {
-        "class_overload": [(r["Class"], r["Requested (pw)"], r["Available"]) for _,r in class_df.iterrows() if r["Overload"]>0] if not class_df.empty else [],
-        "teacher_overload": [(r["Teacher"], r["Requested (pw)"], r["Available"]) for _,r in teacher_df.iterrows() if r["Overload"]>0] if not teacher_df.empty else []
-    }
-
-    return {"num_slots": num_slots, "class_df": class_df, "teacher_df": teacher_df, "problems": problems}
-
-def try_place_once(classes, teachers, assignments, timeslots, seed=None):
-    if seed is not None:
-        random.seed(seed)
-
-    num_slots = len(timeslots)
-    class_table = {c.id: [None]*num_slots for c in classes}
-    teacher_table = {t.id: [None]*num_slots for t in teachers}
-
-    expanded = []
-
-    # ---- Build block units (Lab / Theory / Others) ----
-    for a in assignments:
-
-        # 🧪 LAB — always 2 continuous periods
-        if a.category == "Lab":
-            for _ in range(a.periods_per_week // 2):
-                expanded.append({
-                    "teacher_id": a.teacher_id,
-                    "class_id": a.class_id,
-                    "subject": a.subject,
-                    "block": 2,
-                    "kind": "lab"
-                })
-            if a.periods_per_week % 2 == 1:
-                expanded.append({
-                    "teacher_id": a.teacher_id,
-                    "class_id": a.class_id,
-                    "subject": a.subject,
-                    "block": 1,
-                    "kind": "theory"
-                })
-
-        # 📘 LIBRARY or MENTORING — single period
-        elif a.category in ("Library", "Mentoring"):
-            expanded.append({
-                "teacher_id": a.teacher_id,
-                "class_id": a.class_id,
-                "subject": a.subject,
-                "block": 1,
-                "kind": "theory"
-            })
-
-        # 🧮 THEORY / PH / TP — normal subjects
-        else:
-            subj_upper = a.subject.strip().upper()
-
-            # TP → always 2 continuous periods
-            if subj_upper == "TP":
-                for _ in range(a.periods_per_week // 2):
-                    expanded.append({
-                        "teacher_id": a.teacher_id,
-                        "class_id": a.class_id,
-                        "subject": a.subject,
-                        "block": 2,
-                        "kind": "theory"
-                    })
-                if a.periods_per_week % 2 == 1:
-                    expanded.append({
-                        "teacher_id": a.teacher_id,
-                        "class_id": a.class_id,
-                        "subject": a.subject,
-                        "block": 1,
-                        "kind": "theory"
-                    })
-
-            # PH → treat like normal theory
-            else:
-                for _ in range(a.periods_per_week):
-                    expanded.append({
-                        "teacher_id": a.teacher_id,
-                        "class_id": a.class_id,
-                        "subject": a.subject,
-                        "block": 1,
-                        "kind": "theory"
-                    })
-
-    # Sort and shuffle blocks
-    random.shuffle(expanded)
-    expanded.sort(key=lambda x: -x["block"])
-
-    remaining = []
-
-    # ---- Placement loop ----
-    for unit in expanded:
-        placed = False
-        slot_order = list(range(num_slots))
-        random.shuffle(slot_order)
-
-        for sidx in slot_order:
-            block = unit["block"]
-            cid = unit["class_id"]
-            tid = unit["teacher_id"]
-            subj = unit["subject"]
-            kind = unit["kind"]
-
-            day = sidx // periods_per_day
-            period = sidx % periods_per_day
-
-            # Prevent overflow across day
-            if period + block > periods_per_day:
-                continue
-
-            # Block alignment rules
-            # if block == 2 and period + 1 >= periods_per_day:
-            #     continue
-
-
-            # Check availability
-            if any(class_table[cid][sidx+k] is not None or teacher_table[tid][sidx+k] is not None for k in range(block)):
-                continue
-
-            # Prevent same teacher consecutive teaching
-            # bad = False
-            # for k in range(block):
-            #     si = sidx + k
-            #     if si > 0 and teacher_table[tid][si-1] is not None:
-            #         bad = True
-            #         break
-            #     if si < num_slots-1 and teacher_table[tid][si+1] is not None:
-            #         bad = True
-            #         break
-            # if bad:
-            #     continue
-
-            # Prevent same subject twice in same day
-            day_slice = class_table[cid][day*periods_per_day:(day+1)*periods_per_day]
-            if any(cell and cell["subject"] == subj for cell in day_slice):
-                continue
-
-            # Place it
-            for k in range(block):
-                si = sidx + k
-                class_table[cid][si] = {"subject": subj, "teacher_id": tid}
-                teacher_table[tid][si] = {"subject": subj, "class_id": cid}
-
-            placed = True
-            break
-
-        if not placed:
-            remaining.append(unit)
-
-    return class_table, teacher_table, remaining
-
-
-def schedule_best_of_n(classes, teachers, assignments, timeslots, trials=300, st_progress=None):
-    best_solution = None
-    best_remaining = None
-    best_placed_count = -1
-    num_slots = len(timeslots)
-
-    diag = diagnose(classes, teachers, assignments, num_slots)
-    if (not diag["class_df"].empty and diag["class_df"]["Overload"].sum() > 0) or (not diag["teacher_df"].empty and diag["teacher_df"]["Overload"].sum() > 0):
-        return None, None, None, {"diag": diag}
-
-    start = time.time()
-    for t in range(trials):
-        seed = random.randrange(1_000_000)
-        class_table, teacher_table, remaining = try_place_once(classes, teachers, assignments, timeslots, seed=seed)
-        placed_count = sum(1 for cid in class_table for v in class_table[cid] if v is not None)
-        rem_count = len(remaining)
-        if best_solution is None or rem_count < best_remaining or (rem_count == best_remaining and placed_count > best_placed_count):
-            best_solution = (copy.deepcopy(class_table), copy.deepcopy(teacher_table), list(remaining))
-            best_remaining = rem_count
-            best_placed_count = placed_count
-            if best_remaining == 0:
-                break
-        if st_progress is not None:
-            bar, status = st_progress
-            bar.progress(int((t+1)/trials*100))
-            if (t+1) % max(1, trials//10) == 0:
-                status.text(f"Trials {t+1}/{trials} — best remaining {best_remaining}")
-    elapsed = time.time() - start
-    if best_solution is None:
-        return None, None, None, {"diag": diag}
-    return best_solution[0], best_solution[1], best_solution[2], {"best_remaining": best_remaining, "placed": best_placed_count, "elapsed": elapsed}
-
 # -----------------------
 # UI: Tabs (Detailed + Single-class)
 # -----------------------
@@ -519,9 +545,7 @@ with tabs[0]:
                 if st.form_submit_button("Add Teacher"):
                     if tn.strip():
                         subjects_list = [s.strip() for s in tsubs.split(",") if s.strip()]
-                        t = Teacher(id=st.session_state.next_teacher_id, name=tn.strip(), subjects=subjects_list)
-                        st.session_state.teachers.append(t)
-                        st.session_state.next_teacher_id += 1
+                        t = reg.add_teacher(tn.strip(), subjects_list)
                         st.success(f"Added teacher {t.name}")
                     else:
                         st.warning("Teacher name required")
@@ -530,18 +554,16 @@ with tabs[0]:
                 cn = st.text_input("Class name", placeholder="e.g. CSE-1")
                 if st.form_submit_button("Add Class"):
                     if cn.strip():
-                        c = ClassGroup(id=st.session_state.next_class_id, name=cn.strip())
-                        st.session_state.classes.append(c)
-                        st.session_state.next_class_id += 1
+                        c = reg.add_class(cn.strip())
                         st.success(f"Added class {c.name}")
                     else:
                         st.warning("Class name required")
 
         st.markdown("---")
-        if st.session_state.teachers and st.session_state.classes:
+        if reg.teachers and reg.classes:
             with st.form("add_assignment", clear_on_submit=True):
-                teacher_map = {t.name:t.id for t in st.session_state.teachers}
-                class_map = {c.name:c.id for c in st.session_state.classes}
+                teacher_map = {t.name:t.id for t in reg.teachers}
+                class_map = {c.name:c.id for c in reg.classes}
                 sel_t = st.selectbox("Teacher", options=list(teacher_map.keys()))
                 sel_c = st.selectbox("Class", options=list(class_map.keys()))
                 subj = st.text_input("Subject name", placeholder="e.g. DBMS")
@@ -552,16 +574,13 @@ with tabs[0]:
                     if not subj.strip():
                         st.warning("Subject required")
                     else:
-                        a = Assignment(
-                            id=st.session_state.next_assign_id,
+                        a = reg.add_assignment(
                             teacher_id=teacher_map[sel_t],
                             class_id=class_map[sel_c],
                             subject=subj.strip(),
                             category=category,
                             periods_per_week=int(p)
                         )
-                        st.session_state.assignments.append(a)
-                        st.session_state.next_assign_id += 1
                         st.success(f"Assigned {sel_t} → {sel_c} ({subj.strip()}, {p} pw)")
         else:
             st.info("Add at least one teacher and one class to create assignments")
@@ -570,10 +589,10 @@ with tabs[0]:
     st.subheader("All Your Schedule Inputs at a Glance")
     # metrics row
     colA, colB, colC, colD = st.columns([1,1,1,1])
-    num_teachers = len(st.session_state.teachers)
-    num_classes = len(st.session_state.classes)
-    num_assigns = len(st.session_state.assignments)
-    total_periods = sum(a.periods_per_week for a in st.session_state.assignments)
+    num_teachers = len(reg.teachers)
+    num_classes = len(reg.classes)
+    num_assigns = len(reg.assignments)
+    total_periods = sum(a.periods_per_week for a in reg.assignments)
     colA.metric("Teachers", num_teachers)
     colB.metric("Classes", num_classes)
     colC.metric("Assignments", num_assigns)
@@ -582,6 +601,9 @@ with tabs[0]:
     # Render the three tables side-by-side in expanders
     render_side_by_side_tables(use_expanders=True, expand_teachers=True, expand_classes=True, expand_assignments=True)
 
+    with st.expander("Availability, pinned lessons & rooms", expanded=False):
+        _render_constraints_panel()
+
     #st.markdown("---")
     # -----------------------
 # 📥 Import from Excel
@@ -592,75 +614,60 @@ uploaded_file = st.file_uploader("Upload Excel file (.xlsx)", type=["xlsx"])
 
 if uploaded_file:
     try:
-        df = pd.read_excel(uploaded_file)
-
-        # Expected columns
-        required_cols = ["Teacher", "Class", "Subject", "Category", "Periods/week"]
-        if not all(col in df.columns for col in required_cols):
-            st.error(f"Excel must have these columns: {', '.join(required_cols)}")
-        else:
-            # Clear previous data
-            st.session_state.teachers = []
-            st.session_state.classes = []
-            st.session_state.assignments = []
-            st.session_state.next_teacher_id = 1
-            st.session_state.next_class_id = 1
-            st.session_state.next_assign_id = 1
-
-            teacher_map = {}
-            class_map = {}
-
-            for _, row in df.iterrows():
-                tname = str(row["Teacher"]).strip()
-                cname = str(row["Class"]).strip()
-                subj = str(row["Subject"]).strip()
-                cat = str(row["Category"]).strip()
-                pw = int(row["Periods/week"])
-
-                # Add teacher
-                if tname not in teacher_map:
-                    t = Teacher(id=st.session_state.next_teacher_id, name=tname, subjects=[])
-                    st.session_state.teachers.append(t)
-                    teacher_map[tname] = t.id
-                    st.session_state.next_teacher_id += 1
-
-                # Add class
-                if cname not in class_map:
-                    c = ClassGroup(id=st.session_state.next_class_id, name=cname)
-                    st.session_state.classes.append(c)
-                    class_map[cname] = c.id
-                    st.session_state.next_class_id += 1
-
-                # Add assignment
-                a = Assignment(
-                    id=st.session_state.next_assign_id,
-                    teacher_id=teacher_map[tname],
-                    class_id=class_map[cname],
-                    subject=subj,
-                    category=cat,
-                    periods_per_week=pw
-                )
-                st.session_state.assignments.append(a)
-                st.session_state.next_assign_id += 1
-
+        # The uploader keeps the file across reruns; only a changed file is imported again,
+        # so edits made after an import are not wiped by the next widget interaction
+        file_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        if st.session_state.excel_import[0] != file_hash:
+            df = pd.read_excel(uploaded_file)
+
+            # Expected columns
+            if not all(col in df.columns for col in EXCEL_COLUMNS):
+                st.error(f"Excel must have these columns: {', '.join(EXCEL_COLUMNS)}")
+            else:
+                # Replace previous data
+                teachers, classes, assignments = entities_from_frame(df)
+                reg.replace(teachers, classes, assignments)
+                # ids are renumbered on import; rooms do not refer to them and stay
+                st.session_state.constraints = Constraints(rooms=st.session_state.constraints.rooms)
+                st.session_state.excel_import = (file_hash, df)
+
+        df = st.session_state.excel_import[1]
+        if st.session_state.excel_import[0] == file_hash:
             st.success("✅ Excel data imported successfully! Ready to generate timetable.")
             st.dataframe(df, use_container_width=True)
 
     except Exception as e:
         st.error(f"Error reading Excel: {e}")
 
-
+# Data entered by hand, imported from JSON or opened from a saved project can be
+# scheduled without an Excel upload
+if uploaded_file or reg.assignments:
     # Generate button and diagnostics
     cols = st.columns([1,1,1])
     generate = cols[1].button("Generate Timetable — Detailed", type="primary")
+    last = st.session_state.last_dept
+    can_keep = last is not None and last[0] == tuple(days) and last[1] == int(periods_per_day)
+    keep_previous = cols[1].checkbox("Keep the last timetable — only re-place changed assignments", value=False, disabled=not can_keep, key="cfg_keep", help="Units whose assignment is unchanged stay in their slots; added or edited ones are fitted around them") and can_keep
+    # Solved timetables survive reruns (downloads, widget changes) in an LRU cache keyed
+    # on the problem content and the settings that change the result
+    if keep_previous:
+        solve_settings = {"solver": "incremental", "repair_seconds": float(repair_seconds), "seed": int(master_seed), "time_budget": float(time_budget), "constraints": st.session_state.constraints.to_dict(), "quality": quality_weights and dict(quality_weights, max_consecutive=int(max_consecutive))}
+    elif solver == "Constraint propagation":
+        solve_settings = {"solver": "cp", "seed": int(master_seed), "time_budget": float(time_budget), "constraints": st.session_state.constraints.to_dict(), "quality": quality_weights and dict(quality_weights, max_consecutive=int(max_consecutive))}
+    else:
+        solve_settings = {"solver": "trials", "trials": int(trials), "adaptive": adaptive, "repair_seconds": float(repair_seconds), "seed": int(master_seed), "time_budget": float(time_budget), "constraints": st.session_state.constraints.to_dict(), "quality": quality_weights and dict(quality_weights, max_consecutive=int(max_consecutive))}
+    if not keep_previous:
+        solve_settings["stats"] = collect_stats
+    result_key = problem_key(reg.teachers, reg.classes, reg.assignments, days, periods_per_day, solve_settings)
     if generate:
-        if not st.session_state.classes or not st.session_state.teachers or not st.session_state.assignments:
+        st.session_state.opened_result = None
+        if not reg.classes or not reg.teachers or not reg.assignments:
             st.warning("Add at least one teacher, one class, and one assignment first.")
         else:
             timeslots, idx2dp = build_grid(days, periods_per_day)
             num_slots = len(timeslots)
 
-            diag = diagnose(st.session_state.classes, st.session_state.teachers, st.session_state.assignments, num_slots)
+            diag = diagnose(reg.classes, reg.teachers, reg.assignments, num_slots, st.session_state.constraints, timeslots)
             st.header("Pre-schedule Diagnostics")
             st.markdown(f"Available slots per class / teacher: **{num_slots} (days={len(days)} × periods/day={periods_per_day})")
 
@@ -669,89 +676,75 @@ if uploaded_file:
             if not diag["teacher_df"].empty:
                 st.dataframe(diag["teacher_df"], use_container_width=True)
 
-            if diag["problems"]["class_overload"] or diag["problems"]["teacher_overload"]:
+            for kind, name, blocks, pairs in diag["problems"]["block_pairs"]:
+                st.error(f"{kind} {name}: {blocks} two-period lessons but only {pairs} free pairs of adjacent periods in the week")
+            for name, subject, lessons, spread in diag["problems"]["subject_days"]:
+                st.error(f"Class {name}: {subject} has {lessons} lessons but only {spread} days to spread them over (one per day)")
+            for name, cells, capacity in diag["problems"]["day_capacity"]:
+                st.error(f"Class {name}: {cells} periods requested, but one lesson per subject per day leaves room for only {capacity}")
+            for category, requested, available in diag["problems"]["room_capacity"]:
+                st.error(f"Rooms for {category}: {requested} periods requested, but the rooms hold only {available} class-periods a week")
+            for message in diag["problems"]["pin_conflicts"]:
+                st.error(f"Pinned lesson {message}")
+
+            if any(diag["problems"].values()):
                 st.error("Overload detected — schedule cannot be generated. See suggested fixes above.")
+            elif result_key in st.session_state.dept_results:
+                st.info("Same inputs and settings as an earlier run — showing its timetables. Change the master seed for a fresh attempt.")
+            elif background and not keep_previous:
+                request = job_request(reg.teachers, reg.classes, reg.assignments, days, periods_per_day, dict(solve_settings, backend=backend, workers=int(workers)))
+                label = f"{len(reg.classes)} classes, {len(reg.assignments)} assignments ({solve_settings['solver']})"
+                job_id = _job_queue().submit(request, label=label, key=result_key)
+                st.session_state.dept_jobs.append(job_id)
+                st.info(f"Queued as background job {job_id[:8]} — its progress is shown below and the timetables appear here when it finishes.")
             else:
                 progress_bar = st.progress(0)
                 status = st.empty()
-                class_table, teacher_table, remaining, meta = schedule_best_of_n(st.session_state.classes, st.session_state.teachers, st.session_state.assignments, timeslots, trials=trials, st_progress=(progress_bar, status))
+                solver_stats = SolverStats() if collect_stats else None
+                if keep_previous:
+                    class_table, teacher_table, remaining, meta = schedule_incremental(reg.classes, reg.teachers, reg.assignments, timeslots, last[2], seed=master_seed or None, repair_seconds=repair_seconds, st_progress=(progress_bar, status), deadline=time_budget, constraints=st.session_state.constraints)
+                elif solver == "Constraint propagation":
+                    class_table, teacher_table, remaining, meta = schedule_cp(reg.classes, reg.teachers, reg.assignments, timeslots, seed=master_seed or None, st_progress=(progress_bar, status), deadline=time_budget, constraints=st.session_state.constraints, stats=solver_stats)
+                else:
+                    class_table, teacher_table, remaining, meta = schedule_best_of_n(reg.classes, reg.teachers, reg.assignments, timeslots, trials=trials, st_progress=(progress_bar, status), backend=backend, seed=master_seed or None, workers=int(workers), repair_seconds=repair_seconds, deadline=time_budget, constraints=st.session_state.constraints, scorer=scorer, stats=solver_stats, adaptive=adaptive)
                 progress_bar.progress(100)
+                # The trials solver scores its own result; the others are scored for display
+                class_table, teacher_table, remaining, meta = score_result((class_table, teacher_table, remaining, meta), scorer, reg.assignments, timeslots)
                 if "diag" in (meta or {}):
                     st.error("Scheduling aborted due to diagnose issues.")
                 else:
-                    status.text(f"Done — best_remaining: {meta.get('best_remaining')}, placed: {meta.get('placed')}, time: {meta.get('elapsed'):.2f}s")
-                    st.success("Scheduling finished — see timetables below.")
-
-                    st.markdown("### Timetables by Class")
-                    for c in st.session_state.classes:
-                        st.subheader(c.name)
-                        matrix = []
-                        for d_idx, d in enumerate(days):
-                            row = []
-                            for p in range(periods_per_day):
-                                sidx = d_idx*periods_per_day + p
-                                val = class_table[c.id][sidx]
-                                if val is None:
-                                    row.append(" ")
-                                else:
-                                    tname = next((t.name for t in st.session_state.teachers if t.id == val["teacher_id"]), "Unknown")
-                                    row.append(f"{val['subject']} ({tname})")
-                            matrix.append(row)
-                        cols = [(f"P{p}", period_timings[p-1]) for p in range(1, periods_per_day+1)]
-                        df = pd.DataFrame(matrix, index=days, columns=pd.MultiIndex.from_tuples(cols))
-
-                        st.markdown(
-    df.to_html(classes='centered-table', index=True, escape=False),
-    unsafe_allow_html=True
-)
-
-                        st.download_button(
-                            label=f"Download {c.name} CSV",
-                            data=df.to_csv(),
-                            file_name=f"timetable_{c.name}.csv",
-                            mime="text/csv",
-                            key=f"download_class_{c.name}"  # ✅ Unique key for each class
-)
-
-
-                    st.markdown("### Timetables by Teacher")
-                    for t in st.session_state.teachers:
-                        st.subheader(t.name)
-                        matrix = []
-                        for d_idx, d in enumerate(days):
-                            row = []
-                            for p in range(periods_per_day):
-                                sidx = d_idx*periods_per_day + p
-                                val = teacher_table[t.id][sidx]
-                                if val is None:
-                                    row.append(" ")
-                                else:
-                                    cname = next((c.name for c in st.session_state.classes if c.id == val["class_id"]), "Unknown")
-                                    row.append(f"{val['subject']} ({cname})")
-                            matrix.append(row)
-                        cols = [(f"P{p}", period_timings[p-1]) for p in range(1, periods_per_day+1)]
-                        df = pd.DataFrame(matrix, index=days, columns=pd.MultiIndex.from_tuples(cols))
-
-                        st.markdown(
-                        df.to_html(classes='centered-table', index=True, escape=False),
-                        unsafe_allow_html=True
-)
-
-                        st.download_button(
-                            label=f"Download {t.name} CSV",
-                            data=df.to_csv(),
-                            file_name=f"timetable_{t.name}.csv",
-                            mime="text/csv",
-                            key=f"download_teacher_{t.name}"  # ✅ Unique key for each teacher
-                            )
-
-                    if meta.get("best_remaining", 0) > 0:
-                        st.warning(f"Could not place {meta.get('best_remaining')} periods even after {trials} trials.")
-                        rem_df = pd.DataFrame(remaining) if remaining else pd.DataFrame()
-                        if not rem_df.empty:
-                            rem_df['teacher_name'] = rem_df['teacher_id'].map({t.id:t.name for t in st.session_state.teachers})
-                            rem_df['class_name'] = rem_df['class_id'].map({c.id:c.name for c in st.session_state.classes})
-                            st.dataframe(rem_df[['teacher_name','class_name','subject']])
+                    status.text(f"Done — {meta.get('status')}, best_remaining: {meta.get('best_remaining')}, placed: {meta.get('placed')}, repaired: {meta.get('repaired', 0)}, time: {meta.get('elapsed'):.2f}s")
+                    if keep_previous:
+                        st.info(f"Kept {meta['kept']} units in place, re-placed {meta['freed']} changed ones" + (f" and moved {meta['moved']} others to fit them." if meta["moved"] else "."))
+                    st.session_state.dept_results.put(result_key, (class_table, teacher_table, remaining, meta))
+
+    if st.session_state.dept_jobs:
+        _job_monitor()
+    if st.session_state.job_notice is not None:
+        level, message = st.session_state.job_notice
+        st.session_state.job_notice = None
+        getattr(st, level)(message)
+    if background:
+        with st.expander("Background jobs", expanded=bool(st.session_state.dept_jobs)):
+            _render_job_list()
+
+    cached = st.session_state.dept_results.get(result_key)
+    if cached is None and st.session_state.project is not None:
+        # A timetable saved with the open project for exactly these inputs and settings
+        saved = _project_store().timetable(st.session_state.project, result_key)
+        if saved is not None:
+            cached = saved[-1]
+            st.session_state.dept_results.put(result_key, cached)
+    if cached is not None:
+        st.session_state.shown_result = (result_key, tuple(days), int(periods_per_day), solve_settings, cached)
+        _render_dept_result(cached, days, periods_per_day, time_budget, trials)
+    elif st.session_state.opened_result is not None:
+        caption, key, shown_days, shown_ppd, shown_settings, shown = st.session_state.opened_result
+        st.session_state.shown_result = (key, shown_days, shown_ppd, shown_settings, shown)
+        st.info(caption)
+        _render_dept_result(shown, shown_days, shown_ppd, shown_settings.get("time_budget") or 0, shown_settings.get("trials", 0))
+    else:
+        st.session_state.shown_result = None
 
 # -----------------------
 # Tab 2: Single-class 5x8 builder
@@ -800,216 +793,14 @@ with tabs[1]:
         st.session_state.attempt_seed += 1
         seed = st.session_state.attempt_seed
 
-        # create_single_class_timetable is unchanged (keeps behaviour)
-        def create_single_class_timetable(subjects, seed=0):
-            random.seed(seed)
-            total = sum((s.get("periods",0) for s in subjects))
-            if total > SLOTS_PER_DAY * len(DAYS):
-                return None, f"Requested total periods {total} > available {SLOTS_PER_DAY*len(DAYS)}."
-
-            blocks = []
-            for s in subjects:
-                cat = s.get("category","")
-                name = s.get("subject","")
-                staff = s.get("staff","")
-                p = int(s.get("periods",0))
-                if cat == "Laboratory":
-                    if p < 2:
-                        return None, f"Lab {name} has {p} periods — must be at least 2."
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"lab", "meta":{}})
-                elif cat == "Open Elective":
-                    if p != 4:
-                        return None, f"Open Elective '{name}' must be exactly 4 periods (2+2)."
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"open_elective", "meta":{}})
-                elif cat == "Library":
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"library", "meta":{}})
-                elif cat == "Mentoring":
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"mentoring", "meta":{}})
-                elif cat.startswith("Main subject"):
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"main", "meta":{}})
-                elif cat.startswith("Professional Elective"):
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"prof", "meta":{}})
-                elif cat == "Project":
-                    if p != 4:
-                        return None, f"Project '{name}' must be 4 periods and scheduled as 2+2."
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"project", "meta":{}})
-                else:
-                    blocks.append({"subject": name, "staff": staff, "periods": p, "kind":"other", "meta":{}})
-
-            lib = [b for b in blocks if b["kind"] == "library"]
-            ment = [b for b in blocks if b["kind"] == "mentoring"]
-            if lib and ment:
-                lib_b = lib[0]; ment_b = ment[0]
-                blocks = [b for b in blocks if b not in (lib_b, ment_b)]
-                combined = {
-                    "subject": f"{lib_b['subject']}/{ment_b['subject']}",
-                    "staff": f"{lib_b['staff']}/{ment_b['staff']}",
-                    "periods": 2,
-                    "kind": "lib_ment_combined",
-                    "meta": {"order_options":[(lib_b['subject'], ment_b['subject']), (ment_b['subject'], lib_b['subject'])]}
-                }
-                blocks.append(combined)
-            elif lib or ment:
-                return None, "Library and Mentoring must both be present and scheduled together (adjacent)."
-
-            def generate_partitions(total: int, max_block: int = 3):
-                results = []
-                def helper(remaining, max_part, current):
-                    if remaining == 0:
-                        results.append(current.copy())
-                        return
-                    for p in range(min(max_part, remaining), 0, -1):
-                        if p > max_block:
-                            continue
-                        if current and p > current[-1]:
-                            continue
-                        current.append(p)
-                        helper(remaining - p, p, current)
-                        current.pop()
-                helper(total, max_block, [])
-                return results
-
-            def partitions_for(subject_block):
-                kind = subject_block["kind"]
-                total_p = subject_block["periods"]
-                if kind == "lab":
-                    if total_p == 4:
-                        return [[2,2]]
-                    else:
-                        parts = []
-                        if total_p % 2 == 0 and total_p//2 <= 4:
-                            parts.append([2]*(total_p//2))
-                        parts.append([total_p])
-                        return parts
-                elif kind == "open_elective":
-                    return [[2,2]]
-                elif kind == "project":
-                    return [[2,2]]
-                elif kind == "lib_ment_combined":
-                    return [[2]]
-                elif kind == "main":
-                    return generate_partitions(total_p, max_block=3) or [[total_p]]
-                elif kind == "prof":
-                    return generate_partitions(total_p, max_block=3) or [[total_p]]
-                else:
-                    return generate_partitions(total_p, max_block=3) or [[total_p]]
-
-            subj_candidates = []
-            for b in blocks:
-                parts = partitions_for(b)
-                if not parts:
-                    parts = [[b['periods']]]
-                subj_candidates.append({"block": b, "candidates": parts})
-
-            MAX_PARTITION_COMBINATIONS = 6000
-            choices_lists = [c["candidates"] for c in subj_candidates]
-            prod_count = 1
-            for ch in choices_lists:
-                prod_count *= max(1, len(ch))
-
-            def partition_combinations_iter():
-                if prod_count <= MAX_PARTITION_COMBINATIONS:
-                    for combo in itertools.product(*choices_lists):
-                        yield combo
-                else:
-                    tried = set()
-                    attempts = 0
-                    while attempts < MAX_PARTITION_COMBINATIONS:
-                        combo = tuple(random.choice(lst) for lst in choices_lists)
-                        if combo not in tried:
-                            tried.add(combo)
-                            yield combo
-                        attempts += 1
-
-            def make_block_instances(combo):
-                insts = []
-                for subj_choice, subinfo in zip(combo, subj_candidates):
-                    b = subinfo["block"]
-                    sizes = list(subj_choice)
-                    for sz in sizes:
-                        inst = {"subject": b["subject"], "staff": b["staff"], "size": sz, "kind": b["kind"], "orig_periods": b["periods"], "meta": b.get("meta", {})}
-                        insts.append(inst)
-                insts.sort(key=lambda x: (-x["size"], x["kind"]))
-                return insts
-
-            def try_place(instances):
-                sched = [[None]*SLOTS_PER_DAY for _ in DAYS]
-                per_day_subject_counts = {d:{} for d in range(len(DAYS))}
-
-                def backtrack(idx):
-                    if idx >= len(instances):
-                        return True
-                    inst = instances[idx]
-                    subj = inst["subject"]
-                    size = inst["size"]
-                    kind = inst["kind"]
-
-                    day_order = list(range(len(DAYS)))
-                    day_order.sort(key=lambda d: sum(1 for c in sched[d] if c is None), reverse=True)
-                    slot_order = list(range(SLOTS_PER_DAY - size + 1))
-
-                    for d in day_order:
-                        for s in slot_order:
-                            if any(sched[d][s+k] is not None for k in range(size)):
-                                continue
-                            if kind in ("main","prof"):
-                                already = per_day_subject_counts[d].get(subj, 0)
-                                if already + size > 3:
-                                    continue
-                            # place
-                            if kind == "lib_ment_combined" and inst["meta"].get("order_options"):
-                                first, second = inst["meta"]["order_options"][0]
-                                labels = [first, second]
-                                if size != 2:
-                                    labels = [inst["subject"]] * size
-                                for k in range(size):
-                                    sched[d][s+k] = f"{labels[k]} ({inst['staff']})"
-                            else:
-                                for k in range(size):
-                                    sched[d][s+k] = f"{subj} ({inst['staff']})"
-                            per_day_subject_counts[d][subj] = per_day_subject_counts[d].get(subj, 0) + size
-
-                            if backtrack(idx+1):
-                                return True
-
-                            for k in range(size):
-                                sched[d][s+k] = None
-                            per_day_subject_counts[d][subj] -= size
-                            if per_day_subject_counts[d][subj] == 0:
-                                del per_day_subject_counts[d][subj]
-                    return False
-
-                ok = backtrack(0)
-                if ok:
-                    return sched
-                return None
-
-            for combo in partition_combinations_iter():
-                insts = make_block_instances(combo)
-                if sum(i["size"] for i in insts) != total:
-                    continue
-                orderings = [insts]
-                for _ in range(8):
-                    tmp = insts.copy()
-                    random.shuffle(tmp)
-                    tmp.sort(key=lambda x: -x["size"])
-                    orderings.append(tmp)
-                for ordering in orderings:
-                    sched = try_place(ordering)
-                    if sched is not None:
-                        out = []
-                        for drow in sched:
-                            out_row = []
-                            for cell in drow:
-                                out_row.append(cell if cell is not None else " ")
-                            out.append(out_row)
-                        return out, "ok"
-            return None, "No feasible arrangement found with given constraints and subject partitions."
-
-        schedule, msg = create_single_class_timetable(st.session_state.single_assignments, seed=seed)
+        schedule, msg, single_status = create_single_class_timetable(st.session_state.single_assignments, seed=seed, days=DAYS, slots_per_day=SLOTS_PER_DAY, deadline=time_budget)
         if schedule is None:
             st.error(msg)
             st.session_state.single_schedule = None
+        elif single_status != "optimal":
+            # "feasible-partial" or "timed out": the fullest partial timetable
+            st.warning(msg)
+            st.session_state.single_schedule = schedule
         else:
             st.success("Schedule created — preview below")
             st.session_state.single_schedule = schedule
@@ -1026,6 +817,72 @@ with tabs[1]:
 
         st.download_button("Download CSV", df.to_csv(), file_name="single_class_timetable.csv", mime="text/csv")
 
+    # -----------------------
+    # Batch: many classes sharing staff
+    # -----------------------
+    st.markdown("---")
+    st.markdown("### Batch — many classes with shared staff")
+    st.caption("Classes are built together so no staff member is booked twice at the same time. Save the list above under a class name, or upload a sheet with columns " + ", ".join(BATCH_COLUMNS) + ". Lab rooms added on the Department Scheduler tab (under rules) host the Laboratory subjects, without double-booking.")
+    bc1, bc2 = st.columns([2,1])
+    with bc1:
+        batch_class_name = st.text_input("Class name for the current subject list", key="batch_name", placeholder="e.g. CSE-A")
+    with bc2:
+        if st.button("Save list to batch"):
+            if not batch_class_name.strip() or not st.session_state.single_assignments:
+                st.warning("Enter a class name and add subjects first")
+            else:
+                st.session_state.batch_classes[batch_class_name.strip()] = list(st.session_state.single_assignments)
+                st.success(f"Saved {batch_class_name.strip()} ({len(st.session_state.single_assignments)} subjects)")
+
+    batch_file = st.file_uploader("Upload batch sheet (.xlsx)", type=["xlsx"], key="batch_file")
+    if batch_file:
+        try:
+            batch_hash = hashlib.sha256(batch_file.getvalue()).hexdigest()
+            if st.session_state.batch_import != batch_hash:
+                st.session_state.batch_classes.update(batch_from_frame(pd.read_excel(batch_file)))
+                st.session_state.batch_import = batch_hash
+        except Exception as e:
+            st.error(f"Error reading batch sheet: {e}")
+
+    if st.session_state.batch_classes:
+        st.dataframe(pd.DataFrame([{"class": name, "subjects": len(subs), "periods": sum(s["periods"] for s in subs)} for name, subs in st.session_state.batch_classes.items()]), use_container_width=True)
+        run_col, clear_batch_col = st.columns([1,1])
+        with clear_batch_col:
+            if st.button("Clear batch"):
+                st.session_state.batch_classes = {}
+                st.session_state.batch_result = None
+                st.rerun()
+        with run_col:
+            if st.button("Create timetables — all classes", type="primary"):
+                st.session_state.attempt_seed += 1
+                with st.spinner(f"Building {len(st.session_state.batch_classes)} timetables"):
+                    st.session_state.batch_result = create_batch_timetables(st.session_state.batch_classes, seed=st.session_state.attempt_seed, days=DAYS, slots_per_day=SLOTS_PER_DAY, deadline=time_budget, workers=int(workers), rooms=st.session_state.constraints.rooms)
+    else:
+        st.info("No classes in the batch yet")
+
+    if st.session_state.batch_result is not None:
+        batch_results, batch_meta = st.session_state.batch_result
+        for name, periods, available in batch_meta["staff_overload"]:
+            st.error(f"{name} teaches {periods} periods but the week has only {available} — some classes cannot be completed.")
+        for name, periods, available in batch_meta.get("room_overload", []):
+            st.error(f"{name} is booked for {periods} lab periods but holds only {available} in a week — some classes cannot be completed.")
+        done = sum(1 for r in batch_results.values() if r[2] == "optimal")
+        summary = f"{done}/{len(batch_results)} classes complete in {batch_meta['elapsed']:.2f}s ({batch_meta['groups']} independent staff groups)"
+        if batch_meta["status"] == "optimal":
+            st.success(summary)
+        else:
+            st.warning(f"{summary} — {batch_meta['status']}")
+        view = st.selectbox("Show class", options=list(batch_results), key="batch_view")
+        schedule, msg, class_status = batch_results[view]
+        if class_status == "invalid":
+            st.error(msg)
+        elif class_status != "optimal":
+            st.warning(msg)
+        if schedule is not None:
+            df = pd.DataFrame(schedule, index=DAYS, columns=[f"P{p}" for p in range(1, SLOTS_PER_DAY+1)])
+            st.markdown(df.to_html(classes='centered-table', index=True, escape=False), unsafe_allow_html=True)
+            st.download_button(f"Download {view} CSV", df.to_csv(), file_name=f"timetable_{view}.csv", mime="text/csv", key=f"download_batch_{view}")
+
 # -----------------------
 # Footer
 # -----------------------